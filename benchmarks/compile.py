@@ -0,0 +1,122 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Compile time of each generated translation unit.
+
+Every program of e2e.py is transpiled and compiled with the headers that
+the generated code includes, and again with the whole runtime
+(``py2cpp/py2cpp.hpp``) in their place.
+"""
+
+from __future__ import print_function
+
+import argparse
+import io
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import timeit
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import e2e
+
+from py2cpp import driver
+
+INCLUDE_LINE = re.compile(r'^#include [<"].*[>"]\n', re.MULTILINE)
+UMBRELLA = '#include "py2cpp/py2cpp.hpp"\n'
+
+
+def umbrella(code):
+    """*code* including the whole runtime instead of the headers it uses"""
+    code = INCLUDE_LINE.sub("", code)
+    lines = code.split("\n")
+    # after the header comment
+    index = next((i for i, x in enumerate(lines) if not x.startswith("//")), len(lines))
+    lines.insert(index, UMBRELLA.rstrip("\n"))
+    return "\n".join(lines)
+
+
+def compile_time(command, repeat):
+    """
+    :return: best wall time, or None if the compiler failed
+    """
+    best = None
+    for _ in range(repeat):
+        start = timeit.default_timer()
+        proc = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        elapsed = timeit.default_timer() - start
+        if proc.returncode != 0:
+            return None
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def benchmark(program, workdir, cxx, flags, repeat):
+    result = {"name": program.name}
+    source = "\n\n".join(io.open(x, encoding="utf-8").read() for x in program.sources)
+    stream = io.StringIO()
+    driver.transpile(source, program.sources[0], stream)
+    code = stream.getvalue()
+    for name, text in [("minimal", code), ("umbrella", umbrella(code))]:
+        path = os.path.join(workdir, "{}.{}.cpp".format(program.name, name))
+        with io.open(path, "w", encoding="utf-8") as fp:
+            fp.write(text)
+        command = [cxx] + flags + ["-I", e2e.INCLUDE, "-c", path, "-o", os.devnull]
+        result[name] = compile_time(command, repeat)
+    result["headers"] = len(INCLUDE_LINE.findall(code))
+    return result
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("input", nargs="*", default=e2e.DEFAULT_INPUTS,
+                        help="programs or directories of programs (default: samples and corpus)")
+    parser.add_argument("--cxx", help="C++ compiler (default: $CXX, g++ or clang++)")
+    parser.add_argument("--flags", default="-std=c++14 -O2",
+                        help="compiler flags (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("-o", "--output", type=argparse.FileType("w"),
+                        help="write the results as JSON to this file")
+
+    args = parser.parse_args(argv)
+
+    cxx = args.cxx or e2e.find_compiler()
+    if cxx is None:
+        parser.error("no C++ compiler found; pass --cxx or set CXX")
+
+    workdir = tempfile.mkdtemp(prefix="py2cpp-compile-")
+    results = []
+    try:
+        print("{:>10} {:>8} {:>10} {:>10}".format("program", "headers", "minimal s", "umbrella s"))
+        for program in e2e.discover(args.input):
+            result = benchmark(program, workdir, cxx, args.flags.split(), args.repeat)
+            results.append(result)
+            print("{:>10} {:>8} {:>10} {:>10}".format(
+                program.name,
+                result["headers"],
+                e2e._format(result["minimal"], "{:.3f}"),
+                e2e._format(result["umbrella"], "{:.3f}")))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    pairs = [(x["minimal"], x["umbrella"]) for x in results if x["minimal"] and x["umbrella"]]
+    if pairs:
+        print("total: {:.3f} s minimal, {:.3f} s umbrella".format(
+            sum(x for x, _ in pairs), sum(y for _, y in pairs)))
+
+    if args.output is not None:
+        json.dump({"compiler": cxx, "flags": args.flags, "results": results},
+                  args.output, indent=2, sort_keys=True)
+        args.output.write("\n")
+
+    failed = [x for x in results if x["minimal"] is None]
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,21 @@
+def steps(n: int) -> int:
+    count = 0
+    while n != 1:
+        if n % 2 == 0:
+            n = n // 2
+        else:
+            n = 3 * n + 1
+        count += 1
+    return count
+
+
+def main() -> int:
+    best = 0
+    best_n = 1
+    for n in range(1, 100000):
+        s = steps(n)
+        if s > best:
+            best = s
+            best_n = n
+    print(best_n, best)
+    return 0
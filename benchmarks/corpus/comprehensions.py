@@ -0,0 +1,15 @@
+def squares(n: int) -> List[int]:
+    return [i * i % 1000 for i in range(n)]
+
+
+def main() -> int:
+    xs = squares(40000)
+    total = 0
+    for k in range(100):
+        total += sum(x % (k + 2) for x in xs if x % 2 == 0)
+    print(total)
+    residues = {x % 97 for x in xs}
+    print(len(residues))
+    print(max(x % 991 for x in xs), min(x + 1 for x in xs))
+    print(any(x == 999 for x in xs), all(x < 1000 for x in xs))
+    return 0
@@ -0,0 +1,24 @@
+WIDTH = 64
+HEIGHT = WIDTH // 2
+CELLS = WIDTH * HEIGHT
+DEBUG = False
+SCALE = 1.0 / 8
+
+
+def cell(x: int, y: int) -> int:
+    return (x * 31 + y * 17) % (1 << 8)
+
+
+def main() -> int:
+    total = 0
+    weight = 0.0
+    for step in range(400):
+        for y in range(HEIGHT):
+            for x in range(WIDTH):
+                v = cell(x + step, y)
+                if DEBUG:
+                    print(x, y, v)
+                total += v * (2 ** 3) - (v if 1 > 2 else 0)
+                weight += v * SCALE
+    print(total, weight, CELLS, HEIGHT, 7 // -2, -7 % 3)
+    return 0
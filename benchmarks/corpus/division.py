@@ -0,0 +1,19 @@
+def bucket(x: int, width: int) -> int:
+    return x // width
+
+
+def wrap(i: int, n: int) -> int:
+    return i % n
+
+
+def main() -> int:
+    total = 0
+    counts = [0 for k in range(16)]
+    for i in range(-3000000, 3000000, 3):
+        total += bucket(i, 7) + wrap(i, 16)
+        counts[wrap(i, 16)] += 1
+    for j in range(100000):
+        total += j // 9 - j % 5
+    print(total, counts[0], counts[15])
+    print(7.5 // 2, -7.5 // 2, -7.5 % 2)
+    return 0
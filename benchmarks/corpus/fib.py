@@ -0,0 +1,9 @@
+def fib(n: int) -> int:
+    if n < 2:
+        return n
+    return fib(n - 1) + fib(n - 2)
+
+
+def main() -> int:
+    print(fib(27))
+    return 0
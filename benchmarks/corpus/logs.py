@@ -0,0 +1,9 @@
+def main() -> int:
+    total = 0
+    for i in range(100000):
+        total += i % 7
+        print("step", i, total, sep="\t")
+        if i % 25000 == 0:
+            print("checkpoint", i, end=" ", flush=True)
+            print("done")
+    return 0
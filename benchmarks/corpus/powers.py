@@ -0,0 +1,19 @@
+def score(x: float, y: float, cx: float, cy: float) -> float:
+    return (x - cx) ** 2 + (y - cy) ** 2
+
+
+def main() -> int:
+    best = 0.0
+    for i in range(1000):
+        for j in range(1000):
+            d = score(i * 0.5, j * 0.25, 200.0, 100.0)
+            if d > best:
+                best = d
+    total = 0
+    for k in range(2000000):
+        v = k % 30
+        total += v ** 2 + v ** 3 % 7
+    for e in range(20):
+        total += 3 ** e % 1000003
+    print(best, total, 2 ** 10, 2 ** -1, 2.5 ** 3)
+    return 0
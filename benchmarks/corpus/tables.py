@@ -0,0 +1,26 @@
+def table(n: int, m: int) -> List[List[int]]:
+    rows = list()
+    for i in range(n):
+        row = list()
+        for j in range(m):
+            row.append((i * 31 + j * 17) % 1000)
+        rows.append(row)
+    return rows
+
+
+def flatten(rows: List[List[int]], n: int, m: int) -> List[int]:
+    flat = list()
+    for i in range(n):
+        for j in range(m):
+            flat.append(rows[i][j])
+    return flat
+
+
+def main() -> int:
+    total = 0
+    for k in range(20):
+        rows = table(300, 400)
+        flat = flatten(rows, 300, 400)
+        total += flat[k * 997] + len(flat)
+    print(total)
+    return 0
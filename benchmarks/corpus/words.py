@@ -0,0 +1,21 @@
+def normalize(line: str) -> str:
+    words = line.strip().lower().split()
+    return "-".join(words)
+
+
+def main() -> int:
+    total = 0
+    kept = list()
+    for i in range(20000):
+        line = "  Word" + str(i % 97) + "  OTHER\tthing "
+        key = normalize(line)
+        if key.startswith("word1") and not key.endswith("x"):
+            kept.append(key.replace("-", "+").upper())
+        fields = key.split("-")
+        total += len(fields) + len(fields.pop())
+    print(total, len(kept))
+    while len(kept) > 2:
+        kept.pop()
+    last = kept.pop()
+    print(", ".join(kept), last)
+    return 0
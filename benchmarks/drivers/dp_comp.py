@@ -0,0 +1,9 @@
+def main() -> int:
+    a = list()
+    b = list()
+    for i in range(1200):
+        a.append(i * 7 % 13)
+    for i in range(1200):
+        b.append(i * 5 % 11)
+    print(dp_comp(a, b))
+    return 0
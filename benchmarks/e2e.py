@@ -0,0 +1,208 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Transpile, compile and run programs, and compare them with CPython.
+
+A program is a python file that defines ``main() -> int``. A file in
+drivers/ with the same name is appended to it first, so that samples
+which only define functions can be run on fixed inputs, and a file with
+the same name and the ``.in`` extension is fed to both as standard input.
+"""
+
+from __future__ import print_function
+
+import argparse
+import ast
+import collections
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from py2cpp import driver
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_INPUTS = [os.path.join(ROOT, "samples"), os.path.join(HERE, "corpus")]
+DRIVERS = os.path.join(HERE, "drivers")
+INCLUDE = os.path.join(ROOT, "include")
+COMPILERS = ["g++", "clang++"]
+
+# the samples use these names without importing them
+RUNNER = """
+import math, runpy, sys, typing
+names = dict(math=math, List=typing.List, Dict=typing.Dict, Tuple=typing.Tuple)
+sys.exit(runpy.run_path(sys.argv[1], init_globals=names)["main"]())
+"""
+
+Program = collections.namedtuple("Program", ["name", "sources", "stdin"])
+
+
+def discover(inputs):
+    """
+    :type inputs: list of str
+    :rtype: list of Program
+    """
+    paths = []
+    for path in inputs:
+        if os.path.isdir(path):
+            paths += sorted(os.path.join(path, x) for x in os.listdir(path) if x.endswith(".py"))
+        else:
+            paths.append(path)
+    programs = []
+    for path in paths:
+        base = os.path.splitext(path)[0]
+        name = os.path.basename(base)
+        sources = [path]
+        driver_path = os.path.join(DRIVERS, name + ".py")
+        if os.path.exists(driver_path):
+            sources.append(driver_path)
+        stdin = base + ".in"
+        programs.append(Program(name, sources, stdin if os.path.exists(stdin) else None))
+    return programs
+
+
+def find_compiler():
+    candidates = [os.environ["CXX"]] if "CXX" in os.environ else COMPILERS
+    for cxx in candidates:
+        if shutil.which(cxx) is not None:
+            return cxx
+    return None
+
+
+def has_main(source):
+    tree = ast.parse(source)
+    return any(isinstance(x, ast.FunctionDef) and x.name == "main" for x in tree.body)
+
+
+def run(command, stdin, repeat, timeout):
+    """
+    :return: (best wall time, stdout of the last run)
+    """
+    best = None
+    for _ in range(repeat):
+        with open(stdin or os.devnull, "rb") as fp:
+            start = timeit.default_timer()
+            proc = subprocess.run(command, stdin=fp, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                  timeout=timeout)
+            elapsed = timeit.default_timer() - start
+        if proc.returncode != 0:
+            raise RuntimeError("{} exited with {}: {}".format(
+                os.path.basename(command[-1]), proc.returncode, first_line(proc.stderr)))
+        best = elapsed if best is None else min(best, elapsed)
+    return best, proc.stdout.decode("utf-8").replace("\r\n", "\n")
+
+
+def first_line(data):
+    lines = data.decode("utf-8", "replace").strip().splitlines()
+    for line in lines:
+        if "error" in line:
+            return line
+    return lines[0] if lines else ""
+
+
+def benchmark(program, workdir, cxx, flags, repeat, timeout):
+    result = {"name": program.name, "sources": program.sources}
+    source = "\n\n".join(io.open(x, encoding="utf-8").read() for x in program.sources)
+    if not has_main(source):
+        result["status"] = "skipped: no main()"
+        return result
+
+    py_path = os.path.join(workdir, program.name + ".py")
+    cpp_path = os.path.join(workdir, program.name + ".cpp")
+    exe_path = os.path.join(workdir, program.name)
+    with io.open(py_path, "w", encoding="utf-8") as fp:
+        fp.write(source)
+    try:
+        with io.open(cpp_path, "w", encoding="utf-8") as fp:
+            driver.transpile(source, program.sources[0], fp)
+    except Exception as e:
+        result["status"] = "transpile error: {}: {}".format(e.__class__.__name__, e)
+        return result
+
+    start = timeit.default_timer()
+    proc = subprocess.run([cxx] + flags + ["-I", INCLUDE, cpp_path, "-o", exe_path],
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    result["compile_time"] = timeit.default_timer() - start
+    if proc.returncode != 0:
+        result["status"] = "compile error: " + first_line(proc.stderr)
+        return result
+
+    try:
+        py_time, py_out = run([sys.executable, "-c", RUNNER, py_path], program.stdin, repeat, timeout)
+        cpp_time, cpp_out = run([exe_path], program.stdin, repeat, timeout)
+    except (RuntimeError, subprocess.TimeoutExpired) as e:
+        result["status"] = "run error: {}".format(e)
+        return result
+    result.update({
+        "python_time": py_time,
+        "cpp_time": cpp_time,
+        "speedup": py_time / cpp_time,
+        "output_equal": py_out == cpp_out,
+        "status": "ok" if py_out == cpp_out else "output differs",
+    })
+    return result
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("input", nargs="*", default=DEFAULT_INPUTS,
+                        help="programs or directories of programs (default: samples and corpus)")
+    parser.add_argument("--cxx", help="C++ compiler (default: $CXX, g++ or clang++)")
+    parser.add_argument("--flags", default="-std=c++14 -O2",
+                        help="compiler flags (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds per run")
+    parser.add_argument("--build-dir", help="keep the generated files in this directory")
+    parser.add_argument("-o", "--output", type=argparse.FileType("w"),
+                        help="write the results as JSON to this file")
+
+    args = parser.parse_args(argv)
+
+    cxx = args.cxx or find_compiler()
+    if cxx is None:
+        parser.error("no C++ compiler found; pass --cxx or set CXX")
+
+    workdir = args.build_dir or tempfile.mkdtemp(prefix="py2cpp-e2e-")
+    if not os.path.isdir(workdir):
+        os.makedirs(workdir)
+    results = []
+    try:
+        print("{:>10} {:>10} {:>10} {:>10} {:>8}  {}".format(
+            "program", "compile s", "python s", "c++ s", "speedup", "status"))
+        for program in discover(args.input):
+            result = benchmark(program, workdir, cxx, args.flags.split(), args.repeat, args.timeout)
+            results.append(result)
+            print("{:>10} {:>10} {:>10} {:>10} {:>8}  {}".format(
+                program.name,
+                _format(result.get("compile_time"), "{:.3f}"),
+                _format(result.get("python_time"), "{:.3f}"),
+                _format(result.get("cpp_time"), "{:.3f}"),
+                _format(result.get("speedup"), "{:.1f}x"),
+                result["status"]))
+    finally:
+        if args.build_dir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output is not None:
+        json.dump({"compiler": cxx, "flags": args.flags, "results": results},
+                  args.output, indent=2, sort_keys=True)
+        args.output.write("\n")
+
+    failed = [x for x in results if x["status"] != "ok" and not x["status"].startswith("skipped")]
+    return 1 if failed else 0
+
+
+def _format(value, fmt):
+    return "-" if value is None else fmt.format(value)
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,68 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+
+import argparse
+import sys
+import os
+import time
+import tracemalloc
+
+import ast
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from py2cpp.converter import Converter
+from py2cpp.cpp import BuildContext
+from py2cpp.cpp import CodeWriter
+
+
+def generate(functions, depth):
+    lines = []
+    for i in range(functions):
+        lines.append("def func{}(a, b):".format(i))
+        for d in range(depth):
+            indent = "    " * (d + 1)
+            lines.append("{}x = a + b * {}".format(indent, d))
+            lines.append("{}if x > {}:".format(indent, d))
+        lines.append("    " * (depth + 1) + "return x")
+        lines.append("    return 0")
+    return "\n".join(lines) + "\n"
+
+
+def measure(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--functions", type=int, default=200)
+    parser.add_argument("--depth", type=int, nargs="+", default=[5, 10, 20, 40, 80])
+
+    args = parser.parse_args(argv)
+
+    print("{:>6} {:>12} {:>12} {:>12} {:>12} {:>12}".format(
+        "depth", "output [B]", "build [s]", "build [B]", "emit [s]", "emit [B]"))
+    with open(os.devnull, "w") as devnull:
+        for depth in args.depth:
+            cpp_node = Converter().visit(ast.parse(generate(args.functions, depth)))
+            output = []
+            build_time, build_peak = measure(
+                lambda: output.append(cpp_node.build(BuildContext.create())))
+            emit_time, emit_peak = measure(
+                lambda: cpp_node.emit(BuildContext.create(), CodeWriter(devnull)))
+            print("{:>6} {:>12} {:>12.4f} {:>12} {:>12.4f} {:>12}".format(
+                depth, len(output[0]), build_time, build_peak, emit_time, emit_peak))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
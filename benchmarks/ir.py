@@ -0,0 +1,72 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+
+import argparse
+import sys
+import os
+import tracemalloc
+
+import ast
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from py2cpp import cpp
+from py2cpp.converter import Converter
+
+
+FUNCTION_TEMPLATE = """
+def func{0}(a: int, b: int, c: float) -> int:
+    x = a * b + c - 1
+    for i in range(a):
+        if i % 2 == 0 and x > b:
+            print(i, x)
+        else:
+            x += math.pow(i, 2)
+    return x
+"""
+
+
+def generate(functions):
+    return "".join(FUNCTION_TEMPLATE.format(i) for i in range(functions))
+
+
+def count_ir(node):
+    if isinstance(node, list):
+        return sum(count_ir(x) for x in node)
+    if not isinstance(node, cpp.AST):
+        return 0
+    return 1 + sum(count_ir(getattr(node, x, None)) for x in node._fields)
+
+
+def allocated(func):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    ret = func()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return ret, after - before
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--functions", type=int, default=2000)
+
+    args = parser.parse_args(argv)
+
+    src = generate(args.functions)
+    tree, ast_bytes = allocated(lambda: ast.parse(src))
+    ast_nodes = sum(1 for _ in ast.walk(tree))
+    cpp_node, ir_bytes = allocated(lambda: Converter().visit(tree))
+    ir_nodes = count_ir(cpp_node)
+
+    print("{:>6} {:>10} {:>14} {:>10}".format("tree", "nodes", "bytes", "B/node"))
+    print("{:>6} {:>10} {:>14} {:>10.1f}".format("ast", ast_nodes, ast_bytes, ast_bytes / float(ast_nodes)))
+    print("{:>6} {:>10} {:>14} {:>10.1f}".format("ir", ir_nodes, ir_bytes, ir_bytes / float(ir_nodes)))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
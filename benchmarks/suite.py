@@ -0,0 +1,169 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+
+import argparse
+import gc
+import json
+import platform
+import sys
+import os
+import timeit
+import tracemalloc
+
+import ast
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import synthetic
+
+from py2cpp import __version__
+from py2cpp import cpp
+from py2cpp.converter import Converter
+from py2cpp.cpp import BuildContext
+
+
+DEFAULT_SIZES = {
+    "functions": [100, 1000],
+    "nesting": [10, 50],
+    "expressions": [50, 500],
+    "classes": [20, 200],
+    "hooks": [100, 1000],
+}
+
+
+def count_ir(node):
+    if isinstance(node, list):
+        return sum(count_ir(x) for x in node)
+    if not isinstance(node, cpp.AST):
+        return 0
+    return 1 + sum(count_ir(getattr(node, x, None)) for x in node._fields)
+
+
+def measure_time(setup, func, repeat):
+    """best wall time of func(setup()) out of *repeat* runs"""
+    best = None
+    for _ in range(repeat):
+        arg = setup()
+        gc.collect()
+        start = timeit.default_timer()
+        func(arg)
+        elapsed = timeit.default_timer() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def measure_peak(setup, func):
+    """peak memory allocated by func(setup()), in bytes"""
+    arg = setup()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func(arg)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(shape, size, repeat):
+    src = synthetic.generate(shape, size)
+    tree = ast.parse(src)
+    ast_nodes = sum(1 for _ in ast.walk(tree))
+    cpp_node = Converter().visit(tree)
+    ir_nodes = count_ir(cpp_node)
+
+    convert = lambda tree: Converter().visit(tree)
+    build = lambda node: node.build(BuildContext.create())
+    convert_time = measure_time(lambda: ast.parse(src), convert, repeat)
+    build_time = measure_time(lambda: cpp_node, build, repeat)
+    return {
+        "shape": shape,
+        "size": size,
+        "source_bytes": len(src),
+        "ast_nodes": ast_nodes,
+        "ir_nodes": ir_nodes,
+        "convert": {
+            "time": convert_time,
+            "nodes_per_sec": ast_nodes / convert_time,
+            "peak_bytes": measure_peak(lambda: ast.parse(src), convert),
+        },
+        "build": {
+            "time": build_time,
+            "nodes_per_sec": ir_nodes / build_time,
+            "peak_bytes": measure_peak(lambda: cpp_node, build),
+        },
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    :return: descriptions of the throughput and memory regressions beyond
+             *threshold* (a ratio) against *baseline*
+    """
+    previous = dict(((x["shape"], x["size"]), x) for x in baseline["results"])
+    regressions = []
+    for result in results:
+        old = previous.get((result["shape"], result["size"]))
+        if old is None:
+            continue
+        for phase in ("convert", "build"):
+            speed = result[phase]["nodes_per_sec"] / old[phase]["nodes_per_sec"]
+            memory = result[phase]["peak_bytes"] / float(old[phase]["peak_bytes"])
+            name = "{} {} {}".format(result["shape"], result["size"], phase)
+            if speed < 1 - threshold:
+                regressions.append("{}: throughput {:.0%} of baseline".format(name, speed))
+            if memory > 1 + threshold:
+                regressions.append("{}: peak memory {:.0%} of baseline".format(name, memory))
+    return regressions
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shape", choices=sorted(synthetic.SHAPES), action="append",
+                        help="shapes to run (default: all)")
+    parser.add_argument("--size", type=int, action="append",
+                        help="module sizes to run (default: per shape)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("-o", "--output", type=argparse.FileType("w"),
+                        help="write the results as JSON to this file")
+    parser.add_argument("--compare", type=argparse.FileType("r"),
+                        help="JSON results of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="relative change reported as a regression")
+
+    args = parser.parse_args(argv)
+
+    results = []
+    print("{:>12} {:>6} {:>9} {:>12} {:>12} {:>12} {:>12}".format(
+        "shape", "size", "ast nodes", "convert n/s", "convert [B]", "build n/s", "build [B]"))
+    for shape in args.shape or sorted(synthetic.SHAPES):
+        for size in args.size or DEFAULT_SIZES[shape]:
+            result = run(shape, size, args.repeat)
+            results.append(result)
+            print("{:>12} {:>6} {:>9} {:>12.0f} {:>12} {:>12.0f} {:>12}".format(
+                shape, size, result["ast_nodes"],
+                result["convert"]["nodes_per_sec"], result["convert"]["peak_bytes"],
+                result["build"]["nodes_per_sec"], result["build"]["peak_bytes"]))
+
+    report = {
+        "py2cpp": __version__,
+        "python": platform.python_version(),
+        "results": results,
+    }
+    if args.output is not None:
+        json.dump(report, args.output, indent=2, sort_keys=True)
+        args.output.write("\n")
+
+    if args.compare is not None:
+        regressions = compare(results, json.load(args.compare), args.threshold)
+        for regression in regressions:
+            print("REGRESSION:", regression)
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+"""Generators of synthetic python modules of configurable size and shape."""
+
+INDENT = " " * 4
+
+
+def functions(size):
+    """*size* small functions"""
+    lines = []
+    for i in range(size):
+        lines += [
+            "def func{}(a: int, b: int) -> int:".format(i),
+            "    x = a + b * {}".format(i),
+            "    if x > b:",
+            "        return x - a",
+            "    return x",
+            "",
+        ]
+    return "\n".join(lines)
+
+
+def nesting(size, count=10):
+    """*count* functions with control flow nested *size* levels deep"""
+    lines = []
+    for i in range(count):
+        lines.append("def nested{}(a: int, b: int) -> int:".format(i))
+        lines.append(INDENT + "x = 0")
+        for depth in range(size):
+            indent = INDENT * (depth + 1)
+            kind = depth % 3
+            if kind == 0:
+                lines.append("{}if a > {}:".format(indent, depth))
+            elif kind == 1:
+                lines.append("{}for i{} in range(b):".format(indent, depth))
+            else:
+                lines.append("{}while x < {}:".format(indent, depth))
+            lines.append("{}x += {}".format(indent + INDENT, depth))
+        lines.append(INDENT * (size + 1) + "x += 1")
+        lines.append(INDENT + "return x")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def expressions(size, count=10):
+    """*count* functions returning an expression of *size* operands"""
+    ops = ["+", "-", "*", "<<", "|", "&", "^"]
+    lines = []
+    for i in range(count):
+        terms = ["a"]
+        for j in range(1, size):
+            terms.append(ops[j % len(ops)])
+            terms.append("(b - {})".format(j) if j % 5 == 0 else str(j))
+        lines += [
+            "def expr{}(a: int, b: int) -> int:".format(i),
+            "    return " + " ".join(terms),
+            "",
+        ]
+    return "\n".join(lines)
+
+
+def classes(size, count=5):
+    """*count* classes with *size* methods each"""
+    lines = []
+    for i in range(count):
+        lines.append("class Class{}(Base):".format(i))
+        lines += [
+            INDENT + "def __init__(self, x: int):",
+            INDENT * 2 + "self.x = x",
+        ]
+        for j in range(size):
+            lines += [
+                INDENT + "def method{}(self, y: int) -> int:".format(j),
+                INDENT * 2 + "return self.x * y + {}".format(j),
+            ]
+        lines.append("")
+    return "\n".join(lines)
+
+
+def hooks(size):
+    """*size* functions calling print, range and math.pow, which trigger hooks"""
+    lines = []
+    for i in range(size):
+        lines += [
+            "def hooked{}(n: int) -> int:".format(i),
+            "    total = 0",
+            "    for i in range(n):",
+            "        total += math.pow(i, 2) + i ** 3",
+            "        print(i, total, (i, n))",
+            "    return total // 2",
+            "",
+        ]
+    return "\n".join(lines)
+
+
+SHAPES = {
+    "functions": functions,
+    "nesting": nesting,
+    "expressions": expressions,
+    "classes": classes,
+    "hooks": hooks,
+}
+
+
+def generate(shape, size):
+    """
+    :type shape: str
+    :type size: int
+    :rtype: str
+    """
+    return SHAPES[shape](size)
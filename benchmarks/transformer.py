@@ -0,0 +1,80 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+
+import argparse
+import sys
+import os
+import timeit
+
+import ast
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from py2cpp.transformer import CompositeTransformer
+from py2cpp.transformer import Transformers
+
+
+FUNCTION_TEMPLATE = """
+def func{0}(a, b, c):
+    x = a ** 2 + b // 3
+    y = (a, b, c)
+    x **= 2
+    x //= c
+    for i in range(a):
+        if i % 2 == 0:
+            print(i, x, y)
+        else:
+            c += i * b - a
+    return x
+"""
+
+
+def generate(functions):
+    return "".join(FUNCTION_TEMPLATE.format(i) for i in range(functions))
+
+
+def run_sequential(tree, transformers):
+    for transformer in transformers:
+        tree = transformer.visit(tree)
+    return tree
+
+
+def run_fused(tree, transformers):
+    return CompositeTransformer(transformers).visit(tree)
+
+
+def measure(src, transformers, func, number):
+    trees = [ast.parse(src) for _ in range(number)]
+    it = iter(trees)
+    return timeit.timeit(lambda: func(next(it), transformers), number=number) / number
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--functions", type=int, default=2000)
+    parser.add_argument("--number", type=int, default=3)
+    parser.add_argument("--max-passes", type=int, default=16,
+                        help="repeat the registered transformers up to this many passes")
+
+    args = parser.parse_args(argv)
+
+    src = generate(args.functions)
+    nodes = sum(1 for _ in ast.walk(ast.parse(src)))
+    print("# module: {} functions, {} nodes".format(args.functions, nodes))
+    print("{:>8} {:>14} {:>14} {:>8}".format("passes", "per-pass [s]", "fused [s]", "ratio"))
+
+    passes = len(Transformers)
+    while passes <= args.max_passes:
+        classes = [Transformers[i % len(Transformers)] for i in range(passes)]
+        sequential = measure(src, [x() for x in classes], run_sequential, args.number)
+        fused = measure(src, [x() for x in classes], run_fused, args.number)
+        print("{:>8} {:>14.4f} {:>14.4f} {:>8.2f}".format(passes, sequential, fused, sequential / fused))
+        passes *= 2
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
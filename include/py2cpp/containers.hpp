@@ -0,0 +1,113 @@
+#ifndef PY2CPP_CONTAINERS_HPP_
+#define PY2CPP_CONTAINERS_HPP_
+
+#include <algorithm>
+#include <stdexcept>
+#include <type_traits>
+
+namespace py2cpp {
+
+    template<typename C>
+    inline long len(const C& c)
+    {
+        return static_cast<long>(c.size());
+    }
+
+    namespace detail {
+
+        template<typename T>
+        inline T min_of(const T& a)
+        {
+            return a;
+        }
+
+        template<typename T, typename U, typename... Rest>
+        inline T min_of(const T& a, const U& b, const Rest&... rest)
+        {
+            return min_of<T>(b < a ? T(b) : a, rest...);
+        }
+
+        template<typename T>
+        inline T max_of(const T& a)
+        {
+            return a;
+        }
+
+        template<typename T, typename U, typename... Rest>
+        inline T max_of(const T& a, const U& b, const Rest&... rest)
+        {
+            return max_of<T>(a < b ? T(b) : a, rest...);
+        }
+
+    } // detail
+
+    // min(a, b, ...) of the common type; the first of equal values wins
+    template<typename A, typename B, typename... Rest>
+    inline typename std::common_type<A, B, Rest...>::type min(const A& a, const B& b, const Rest&... rest)
+    {
+        typedef typename std::common_type<A, B, Rest...>::type T;
+        return detail::min_of<T>(T(a), b, rest...);
+    }
+
+    template<typename A, typename B, typename... Rest>
+    inline typename std::common_type<A, B, Rest...>::type max(const A& a, const B& b, const Rest&... rest)
+    {
+        typedef typename std::common_type<A, B, Rest...>::type T;
+        return detail::max_of<T>(T(a), b, rest...);
+    }
+
+    // min(iterable)
+    template<typename C>
+    inline typename C::value_type min(const C& c)
+    {
+        if (c.begin() == c.end()) {
+            throw std::invalid_argument("min() arg is an empty sequence");
+        }
+        return *std::min_element(c.begin(), c.end());
+    }
+
+    template<typename C>
+    inline typename C::value_type max(const C& c)
+    {
+        if (c.begin() == c.end()) {
+            throw std::invalid_argument("max() arg is an empty sequence");
+        }
+        // max_element returns the first of equal values as python does
+        return *std::max_element(c.begin(), c.end());
+    }
+
+    template<typename C>
+    inline typename C::value_type sum(const C& c)
+    {
+        typename C::value_type ret = 0;
+        for (const auto& x : c) {
+            ret += x;
+        }
+        return ret;
+    }
+
+    template<typename C, typename T>
+    inline typename std::common_type<typename C::value_type, T>::type sum(const C& c, const T& start)
+    {
+        typename std::common_type<typename C::value_type, T>::type ret = start;
+        for (const auto& x : c) {
+            ret += x;
+        }
+        return ret;
+    }
+
+    // list.pop()
+    template<typename C>
+    inline typename C::value_type pop(C& c)
+    {
+        if (c.empty()) {
+            throw std::out_of_range("pop from empty list");
+        }
+        typename C::value_type ret = c.back();
+        c.pop_back();
+        return ret;
+    }
+
+} // py2cpp
+
+#endif // PY2CPP_CONTAINERS_HPP_
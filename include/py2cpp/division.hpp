@@ -0,0 +1,62 @@
+#ifndef PY2CPP_DIVISION_HPP_
+#define PY2CPP_DIVISION_HPP_
+
+#include <cmath>
+#include <type_traits>
+
+namespace py2cpp {
+
+    // python's // and %: the quotient is rounded towards negative infinity
+    // and the remainder has the sign of the divisor
+
+    template<typename A, typename B>
+    using integral_result = typename std::enable_if<
+        std::is_integral<A>::value && std::is_integral<B>::value,
+        typename std::common_type<A, B>::type>::type;
+
+    template<typename A, typename B>
+    using floating_result = typename std::enable_if<
+        std::is_floating_point<A>::value || std::is_floating_point<B>::value,
+        typename std::common_type<A, B>::type>::type;
+
+    // without branches: the truncated quotient, less one when the remainder
+    // is not zero and its sign differs from the divisor's
+    template<typename A, typename B>
+    inline integral_result<A, B> floordiv(A a, B b)
+    {
+        typedef integral_result<A, B> R;
+        const R q = a / b;
+        const R r = a % b;
+        return q - static_cast<R>((r != 0) & ((r < 0) != (b < 0)));
+    }
+
+    template<typename A, typename B>
+    inline floating_result<A, B> floordiv(A a, B b)
+    {
+        return std::floor(a / b);
+    }
+
+    template<typename A, typename B>
+    inline integral_result<A, B> mod(A a, B b)
+    {
+        typedef integral_result<A, B> R;
+        const R r = a % b;
+        return r + static_cast<R>(b) * static_cast<R>((r != 0) & ((r < 0) != (b < 0)));
+    }
+
+    template<typename A, typename B>
+    inline floating_result<A, B> mod(A a, B b)
+    {
+        floating_result<A, B> r = std::fmod(a, b);
+        if (r == 0) {
+            return std::copysign(r, b);
+        }
+        if ((r < 0) != (b < 0)) {
+            r += b;
+        }
+        return r;
+    }
+
+} // py2cpp
+
+#endif // PY2CPP_DIVISION_HPP_
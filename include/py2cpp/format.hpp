@@ -0,0 +1,173 @@
+#ifndef PY2CPP_FORMAT_HPP_
+#define PY2CPP_FORMAT_HPP_
+
+#include <cmath>
+#include <cstddef>
+#include <cstdio>
+#include <cstdlib>
+#include <ostream>
+#include <string>
+#include <unordered_map>
+#include <unordered_set>
+#include <vector>
+
+namespace py2cpp {
+
+    // write() formats a value like python's str(), write_repr() like repr()
+
+    template<typename T>
+    inline void write(std::ostream& os, const T& value);
+    inline void write(std::ostream& os, bool value);
+    inline void write(std::ostream& os, std::nullptr_t);
+    inline void write(std::ostream& os, float value);
+    inline void write(std::ostream& os, double value);
+    template<typename T, typename A>
+    inline void write(std::ostream& os, const std::vector<T, A>& value);
+    template<typename T, typename H, typename E, typename A>
+    inline void write(std::ostream& os, const std::unordered_set<T, H, E, A>& value);
+    template<typename K, typename V, typename H, typename E, typename A>
+    inline void write(std::ostream& os, const std::unordered_map<K, V, H, E, A>& value);
+
+    template<typename T>
+    inline void write_repr(std::ostream& os, const T& value)
+    {
+        write(os, value);
+    }
+
+    inline void write_repr(std::ostream& os, const std::string& value)
+    {
+        os << '\'';
+        for (char c : value) {
+            if (c == '\'' || c == '\\') {
+                os << '\\';
+            }
+            os << c;
+        }
+        os << '\'';
+    }
+
+    inline void write_repr(std::ostream& os, const char* value)
+    {
+        write_repr(os, std::string(value));
+    }
+
+    // shortest digits that read back as the same double, laid out like python
+    inline std::string repr(double value)
+    {
+        if (std::isnan(value)) {
+            return "nan";
+        }
+        if (std::isinf(value)) {
+            return value > 0 ? "inf" : "-inf";
+        }
+        char buf[32];
+        for (int precision = 0; precision <= 16; ++precision) {
+            std::snprintf(buf, sizeof(buf), "%.*e", precision, value);
+            if (std::strtod(buf, nullptr) == value) {
+                break;
+            }
+        }
+        // [-]d[.ddd]e(+|-)xx
+        const std::string s(buf);
+        const std::string::size_type e = s.find('e');
+        const int exponent = std::atoi(s.c_str() + e + 1);
+        const std::string sign = s[0] == '-' ? "-" : "";
+        std::string digits;
+        for (std::string::size_type i = sign.size(); i < e; ++i) {
+            if (s[i] != '.') {
+                digits += s[i];
+            }
+        }
+        if (exponent < -4 || exponent >= 16) {
+            std::string ret = sign + digits[0];
+            if (digits.size() > 1) {
+                ret += "." + digits.substr(1);
+            }
+            char suffix[16];
+            std::snprintf(suffix, sizeof(suffix), "e%c%02d", exponent < 0 ? '-' : '+', std::abs(exponent));
+            return ret + suffix;
+        }
+        if (exponent < 0) {
+            return sign + "0." + std::string(-exponent - 1, '0') + digits;
+        }
+        const std::string::size_type point = exponent + 1;
+        if (digits.size() <= point) {
+            return sign + digits + std::string(point - digits.size(), '0') + ".0";
+        }
+        return sign + digits.substr(0, point) + "." + digits.substr(point);
+    }
+
+    template<typename T>
+    inline void write(std::ostream& os, const T& value)
+    {
+        os << value;
+    }
+
+    inline void write(std::ostream& os, bool value)
+    {
+        os << (value ? "True" : "False");
+    }
+
+    // None
+    inline void write(std::ostream& os, std::nullptr_t)
+    {
+        os << "None";
+    }
+
+    inline void write(std::ostream& os, float value)
+    {
+        os << repr(value);
+    }
+
+    inline void write(std::ostream& os, double value)
+    {
+        os << repr(value);
+    }
+
+    template<typename T, typename A>
+    inline void write(std::ostream& os, const std::vector<T, A>& value)
+    {
+        os << '[';
+        for (std::size_t i = 0; i < value.size(); ++i) {
+            if (i) {
+                os << ", ";
+            }
+            write_repr(os, value[i]);
+        }
+        os << ']';
+    }
+
+    template<typename T, typename H, typename E, typename A>
+    inline void write(std::ostream& os, const std::unordered_set<T, H, E, A>& value)
+    {
+        if (value.empty()) {
+            os << "set()";
+            return;
+        }
+        const char* sep = "{";
+        for (const auto& x : value) {
+            os << sep;
+            write_repr(os, x);
+            sep = ", ";
+        }
+        os << '}';
+    }
+
+    template<typename K, typename V, typename H, typename E, typename A>
+    inline void write(std::ostream& os, const std::unordered_map<K, V, H, E, A>& value)
+    {
+        os << '{';
+        const char* sep = "";
+        for (const auto& x : value) {
+            os << sep;
+            write_repr(os, x.first);
+            os << ": ";
+            write_repr(os, x.second);
+            sep = ", ";
+        }
+        os << '}';
+    }
+
+} // py2cpp
+
+#endif // PY2CPP_FORMAT_HPP_
@@ -0,0 +1,38 @@
+#ifndef PY2CPP_POWER_HPP_
+#define PY2CPP_POWER_HPP_
+
+#include <type_traits>
+
+namespace py2cpp {
+
+    // x ** 2 of an expression, which is evaluated once
+    template<typename T>
+    inline T square(T x)
+    {
+        return x * x;
+    }
+
+    // python's ** of integers with a non-negative exponent, by squaring
+    template<typename A, typename B>
+    inline typename std::enable_if<
+        std::is_integral<A>::value && std::is_integral<B>::value,
+        typename std::common_type<A, B>::type>::type pow(A base, B exponent)
+    {
+        typedef typename std::common_type<A, B>::type R;
+        R result = 1;
+        R factor = base;
+        while (exponent > 0) {
+            if (exponent & 1) {
+                result *= factor;
+            }
+            exponent >>= 1;
+            if (exponent > 0) {
+                factor *= factor;
+            }
+        }
+        return result;
+    }
+
+} // py2cpp
+
+#endif // PY2CPP_POWER_HPP_
@@ -0,0 +1,151 @@
+#ifndef PY2CPP_PRINT_HPP_
+#define PY2CPP_PRINT_HPP_
+
+#include <cstddef>
+#include <iostream>
+#include <streambuf>
+#include <string>
+#include <vector>
+
+#include "format.hpp"
+
+namespace py2cpp {
+
+    // collects the output in one large block and hands it to an other stream
+    // buffer when it is full, on flush() and when it is destroyed at exit
+    class block_buffer : public std::streambuf
+    {
+    public:
+        explicit block_buffer(std::streambuf* target, std::size_t size = 1 << 16)
+            : target_(target), buffer_(size)
+        {
+            setp(buffer_.data(), buffer_.data() + buffer_.size());
+        }
+
+        ~block_buffer()
+        {
+            sync();
+        }
+
+    protected:
+        int_type overflow(int_type c) override
+        {
+            if (!write_out()) {
+                return traits_type::eof();
+            }
+            if (!traits_type::eq_int_type(c, traits_type::eof())) {
+                *pptr() = traits_type::to_char_type(c);
+                pbump(1);
+            }
+            return traits_type::not_eof(c);
+        }
+
+        int sync() override
+        {
+            if (!write_out()) {
+                return -1;
+            }
+            return target_->pubsync();
+        }
+
+    private:
+        bool write_out()
+        {
+            const std::streamsize n = pptr() - pbase();
+            if (n > 0 && target_->sputn(pbase(), n) != n) {
+                return false;
+            }
+            setp(buffer_.data(), buffer_.data() + buffer_.size());
+            return true;
+        }
+
+        std::streambuf* target_;
+        std::vector<char> buffer_;
+    };
+
+    // writes and reads of the standard streams need not be ordered with
+    // C stdio, which makes them faster
+    static const bool stdio_unsynced = (std::ios_base::sync_with_stdio(false), true);
+
+    // sys.stdout
+    inline std::ostream& out()
+    {
+        static block_buffer buffer(std::cout.rdbuf());
+        static std::ostream stream(&buffer);
+        return stream;
+    }
+
+    // sys.stderr; print() flushes it at the end of every line, like python
+    inline std::ostream& err()
+    {
+        static block_buffer buffer(std::cerr.rdbuf());
+        static std::ostream stream(&buffer);
+        return stream;
+    }
+
+    // the keyword arguments of print()
+    class print_options
+    {
+    public:
+        print_options& sep(const std::string& value)
+        {
+            sep_ = value;
+            return *this;
+        }
+
+        print_options& end(const std::string& value)
+        {
+            end_ = value;
+            return *this;
+        }
+
+        print_options& file(std::ostream& value)
+        {
+            file_ = &value;
+            return *this;
+        }
+
+        print_options& flush(bool value)
+        {
+            flush_ = value;
+            return *this;
+        }
+
+        std::string sep_ = " ";
+        std::string end_ = "\n";
+        std::ostream* file_ = nullptr;
+        bool flush_ = false;
+    };
+
+    inline void print()
+    {
+        out() << '\n';
+    }
+
+    // python's print(): the str() of the arguments separated by spaces
+    template<typename T, typename... Args>
+    inline void print(const T& first, const Args&... rest)
+    {
+        std::ostream& os = out();
+        write(os, first);
+        using expand = int[];
+        (void)expand{0, (os << ' ', write(os, rest), 0)...};
+        os << '\n';
+    }
+
+    template<typename... Args>
+    inline void print(const print_options& options, const Args&... args)
+    {
+        std::ostream& os = options.file_ ? *options.file_ : out();
+        bool first = true;
+        using expand = int[];
+        (void)expand{0, ((first ? (void)(first = false) : (void)(os << options.sep_)), write(os, args), 0)...};
+        os << options.end_;
+        if (options.flush_ || &os == &err()) {
+            os.flush();
+        }
+    }
+
+} // py2cpp
+
+#endif // PY2CPP_PRINT_HPP_
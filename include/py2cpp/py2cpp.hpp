@@ -1,6 +1,23 @@
 #ifndef PY2CPP_PY2CPP_HPP_
 #define PY2CPP_PY2CPP_HPP_
 
+// the whole runtime; generated code includes only the headers it uses
+
+#include <complex>
+#include <string>
+#include <tuple>
+#include <unordered_map>
+#include <unordered_set>
+#include <vector>
+
+#include "containers.hpp"
+#include "division.hpp"
+#include "format.hpp"
+#include "power.hpp"
+#include "print.hpp"
 #include "range.hpp"
+#include "str.hpp"
+#include "tables.hpp"
+#include "utility.hpp"
 
 #endif // PY2CPP_PY2CPP_HPP_
@@ -1,19 +1,94 @@
 #ifndef PY2CPP_RANGE_HPP_
 #define PY2CPP_RANGE_HPP_
 
-#include <boost/range/irange.hpp>
+#include <cstddef>
+#include <iterator>
+#include <stdexcept>
+#include <type_traits>
 
 namespace py2cpp {
 
-    template<typename... Args>
-    inline auto range(Args&&... args) -> decltype(boost::irange(std::forward<Args>(args)...))
+    // the arithmetic progression of python's range()
+    template<typename T>
+    class basic_range
     {
-        return boost::irange(std::forward<Args>(args)...);
+    public:
+        class iterator
+        {
+        public:
+            typedef std::input_iterator_tag iterator_category;
+            typedef T value_type;
+            typedef std::ptrdiff_t difference_type;
+            typedef const T* pointer;
+            typedef T reference;
+
+            iterator(T value, T step) : value_(value), step_(step) {}
+
+            T operator*() const { return value_; }
+
+            iterator& operator++()
+            {
+                value_ += step_;
+                return *this;
+            }
+
+            iterator operator++(int)
+            {
+                iterator ret = *this;
+                ++*this;
+                return ret;
+            }
+
+            bool operator==(const iterator& other) const { return value_ == other.value_; }
+            bool operator!=(const iterator& other) const { return value_ != other.value_; }
+
+        private:
+            T value_;
+            T step_;
+        };
+
+        basic_range(T start, T stop, T step) : start_(start), step_(step), size_(0)
+        {
+            if (step == 0) {
+                throw std::invalid_argument("range() arg 3 must not be zero");
+            }
+            if (step > 0 && start < stop) {
+                size_ = (stop - start - 1) / step + 1;
+            } else if (step < 0 && start > stop) {
+                size_ = (start - stop - 1) / -step + 1;
+            }
+        }
+
+        iterator begin() const { return iterator(start_, step_); }
+        // the first value past the end, so that iterators compare by value
+        iterator end() const { return iterator(start_ + size_ * step_, step_); }
+
+        T size() const { return size_; }
+        bool empty() const { return size_ == 0; }
+        T operator[](T i) const { return start_ + i * step_; }
+
+    private:
+        T start_;
+        T step_;
+        T size_;
+    };
+
+    template<typename T>
+    inline basic_range<T> range(T stop)
+    {
+        return basic_range<T>(0, stop, 1);
+    }
+
+    template<typename T, typename U>
+    inline basic_range<typename std::common_type<T, U>::type> range(T start, U stop)
+    {
+        return basic_range<typename std::common_type<T, U>::type>(start, stop, 1);
     }
 
-    inline auto range(int last) -> decltype(range(0, last))
+    template<typename T, typename U, typename V>
+    inline basic_range<typename std::common_type<T, U, V>::type> range(T start, U stop, V step)
     {
-        return range(0, last);
+        return basic_range<typename std::common_type<T, U, V>::type>(start, stop, step);
     }
 
 } // py2cpp
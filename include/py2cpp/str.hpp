@@ -0,0 +1,166 @@
+#ifndef PY2CPP_STR_HPP_
+#define PY2CPP_STR_HPP_
+
+#include <cctype>
+#include <sstream>
+#include <stdexcept>
+#include <string>
+#include <vector>
+
+#include "format.hpp"
+
+namespace py2cpp {
+
+    template<typename T>
+    inline std::string str(const T& value)
+    {
+        std::ostringstream os;
+        write(os, value);
+        return os.str();
+    }
+
+    inline std::string str(const std::string& value)
+    {
+        return value;
+    }
+
+    inline std::string upper(std::string s)
+    {
+        for (char& c : s) {
+            c = static_cast<char>(std::toupper(static_cast<unsigned char>(c)));
+        }
+        return s;
+    }
+
+    inline std::string lower(std::string s)
+    {
+        for (char& c : s) {
+            c = static_cast<char>(std::tolower(static_cast<unsigned char>(c)));
+        }
+        return s;
+    }
+
+    inline std::string lstrip(const std::string& s)
+    {
+        std::string::size_type i = 0;
+        while (i < s.size() && std::isspace(static_cast<unsigned char>(s[i]))) {
+            ++i;
+        }
+        return s.substr(i);
+    }
+
+    inline std::string rstrip(const std::string& s)
+    {
+        std::string::size_type i = s.size();
+        while (i > 0 && std::isspace(static_cast<unsigned char>(s[i - 1]))) {
+            --i;
+        }
+        return s.substr(0, i);
+    }
+
+    inline std::string strip(const std::string& s)
+    {
+        return lstrip(rstrip(s));
+    }
+
+    inline bool startswith(const std::string& s, const std::string& prefix)
+    {
+        return s.compare(0, prefix.size(), prefix) == 0;
+    }
+
+    inline bool endswith(const std::string& s, const std::string& suffix)
+    {
+        return s.size() >= suffix.size() && s.compare(s.size() - suffix.size(), suffix.size(), suffix) == 0;
+    }
+
+    // s.split(): runs of whitespace separate the words
+    inline std::vector<std::string> split(const std::string& s)
+    {
+        std::vector<std::string> ret;
+        std::string::size_type i = 0;
+        while (true) {
+            while (i < s.size() && std::isspace(static_cast<unsigned char>(s[i]))) {
+                ++i;
+            }
+            if (i == s.size()) {
+                return ret;
+            }
+            std::string::size_type j = i;
+            while (j < s.size() && !std::isspace(static_cast<unsigned char>(s[j]))) {
+                ++j;
+            }
+            ret.push_back(s.substr(i, j - i));
+            i = j;
+        }
+    }
+
+    inline std::vector<std::string> split(const std::string& s, const std::string& sep)
+    {
+        if (sep.empty()) {
+            throw std::invalid_argument("empty separator");
+        }
+        std::vector<std::string> ret;
+        std::string::size_type start = 0;
+        std::string::size_type end;
+        while ((end = s.find(sep, start)) != std::string::npos) {
+            ret.push_back(s.substr(start, end - start));
+            start = end + sep.size();
+        }
+        ret.push_back(s.substr(start));
+        return ret;
+    }
+
+    // sep.join(items)
+    template<typename C>
+    inline std::string join(const std::string& sep, const C& items)
+    {
+        std::string ret;
+        bool first = true;
+        for (const auto& x : items) {
+            if (!first) {
+                ret += sep;
+            }
+            ret += x;
+            first = false;
+        }
+        return ret;
+    }
+
+    inline std::string replace(const std::string& s, const std::string& old, const std::string& new_)
+    {
+        std::string ret;
+        if (old.empty()) {
+            // new_ goes around every character
+            for (char c : s) {
+                ret += new_;
+                ret += c;
+            }
+            return ret + new_;
+        }
+        std::string::size_type start = 0;
+        std::string::size_type end;
+        while ((end = s.find(old, start)) != std::string::npos) {
+            ret.append(s, start, end - start);
+            ret += new_;
+            start = end + old.size();
+        }
+        ret.append(s, start, std::string::npos);
+        return ret;
+    }
+
+    // s * n
+    inline std::string repeat(const std::string& s, long n)
+    {
+        std::string ret;
+        if (n > 0) {
+            ret.reserve(s.size() * n);
+        }
+        for (long i = 0; i < n; ++i) {
+            ret += s;
+        }
+        return ret;
+    }
+
+} // py2cpp
+
+#endif // PY2CPP_STR_HPP_
@@ -0,0 +1,103 @@
+#ifndef PY2CPP_TABLES_HPP_
+#define PY2CPP_TABLES_HPP_
+
+#include <algorithm>
+#include <array>
+#include <cstddef>
+#include <cstring>
+#include <stdexcept>
+#include <string>
+#include <utility>
+
+namespace py2cpp {
+
+    namespace detail {
+
+        template<typename A, typename B>
+        inline bool key_less(const A& a, const B& b)
+        {
+            return a < b;
+        }
+
+        inline bool key_less(const char* a, const char* b)
+        {
+            return std::strcmp(a, b) < 0;
+        }
+
+        inline bool key_less(const char* a, const std::string& b)
+        {
+            return b.compare(a) > 0;
+        }
+
+        inline bool key_less(const std::string& a, const char* b)
+        {
+            return a.compare(b) < 0;
+        }
+
+    } // detail
+
+    // a dict computed when converting: its items sorted by key, which are
+    // looked up by binary search
+    template<typename K, typename V, std::size_t N>
+    struct static_map
+    {
+        typedef K key_type;
+        typedef V mapped_type;
+        typedef std::pair<K, V> value_type;
+        typedef typename std::array<value_type, N>::const_iterator const_iterator;
+
+        std::array<value_type, N> items;
+
+        template<typename T>
+        const value_type* find(const T& key) const
+        {
+            const_iterator it = std::lower_bound(items.begin(), items.end(), key,
+                [](const value_type& item, const T& k) { return detail::key_less(item.first, k); });
+            if (it == items.end() || detail::key_less(key, it->first)) {
+                return nullptr;
+            }
+            return &*it;
+        }
+
+        template<typename T>
+        const V& operator[](const T& key) const
+        {
+            const value_type* item = find(key);
+            if (item == nullptr) {
+                throw std::out_of_range("KeyError");
+            }
+            return item->second;
+        }
+
+        template<typename T>
+        V get(const T& key, const V& default_value = V()) const
+        {
+            const value_type* item = find(key);
+            return item == nullptr ? default_value : item->second;
+        }
+
+        template<typename T>
+        std::size_t count(const T& key) const
+        {
+            return find(key) == nullptr ? 0 : 1;
+        }
+
+        constexpr std::size_t size() const
+        {
+            return N;
+        }
+
+        const_iterator begin() const
+        {
+            return items.begin();
+        }
+
+        const_iterator end() const
+        {
+            return items.end();
+        }
+    };
+
+} // py2cpp
+
+#endif // PY2CPP_TABLES_HPP_
@@ -0,0 +1,16 @@
+#ifndef PY2CPP_UTILITY_HPP_
+#define PY2CPP_UTILITY_HPP_
+
+namespace py2cpp {
+
+    // a temporary as an argument of a T& parameter; it lives until the end
+    // of the full expression of the call
+    template<typename T>
+    inline T& lvalue(T&& value)
+    {
+        return value;
+    }
+
+} // py2cpp
+
+#endif // PY2CPP_UTILITY_HPP_
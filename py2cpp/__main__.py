@@ -4,36 +4,92 @@
 from __future__ import print_function
 
 import argparse
+import io
+import json
 import sys
 import os
 
-import ast
-
+from py2cpp import batch
+from py2cpp import driver
+from py2cpp.cache import Cache
 from py2cpp.converter import Converter
-from py2cpp.cpp import BuildContext
+from py2cpp.profiler import Profiler
 
 
 def main(argv):
     parser = argparse.ArgumentParser()
-    parser.add_argument("input", type=argparse.FileType("r"))
+    parser.add_argument("input", nargs="+",
+                        help="source file, or files, directories and globs with --output-dir")
     parser.add_argument("--using-qt", action="store_true")
+    parser.add_argument("-o", "--output", type=argparse.FileType("w"), default=sys.stdout)
+    parser.add_argument("-d", "--output-dir",
+                        help="batch mode: write one .cpp per source file under this directory")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="number of worker processes in batch mode (default: CPU count)")
+    parser.add_argument("--cache-dir",
+                        help="reuse the output of unchanged sources from this directory")
+    parser.add_argument("--cache-size", type=int, default=None,
+                        help="maximum size of the cache in bytes")
+    parser.add_argument("--clear-cache", action="store_true",
+                        help="remove every cache entry first, e.g. after changing a custom hook")
+    parser.add_argument("--cache-stats", action="store_true",
+                        help="print cache statistics as JSON to stderr")
+    parser.add_argument("--profile", type=argparse.FileType("w"),
+                        help="write the time spent in each phase as JSON to this file")
+    parser.add_argument("--profile-stacks", type=argparse.FileType("w"),
+                        help="write the profile in the folded stack format of flame graphs")
+    parser.add_argument("--constant-tables", action="store_true",
+                        help="evaluate module level lookup tables into static constexpr arrays")
 
     args = parser.parse_args(argv)
 
-    if args.using_qt:
-        from py2cpp import qt
+    cache = None
+    if args.cache_dir is not None:
+        options = {"tables": True} if args.constant_tables else None
+        cache = Cache(args.cache_dir, max_bytes=args.cache_size, options=options)
+        if args.clear_cache:
+            cache.clear()
+
+    profiler = None
+    if args.profile is not None or args.profile_stacks is not None:
+        if args.output_dir is not None:
+            parser.error("--profile is not supported with --output-dir")
+        profiler = Profiler()
+
+    if args.output_dir is not None:
+        results = batch.run(args.input, args.output_dir, processes=args.jobs,
+                            using_qt=args.using_qt, cache=cache, tables=args.constant_tables)
+        failed = [x for x in results if x.error is not None]
+        for result in failed:
+            print("{}: {}".format(result.source, result.error), file=sys.stderr)
+        print("{} converted, {} failed".format(len(results) - len(failed), len(failed)), file=sys.stderr)
+        ret = 1 if failed else 0
+    else:
+        if len(args.input) != 1 or not os.path.isfile(args.input[0]):
+            parser.error("a single source file is required without --output-dir")
+
+        if args.using_qt:
+            from py2cpp import qt
+
+        converter = None
+        if args.constant_tables:
+            converter = Converter(store=cache, profiler=profiler, tables=True)
+        with io.open(args.input[0], encoding="utf-8") as fp:
+            driver.transpile(fp.read(), args.input[0], args.output, cache=cache,
+                             converter=converter, profiler=profiler)
+        ret = 0
 
-    node = ast.parse(args.input.read())
-    conv = Converter()
-    cpp_node = conv.visit(node)
+    if args.profile is not None:
+        profiler.write_json(args.profile)
+    if args.profile_stacks is not None:
+        profiler.write_folded(args.profile_stacks)
 
-    ctx = BuildContext.create()
-    print("// generate by py2cpp")
-    print("// original source code:", args.input.name)
-    print('#include "py2cpp/py2cpp.hpp"\n')
-    print(cpp_node.build(ctx))
+    if cache is not None:
+        cache.evict()
+        if args.cache_stats:
+            print(json.dumps(cache.stats(), sort_keys=True), file=sys.stderr)
 
-    return 0
+    return ret
 
 
 if __name__ == '__main__':
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+
+import collections
+import glob
+import io
+import multiprocessing
+import os
+
+from . import driver
+from .converter import Converter
+
+
+Job = collections.namedtuple("Job", ["source", "name", "output"])
+# hits and misses are the lookups of the job in the transpile cache
+Result = collections.namedtuple("Result", ["source", "output", "error", "cached", "hits", "misses"])
+
+GLOB_CHARS = "*?["
+
+
+def _glob_root(pattern):
+    """directory part of *pattern* before the first wildcard"""
+    parts = []
+    for part in pattern.split(os.sep):
+        if any(x in part for x in GLOB_CHARS):
+            break
+        parts.append(part)
+    return os.sep.join(parts) or os.curdir
+
+
+def collect(inputs):
+    """
+    Expand files, directories and glob patterns into (source, relpath) pairs.
+
+    :type inputs: list of str
+    :rtype: list of (str, str)
+    """
+    found = {}
+    for item in inputs:
+        if os.path.isdir(item):
+            root = item
+            paths = []
+            for dirpath, dirnames, filenames in os.walk(item):
+                paths.extend(os.path.join(dirpath, x) for x in filenames if x.endswith(".py"))
+        elif any(x in item for x in GLOB_CHARS):
+            root = _glob_root(item)
+            paths = [x for x in glob.glob(item) if os.path.isfile(x)]
+        else:
+            root = os.path.dirname(item)
+            paths = [item]
+        for path in paths:
+            found.setdefault(os.path.abspath(path), os.path.relpath(path, root or os.curdir))
+    return sorted(found.items(), key=lambda x: (x[1], x[0]))
+
+
+def plan(inputs, output_dir):
+    """
+    :type inputs: list of str
+    :type output_dir: str
+    :rtype: list of Job
+    """
+    jobs = []
+    for source, relpath in collect(inputs):
+        output = os.path.join(output_dir, os.path.splitext(relpath)[0] + ".cpp")
+        jobs.append(Job(source=source, name=relpath, output=output))
+    return jobs
+
+
+# transpile cache and converter of the current worker process
+_cache = None
+_converter = None
+
+
+def _init_worker(using_qt, cache=None, tables=False):
+    global _cache, _converter
+    if using_qt:
+        from . import qt
+    _cache = cache
+    _converter = Converter(store=cache, tables=True) if tables else None
+
+
+def run_job(job):
+    """
+    :type job: Job
+    :rtype: Result
+    """
+    counts = (_cache.hits, _cache.misses) if _cache is not None else (0, 0)
+
+    def result(error, cached):
+        if _cache is None:
+            return Result(job.source, job.output, error, cached, 0, 0)
+        return Result(job.source, job.output, error, cached, _cache.hits - counts[0], _cache.misses - counts[1])
+
+    try:
+        with io.open(job.source, encoding="utf-8") as fp:
+            source = fp.read()
+        stream = io.StringIO()
+        cached = driver.transpile(source, job.name, stream, cache=_cache, converter=_converter)
+        code = stream.getvalue()
+        if cached and _unchanged(job.output, code):
+            return result(None, True)
+        dirname = os.path.dirname(job.output)
+        if dirname and not os.path.isdir(dirname):
+            try:
+                os.makedirs(dirname)
+            except OSError:
+                # created by another worker
+                if not os.path.isdir(dirname):
+                    raise
+        with io.open(job.output, "w", encoding="utf-8") as fp:
+            fp.write(code)
+    except Exception as e:
+        return result("{}: {}".format(e.__class__.__name__, e), False)
+    return result(None, cached)
+
+
+def _unchanged(path, code):
+    try:
+        with io.open(path, encoding="utf-8") as fp:
+            return fp.read() == code
+    except (IOError, OSError):
+        return False
+
+
+def run(inputs, output_dir, processes=None, using_qt=False, cache=None, tables=False):
+    """
+    Transpile every python file in *inputs* into *output_dir*.
+
+    Failures are reported in the result list instead of stopping the
+    batch. Results are sorted by output path, whatever the number of
+    processes.
+
+    :type inputs: list of str
+    :type output_dir: str
+    :type processes: int
+    :type cache: py2cpp.cache.Cache
+    :param tables: evaluate module level constant tables (see py2cpp.tables)
+    :rtype: list of Result
+    """
+    jobs = []
+    conflicts = []
+    outputs = {}
+    for job in plan(inputs, output_dir):
+        if job.output in outputs:
+            error = "output conflicts with {}".format(outputs[job.output])
+            conflicts.append(Result(job.source, job.output, error, False, 0, 0))
+            continue
+        outputs[job.output] = job.source
+        jobs.append(job)
+    if processes == 1 or len(jobs) < 2:
+        _init_worker(using_qt, cache, tables)
+        results = [run_job(x) for x in jobs]
+    else:
+        pool = multiprocessing.Pool(processes, _init_worker, (using_qt, cache, tables))
+        try:
+            results = pool.map(run_job, jobs)
+        finally:
+            pool.close()
+            pool.join()
+        if cache is not None:
+            # workers count on their own copies
+            cache.hits += sum(x.hits for x in results)
+            cache.misses += sum(x.misses for x in results)
+    results += conflicts
+    results.sort(key=lambda x: (x.output, x.source))
+    return results
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+
+import hashlib
+import inspect
+import io
+import os
+import tempfile
+
+from . import __version__
+from . import cpp
+from . import hook
+from . import transformer
+
+# modules whose code changes the generated output
+MODULES = ["converter", "cpp", "docstring", "hook", "infer", "passing", "tables", "transformer", "types"]
+
+SUFFIX = ".cpp"
+
+
+def _class_fingerprint(cls):
+    try:
+        source = inspect.getsource(cls)
+    except (IOError, OSError, TypeError):
+        source = ""
+    return "{}.{}:{}:{}".format(cls.__module__, cls.__name__, getattr(cls, "version", None), source)
+
+
+def fingerprint(hooks=None, transformers=None, registry=None, options=None):
+    """
+    Digest of everything besides the source code that affects the output:
+    the py2cpp version and code, the hook and transformer classes, the
+    type registry entries and the converter options.
+
+    :param options: keyword arguments of the Converter, e.g.
+                    ``{"tables": True}``
+    :rtype: str
+    """
+    hooks = hook.Hooks if hooks is None else hooks
+    transformers = transformer.Transformers if transformers is None else transformers
+    registry = cpp.type_registry if registry is None else registry
+    digest = hashlib.sha1()
+    digest.update(__version__.encode("utf-8"))
+    package = os.path.dirname(os.path.abspath(__file__))
+    for name in MODULES:
+        with open(os.path.join(package, name + ".py"), "rb") as fp:
+            digest.update(fp.read())
+    for cls in list(hooks) + list(transformers):
+        digest.update(_class_fingerprint(cls).encode("utf-8"))
+    for key, value in sorted(registry.type_map.items(), key=lambda x: repr(x[0])):
+        digest.update(repr((key, value)).encode("utf-8"))
+    for key, value in sorted(registry.generics.items()):
+        digest.update(repr((key, value)).encode("utf-8"))
+    for key, value in sorted(getattr(registry, "headers", {}).items()):
+        digest.update(repr((key, value)).encode("utf-8"))
+    # providers by description; what they resolved depends on the input
+    for provider in registry.providers:
+        name = getattr(provider, "__name__", None)
+        if name is not None:
+            digest.update("{}.{}".format(provider.__module__, name).encode("utf-8"))
+        else:
+            digest.update(repr(provider).encode("utf-8"))
+    for key, value in sorted((options or {}).items()):
+        digest.update(repr((key, value)).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class Cache(object):
+    """On-disk cache of generated code, keyed by source content.
+
+    Entries are plain files; their modification time is refreshed on every
+    hit so that evict() can drop the least recently used ones.
+    """
+    def __init__(self, path, max_bytes=None, hooks=None, transformers=None, registry=None, options=None):
+        """
+        :type path: str
+        :type max_bytes: int
+        :param max_bytes: size limit applied by evict(), None for unlimited
+        :param options: see fingerprint()
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hooks = hooks
+        self.transformers = transformers
+        self.registry = registry
+        self.options = options
+        self.config = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, source):
+        """
+        :type source: str
+        :rtype: str
+        """
+        if self.config is None:
+            self.config = fingerprint(self.hooks, self.transformers, self.registry, self.options)
+        digest = hashlib.sha1(self.config.encode("ascii"))
+        digest.update(source.encode("utf-8"))
+        return digest.hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.path, key[:2], key + SUFFIX)
+
+    def get(self, key):
+        """
+        :rtype: str or None
+        """
+        path = self.entry_path(key)
+        try:
+            with io.open(path, encoding="utf-8") as fp:
+                code = fp.read()
+        except (IOError, OSError):
+            self.misses += 1
+            return None
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        self.hits += 1
+        return code
+
+    def put(self, key, code):
+        path = self.entry_path(key)
+        dirname = os.path.dirname(path)
+        if not os.path.isdir(dirname):
+            try:
+                os.makedirs(dirname)
+            except OSError:
+                if not os.path.isdir(dirname):
+                    raise
+        fd, temp = tempfile.mkstemp(dir=dirname, suffix=".tmp")
+        with io.open(fd, "w", encoding="utf-8") as fp:
+            fp.write(code)
+        os.replace(temp, path)
+
+    def entries(self):
+        """
+        :rtype: list of (float, int, str)
+        :return: (mtime, size, path) of every entry, oldest first
+        """
+        result = []
+        if not os.path.isdir(self.path):
+            return result
+        for dirpath, dirnames, filenames in os.walk(self.path):
+            for name in filenames:
+                if not name.endswith(SUFFIX):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                result.append((st.st_mtime, st.st_size, path))
+        result.sort()
+        return result
+
+    def evict(self):
+        """remove least recently used entries until the cache fits in max_bytes"""
+        if self.max_bytes is None:
+            return
+        entries = self.entries()
+        total = sum(x[1] for x in entries)
+        for mtime, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self.evictions += 1
+
+    def clear(self):
+        """remove every entry, e.g. after changing a hook outside py2cpp"""
+        for mtime, size, path in self.entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self):
+        """
+        :rtype: dict
+        """
+        entries = self.entries()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(entries),
+            "bytes": sum(x[1] for x in entries),
+        }
@@ -0,0 +1,78 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Thin client of py2cpp.server; imports nothing from the transpiler."""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import socket
+import sys
+
+
+class Client(object):
+    def __init__(self, path):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+        self.rfile = self.sock.makefile("rb")
+        self.next_id = 0
+
+    def close(self):
+        self.rfile.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def request(self, **kwargs):
+        """
+        :rtype: dict
+        """
+        self.next_id += 1
+        kwargs.setdefault("id", self.next_id)
+        self.sock.sendall((json.dumps(kwargs) + "\n").encode("utf-8"))
+        line = self.rfile.readline()
+        if not line:
+            raise IOError("connection closed by server")
+        return json.loads(line.decode("utf-8"))
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("input", nargs="*")
+    parser.add_argument("--socket", required=True)
+    parser.add_argument("-o", "--output", help="output file, or directory with several inputs")
+    parser.add_argument("--stats", action="store_true")
+    parser.add_argument("--shutdown", action="store_true")
+
+    args = parser.parse_args(argv)
+
+    ret = 0
+    with Client(args.socket) as client:
+        for path in args.input:
+            request = {"path": os.path.abspath(path), "name": path}
+            if args.output and len(args.input) > 1:
+                name = os.path.splitext(os.path.basename(path))[0] + ".cpp"
+                request["output"] = os.path.abspath(os.path.join(args.output, name))
+            elif args.output:
+                request["output"] = os.path.abspath(args.output)
+            response = client.request(**request)
+            if "error" in response:
+                print("{}: {}".format(path, response["error"]), file=sys.stderr)
+                ret = 1
+            elif "code" in response:
+                sys.stdout.write(response["code"])
+        if args.stats:
+            print(json.dumps(client.request(command="stats")["stats"], sort_keys=True))
+        if args.shutdown:
+            client.request(command="shutdown")
+    return ret
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
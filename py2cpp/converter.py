@@ -3,12 +3,20 @@
 from __future__ import absolute_import
 
 import ast
+import collections
+import copy
+import hashlib
 
 import six
 
+from . import cache
 from . import cpp
 from . import hook
+from . import infer
+from . import passing
+from . import tables
 from . import transformer
+from . import types
 
 BOOLOP_MAP = {
     ast.And: "&&",
@@ -21,13 +29,14 @@ OPERATOR_MAP = {
     ast.Mult: "*",
     ast.Div: "/",
     ast.Mod: "%",
-    #ast.Pow: "**",  # special case
+    #ast.Pow: "**",  # see hook.PowerHook
     ast.LShift: "<<",
     ast.RShift: ">>",
     ast.BitOr: "|",
     ast.BitXor: "^",
     ast.BitAnd: "&",
-    #ast.FloorDiv: "//",  # special case
+    # python's semantics if an operand may be negative; see hook.DivisionHook
+    ast.FloorDiv: "/",
 }
 
 UNARYOP_MAP = {
@@ -50,33 +59,228 @@ CMPOP_MAP = {
     #ast.NotIn: " not in ",  # special case
 }
 
+# top-level FunctionDef/ClassDef of the converted module
+Definition = collections.namedtuple("Definition", ["name", "fingerprint", "index", "reused"])
+
+DEFINITION_TYPES = (ast.FunctionDef, ast.ClassDef)
+
+
+def signature(node):
+    """
+    Part of a definition that its callers depend on.
+
+    :type node: ast.FunctionDef or ast.ClassDef
+    :rtype: str
+    """
+    if isinstance(node, ast.FunctionDef):
+        returns = getattr(node, "returns", None)
+        return "\0".join([
+            node.name,
+            ast.dump(node.args),
+            ast.dump(returns) if returns is not None else "",
+            ast.get_docstring(node) or "",
+        ])
+    methods = [signature(x) for x in node.body if isinstance(x, ast.FunctionDef)]
+    bases = [ast.dump(x) for x in node.bases]
+    return "\0".join([node.name] + bases + methods)
+
+
 class Converter(ast.NodeVisitor):
-    def __init__(self, transformers=transformer.Transformers, hooks=hook.Hooks):
+    def __init__(self, transformers=transformer.Transformers, hooks=hook.Hooks,
+                 incremental=False, store=None, profiler=None, tables=False):
         """
         :type transformers: list of NodeTransformer
+        :param incremental: fingerprint top-level definitions
+        :param store: generated code by fingerprint, an object with
+                      get(key) and put(key, code) such as cache.Cache
+        :type profiler: py2cpp.profiler.Profiler
+        :param tables: compute the module level tables when converting;
+                       see tables.py
         """
         self.transformers = [x() for x in transformers]
+        self.pipeline = transformer.CompositeTransformer(self.transformers, profiler)
         self.hooks = [x(self) for x in hooks]
+        self.hook_table = {}
+        self.arguments = []
+        self.incremental = incremental or store is not None
+        self.store = store
+        self.definitions = collections.OrderedDict()
+        self.module_types = infer.ModuleTypes()
+        # FunctionTypes of the functions being converted
+        self.scopes = []
+        self.config = None
+        self.profiler = profiler
+        self.tables = tables
+        if profiler is not None:
+            self.visit = self.profiled_visit
+
+    def options(self):
+        """the keyword arguments that change the output, for cache.fingerprint"""
+        return {"tables": True} if self.tables else {}
+
+    def reset(self):
+        """forget the state of the last converted module"""
         self.arguments = []
+        self.definitions = collections.OrderedDict()
+        self.module_types = infer.ModuleTypes()
+        self.scopes = []
 
     def visit(self, node):
         ret = super(Converter, self).visit(node)
         if ret is None:
             return cpp.UnsupportedNode(node)
-        for hook in self.hooks:
+        hooks = self.hook_table.get(node.__class__)
+        if hooks is None:
+            hooks = self.hooks_for(node.__class__)
+        for hook in hooks:
             if hook.match(node):
                 return hook.apply(node, ret)
         return ret
 
+    def profiled_visit(self, node):
+        """visit() recording visit_* methods and hooks in the profiler"""
+        profiler = self.profiler
+        with profiler.measure("convert:visit_" + node.__class__.__name__):
+            ret = super(Converter, self).visit(node)
+        if ret is None:
+            return cpp.UnsupportedNode(node)
+        hooks = self.hook_table.get(node.__class__)
+        if hooks is None:
+            hooks = self.hooks_for(node.__class__)
+        for hook in hooks:
+            name = "hook:" + hook.__class__.__name__
+            with profiler.measure(name + ".match"):
+                matched = hook.match(node)
+            if matched:
+                with profiler.measure(name + ".apply"):
+                    return hook.apply(node, ret)
+        return ret
+
+    def hooks_for(self, node_type):
+        """
+        :type node_type: type
+        :rtype: list of Hook
+        """
+        hooks = [x for x in self.hooks
+                 if x.node_types is None or issubclass(node_type, x.node_types)]
+        self.hook_table[node_type] = hooks
+        return hooks
+
     #
     # Module
     #
 
     def visit_Module(self, node):
+        self.reset()
+        if self.tables:
+            tables.replace_tables(node)
         # apply transformers
-        for transformer in self.transformers:
-            node = transformer.visit(node)
-        return cpp.Module(body=[self.visit(x) for x in node.body])
+        node = self.pipeline.visit(node)
+        self.module_types = infer.ModuleTypes(node)
+        passing.pass_parameters(node, self.module_types)
+        if not self.incremental:
+            return cpp.Module(body=[self.visit(x) for x in node.body])
+        fingerprints = self.fingerprint_definitions(node)
+        body = []
+        for i, x in enumerate(node.body):
+            fingerprint = fingerprints[i]
+            if fingerprint is None:
+                body.append(self.visit(x))
+                continue
+            code = self.store.get(fingerprint) if self.store is not None else None
+            if code is None:
+                body.append(self.visit(x))
+            else:
+                body.append(cpp.Verbatim.load(code))
+            self.definitions[x.name] = Definition(x.name, fingerprint, i, code is not None)
+        return cpp.Module(body=body)
+
+    #
+    # incremental conversion
+    #
+
+    def fingerprint_definitions(self, node):
+        """
+        Fingerprint each top-level definition from its own AST, the
+        signatures of the module level names it refers to and the
+        converter configuration.
+
+        :type node: ast.Module
+        :rtype: list of str or None
+        """
+        if self.config is None:
+            self.config = cache.fingerprint(
+                hooks=[x.__class__ for x in self.hooks],
+                transformers=[x.__class__ for x in self.transformers],
+                options=self.options())
+        signatures = {}
+        for x in node.body:
+            if isinstance(x, DEFINITION_TYPES):
+                signatures[x.name] = signature(x)
+                modes = self.module_types.passing.get(x)
+                if modes:
+                    signatures[x.name] += "\0" + repr(sorted(modes.items()))
+            elif isinstance(x, (ast.Assign, ast.AugAssign)):
+                targets = x.targets if isinstance(x, ast.Assign) else [x.target]
+                for target in targets:
+                    for name in ast.walk(target):
+                        if isinstance(name, ast.Name):
+                            signatures[name.id] = signatures.get(name.id, "") + ast.dump(x)
+        result = []
+        for x in node.body:
+            if not isinstance(x, DEFINITION_TYPES):
+                result.append(None)
+                continue
+            digest = hashlib.sha1(self.config.encode("ascii"))
+            digest.update(ast.dump(x).encode("utf-8"))
+            # the parameter modes also depend on how the rest of the module
+            # uses the definition, e.g. as a value
+            for y in ast.walk(x):
+                modes = self.module_types.passing.get(y)
+                if modes:
+                    digest.update(repr(sorted(modes.items())).encode("utf-8"))
+            names = set(y.id for y in ast.walk(x) if isinstance(y, ast.Name))
+            for name in sorted(names):
+                if name in signatures and name != x.name:
+                    digest.update("\0{}\0{}".format(name, signatures[name]).encode("utf-8"))
+            result.append(digest.hexdigest())
+        return result
+
+    def fingerprints(self):
+        """
+        :rtype: dict
+        :return: fingerprint by definition name of the last converted module
+        """
+        return dict((x.name, x.fingerprint) for x in self.definitions.values())
+
+    def changed(self, previous):
+        """
+        Names of the definitions added, modified or removed since
+        *previous*, the fingerprints() of an earlier conversion.
+
+        :type previous: dict
+        :rtype: list of str
+        """
+        result = [x.name for x in self.definitions.values()
+                  if previous.get(x.name) != x.fingerprint]
+        result += sorted(x for x in previous if x not in self.definitions)
+        return result
+
+    def inference(self):
+        """
+        :return: type inference in the scope being converted
+        :rtype: infer.Inference
+        """
+        env = self.scopes[-1].env if self.scopes else {}
+        return infer.Inference(self.module_types, env)
+
+    @staticmethod
+    def unique_name(name, node):
+        """*name*, suffixed until it differs from every name in *node*"""
+        names = set(x.id for x in ast.walk(node) if isinstance(x, ast.Name))
+        while name in names:
+            name += "_"
+        return name
 
     #
     # Statements
@@ -85,17 +289,55 @@ class Converter(ast.NodeVisitor):
     def visit_FunctionDef(self, node):
         name = node.name
         args = self.visit(node.args)
-        body = [self.visit(x) for x in node.body]
+        scope = infer.infer_function(node, self.module_types)
+        modes = self.module_types.passing.get(node, {})
+        scope.moves = passing.moves(node, scope, modes)
+        self.scopes.append(scope)
+        try:
+            body = [self.visit(x) for x in node.body]
+            hoisted = [self.declaration(x, t, scope) for x, t in scope.hoisted]
+        finally:
+            self.scopes.pop()
         docstring = ast.get_docstring(node)
         if docstring:
             body = body[1:]
-        if hasattr(node, "returns"):
-            returns = self.visit(node.returns)
+        body = self.diagnostics(scope) + hoisted + body
+        if getattr(node, "returns", None) is not None:
+            returns = types.from_ast(node.returns)
         else:
-            returns = None
+            returns = scope.returns
+        for x, t in scope.params.items():
+            args.set_arg_type(x, t)
+        for x, mode in modes.items():
+            args.set_arg_mode(x, mode)
         # TODO: decorator_list
         return cpp.FunctionDef(name=name, args=args, body=body, docstring=docstring, returns=returns)
 
+    def declaration(self, name, t, scope):
+        """
+        :return: the declaration of the hoisted local *name*
+        :type scope: infer.FunctionTypes
+        """
+        if t is not infer.UNKNOWN:
+            return cpp.Declare(name, t)
+        value = scope.deduced.get(name)
+        if value is None:
+            return cpp.Declare(name, t)
+        return cpp.Declare(name, t, like=self.visit(copy.deepcopy(value)))
+
+    def diagnostics(self, scope):
+        """
+        :type scope: infer.FunctionTypes
+        :rtype: list of cpp.Unsupported
+        """
+        ret = []
+        for name, (first, second) in sorted(scope.conflicts.items()):
+            ret.append(cpp.Unsupported("{} is assigned both {} and {}".format(name, first, second)))
+        for name, t in scope.hoisted:
+            if t is infer.UNKNOWN and name not in scope.deduced:
+                ret.append(cpp.Unsupported("the type of {} is not known where it is declared".format(name)))
+        return ret
+
     def visit_ClassDef(self, node):
         name = node.name
         bases = [self.visit(x) for x in node.bases]
@@ -120,8 +362,39 @@ class Converter(ast.NodeVisitor):
 
     def visit_Assign(self, node):
         targets = [self.visit(x) for x in node.targets]
-        value = self.visit(node.value)
-        return cpp.Assign(targets, value)
+        scope = self.scopes[-1] if self.scopes else None
+        if scope is None:
+            return cpp.Assign(targets, self.visit(node.value))
+        target = node.targets[0]
+        if len(node.targets) == 1 and isinstance(target, ast.Name) and \
+                target.id in scope.locals and infer.empty_container(node.value):
+            value = cpp.Construct(infer.concrete(scope.locals[target.id]))
+        else:
+            value = self.visit(node.value)
+        return cpp.Assign(targets, value, declare=scope.declarations.get(node))
+
+    def visit_StaticTable(self, node):
+        ctype, lines = tables.declaration(node)
+        return cpp.StaticTable(node.targets[0].id, ctype, lines)
+
+    def visit_AnnAssign(self, node):
+        """for python3 ast
+        """
+        target = self.visit(node.target)
+        scope = self.scopes[-1] if self.scopes else None
+        if scope is None:
+            declare = types.from_ast(node.annotation)
+        else:
+            declare = scope.declarations.get(node)
+        if node.value is None:
+            if declare is None:
+                return cpp.Pass()
+            return cpp.Declare(target.build(None), declare)
+        if declare is not None and infer.empty_container(node.value):
+            value = cpp.Construct(declare)
+        else:
+            value = self.visit(node.value)
+        return cpp.Assign([target], value, declare=declare)
 
     def visit_AugAssign(self, node):
         assert node.op.__class__ not in [ast.Pow, ast.FloorDiv]
@@ -135,7 +408,19 @@ class Converter(ast.NodeVisitor):
         iter = self.visit(node.iter)
         body = [self.visit(x) for x in node.body]
         orelse = [self.visit(x) for x in node.orelse]
-        return cpp.For(target=target, iter=iter, body=body, orelse=orelse)
+        scope = self.scopes[-1] if self.scopes else None
+        prologue = []
+        for name, terms in scope.reserves.get(node, []) if scope is not None else []:
+            size = self.reserve_size(terms)
+            prologue.append(cpp.Expr(cpp.Call(cpp.Attribute(cpp.Name(name), "reserve"), [size])))
+        item = None
+        if scope is not None and isinstance(node.target, ast.Name) and node.target.id in scope.variables:
+            # a local or a parameter, which the loop must not shadow
+            names = set(scope.env) | set(x.id for x in ast.walk(node) if isinstance(x, ast.Name))
+            item = node.target.id + "_item"
+            while item in names:
+                item += "_"
+        return cpp.For(target=target, iter=iter, body=body, orelse=orelse, prologue=prologue, item=item)
 
     def visit_While(self, node):
         test = self.visit(node.test)
@@ -181,7 +466,10 @@ class Converter(ast.NodeVisitor):
         return cpp.BoolOp(op=op, values=[self.visit(x) for x in node.values])
 
     def visit_BinOp(self, node):
-        assert node.op.__class__ not in [ast.Pow, ast.FloorDiv]
+        if node.op.__class__ == ast.Pow:
+            # see hook.PowerHook
+            args = [self.visit(node.left), self.visit(node.right)]
+            return cpp.Call(cpp.CppScope(value=cpp.Name(id="std"), attr="pow"), args)
         left = self.visit(node.left)
         op = OPERATOR_MAP[node.op.__class__]
         right = self.visit(node.right)
@@ -241,9 +529,25 @@ class Converter(ast.NodeVisitor):
         return cpp.Subscript(value=value, slice=slice)
 
     def visit_Name(self, node):
+        if self.scopes and node in self.scopes[-1].moves:
+            return cpp.Call(cpp.CppScope(value=cpp.Name(id="std"), attr="move"), [cpp.Name(node.id)])
         return cpp.Name(node.id)
         # TODO: node.ctx
 
+    def visit_ListComp(self, node):
+        return self.lower_comprehension(node)
+
+    def visit_SetComp(self, node):
+        return self.lower_comprehension(node)
+
+    def visit_DictComp(self, node):
+        return self.lower_comprehension(node)
+
+    def visit_GeneratorExp(self, node):
+        # evaluated eagerly into a std::vector; see hook.ReductionHook for
+        # the generators that are consumed right away
+        return self.lower_comprehension(node)
+
     def visit_Tuple(self, node):
         elts = [self.visit(x) for x in node.elts]
         return cpp.Tuple(elts=elts)
@@ -254,6 +558,120 @@ class Converter(ast.NodeVisitor):
         value = self.visit(node.value)
         return cpp.Index(value=value)
 
+    #
+    # comprehensions
+    #
+
+    def lower_comprehension(self, node):
+        """
+        Lower a comprehension to loops that fill the result, reserved up
+        front when the number of items is known.
+
+        :rtype: cpp.Comprehension or None
+        """
+        generators = node.generators
+        if any(not isinstance(x.target, ast.Name) or getattr(x, "is_async", False) for x in generators):
+            return None
+        inference = self.inference()
+        declare = infer.concrete(inference.expr_type(node))
+        scope = infer.FunctionTypes()
+        scope.env = inference.comprehension(generators).env
+        scope.nonnegative = set(self.scopes[-1].nonnegative) if self.scopes else set()
+        for generator in generators:
+            scope.nonnegative.discard(generator.target.id)
+            if inference.nonnegative_range(generator.iter, scope.nonnegative):
+                scope.nonnegative.add(generator.target.id)
+        self.scopes.append(scope)
+        try:
+            loop, inner = self.comprehension_loops(generators)
+            if isinstance(node, ast.DictComp):
+                elt = None
+                key = self.visit(node.key)
+                value = self.visit(node.value)
+            else:
+                elt = self.visit(node.elt)
+        finally:
+            self.scopes.pop()
+        result = cpp.Name(self.unique_name("result", node))
+        setup = [cpp.Declare(result.id, declare)]
+        size = self.comprehension_size(node)
+        if size is not None:
+            setup.append(cpp.Expr(cpp.Call(cpp.Attribute(result, "reserve"), [size])))
+        if isinstance(node, ast.DictComp):
+            inner.append(cpp.Assign([cpp.Subscript(result, key)], value))
+        elif isinstance(node, ast.SetComp):
+            inner.append(cpp.Expr(cpp.Call(cpp.Attribute(result, "insert"), [elt])))
+        else:
+            inner.append(cpp.Expr(cpp.Call(cpp.Attribute(result, "push_back"), [elt])))
+        return cpp.Comprehension(setup, loop, inner, [cpp.Return(result)], elt)
+
+    def comprehension_loops(self, generators):
+        """
+        :return: the outermost loop and the body of the innermost block
+        :rtype: (cpp.For, list)
+        """
+        loop = inner = None
+        for generator in generators:
+            node = ast.copy_location(
+                ast.For(target=generator.target, iter=generator.iter, body=[], orelse=[]),
+                generator.iter)
+            block = self.visit(node)
+            if loop is None:
+                loop = block
+            else:
+                inner.append(block)
+            inner = block.body
+            for test in generator.ifs:
+                block = cpp.If(test=self.visit(test), body=[], orelse=[])
+                inner.append(block)
+                inner = block.body
+        return loop, inner
+
+    def comprehension_size(self, node):
+        """
+        :return: the number of items of *node*, if it is known before the
+                 loop and cheap to compute
+        :rtype: cpp.CodeExpression or None
+        """
+        if len(node.generators) != 1 or node.generators[0].ifs:
+            return None
+        iter = node.generators[0].iter
+        if not self.inference().countable(iter):
+            return None
+        return self.count(iter)
+
+    def count(self, iter):
+        """
+        :return: the number of items of a countable *iter*
+        :rtype: cpp.CodeExpression
+        """
+        if isinstance(iter, ast.Name):
+            return cpp.Call(cpp.Attribute(cpp.Name(iter.id), "size"), [])
+        range_ = cpp.Call(cpp.CppScope(value=cpp.Name(id="py2cpp"), attr="range"),
+                          [self.visit(x) for x in iter.args])
+        return cpp.Call(cpp.Attribute(range_, "size"), [])
+
+    def reserve_size(self, terms):
+        """
+        :param terms: see :meth:`infer.FunctionInference.appends`
+        :rtype: cpp.CodeExpression
+        """
+        counts = []
+        for term in terms:
+            for i, (x, n) in enumerate(counts):
+                if len(x) == len(term) and all(a is b for a, b in zip(x, term)):
+                    counts[i] = (x, n + 1)
+                    break
+            else:
+                counts.append((term, 1))
+        ret = None
+        for term, n in counts:
+            value = cpp.Num(n) if n > 1 else None
+            for iter in term:
+                value = self.count(iter) if value is None else cpp.BinOp(value, "*", self.count(iter))
+            ret = value if ret is None else cpp.BinOp(ret, "+", value)
+        return ret
+
     def visit_arguments(self, node):
         args = [self.visit(x) for x in node.args]
         vararg = node.vararg
@@ -267,8 +685,8 @@ class Converter(ast.NodeVisitor):
         """for python3 ast
         """
         arg = node.arg
-        if hasattr(node, "annotation"):
-            annotation = self.visit(node.annotation)
+        if getattr(node, "annotation", None) is not None:
+            annotation = types.from_ast(node.annotation)
         else:
             annotation = None
         # TODO: node.lineno
@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 
+import contextlib
 import enum
+import io
 import sys
 from ast import iter_fields
 
@@ -55,10 +57,124 @@ class Type(enum.Enum):
 INDENT = " " * 4
 
 
+class CodeWriter(object):
+    """Line oriented writer for generated code.
+
+    Statements write their lines straight into *stream*; the writer
+    keeps track of the current indentation.
+    """
+    def __init__(self, stream, level=0):
+        self.stream = stream
+        self.level = level
+
+    def write_line(self, line=""):
+        if "\n" in line:
+            # an expression spanning lines, e.g. a Comprehension
+            for x in line.split("\n"):
+                self.write_line(x)
+            return
+        if line:
+            self.stream.write(INDENT * self.level)
+            self.stream.write(line)
+        self.stream.write("\n")
+
+    @contextlib.contextmanager
+    def indent(self):
+        self.level += 1
+        try:
+            yield self
+        finally:
+            self.level -= 1
+
+
+def render(node, ctx):
+    """
+    Return the code of *node* as a string, without the trailing newline.
+
+    :type node: Base
+    :type ctx: BuildContext
+    """
+    stream = io.StringIO()
+    node.emit(ctx, CodeWriter(stream, ctx.indent_level))
+    return stream.getvalue()[:-1]
+
+
+def emit_block(body, ctx, writer):
+    """
+    :type body: list of Base
+    :type ctx: BuildContext
+    :type writer: CodeWriter
+    """
+    if not body:
+        writer.write_line()
+    for node in body:
+        node.emit(ctx, writer)
+
+
+def includes(node):
+    """
+    Headers that the code of *node* needs, e.g. ``<vector>`` or
+    ``"py2cpp/range.hpp"``.
+
+    :type node: Base
+    :rtype: set of str
+    """
+    ret = set()
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+            continue
+        if not isinstance(node, Base):
+            continue
+        ret.update(node.requires())
+        for field in node._fields:
+            stack.append(getattr(node, field, None))
+    return ret
+
+
+def format_includes(headers):
+    """
+    Include directives for *headers*: the standard headers, then those of
+    the runtime.
+
+    :type headers: iterable of str
+    :rtype: list of str
+    """
+    system = sorted(x for x in headers if x.startswith("<"))
+    local = sorted(x for x in headers if not x.startswith("<"))
+    lines = ["#include " + x for x in system]
+    if system and local:
+        lines.append("")
+    return lines + ["#include " + x for x in local]
+
+
 class BuildContext(object):
+    """Scope of the node being built.
+
+    Contexts are linked to their parent; facts about the enclosing scopes
+    are computed once when the context is created.
+    """
     def __init__(self, ctx, node):
+        self.parent = ctx
+        self.node = node
+        if ctx is None:
+            # py2cpp.profiler.Profiler recording build(), see create()
+            self.profiler = None
+            self.indent_level = 0
+            self.class_def = None
+            self.function_def = None
+            self.loop_depth = 0
+            self.class_method = False
+            return
+        self.profiler = ctx.profiler
         self.indent_level = ctx.indent_level + 1
-        self.stack = ctx.stack + [node]
+        node_type = node.__class__
+        self.class_def = node if node_type == ClassDef else ctx.class_def
+        self.function_def = node if node_type == FunctionDef else ctx.function_def
+        self.loop_depth = ctx.loop_depth + 1 if issubclass(node_type, (For, While)) else ctx.loop_depth
+        self.class_method = node_type == FunctionDef and ctx.node.__class__ == ClassDef
 
     def __enter__(self):
         return self
@@ -66,189 +182,377 @@ class BuildContext(object):
     def __exit__(self, exc_type, exc_value, traceback):
         return False if exc_type else True
 
+    @property
+    def stack(self):
+        """enclosing nodes, outermost first"""
+        result = []
+        ctx = self
+        while ctx.parent is not None:
+            result.append(ctx.node)
+            ctx = ctx.parent
+        result.reverse()
+        return result
+
     def indent(self):
         return INDENT * self.indent_level
 
     def is_class_method(self):
-        if len(self.stack) < 2:
-            return False
-        last = self.stack[-1]
-        if last.__class__ != FunctionDef:
-            return False
-        cls = self.stack[-2]
-        return cls.__class__ == ClassDef
+        return self.class_method
 
     def in_class(self):
-        for node in reversed(self.stack):
-            if node.__class__ != ClassDef:
-                continue
-            return True
-        return False
+        return self.class_def is not None
 
-    @staticmethod
-    def create():
-        class _DummyContext(object):
-            indent_level = -1
-            stack = []
+    def in_loop(self):
+        return self.loop_depth > 0
 
-        ret = BuildContext(_DummyContext(), None)
-        ret.stack = []
+    @staticmethod
+    def create(profiler=None):
+        ret = BuildContext(None, None)
+        ret.profiler = profiler
         return ret
 
 
 class Base(object):
 
+    __slots__ = ()
+
     _fields = []
 
-    def __init__(self, type):
-        self.type = type
+    # kind of node; a class attribute so that instances don't carry it
+    type = Type.Builder
+
+    # headers the node itself needs, not counting its children
+    headers = ()
 
     def add_literal(self, literal):
         raise NotImplementedError
 
+    def requires(self):
+        """
+        :rtype: iterable of str
+        """
+        return self.headers
+
     def build(self, ctx):
         """
         :type ctx: BuildContext
+        :rtype: str
         """
         raise NotImplementedError
 
+    def emit(self, ctx, writer):
+        """
+        :type ctx: BuildContext
+        :type writer: CodeWriter
+        """
+        writer.write_line(self.build(ctx))
+
 AST = Base
 
 
 class UnsupportedNode(Base):
+
+    __slots__ = ("node",)
+
+    type = Type.Comment
+
     def __init__(self, node):
-        super(UnsupportedNode, self).__init__(Type.Comment)
         self.node = node
 
     def build(self, ctx):
         return "// UNSUPPORTED AST NODE: {}".format(self.node.__class__.__name__)
 
 
+class Verbatim(Base):
+    """code generated earlier, written as is at the current indentation"""
+
+    __slots__ = ("code", "required")
+
+    _fields = ["code"]
+
+    type = Type.Block
+
+    def __init__(self, code, required=()):
+        """
+        :param required: headers that *code* needs
+        """
+        self.code = code
+        self.required = frozenset(required)
+
+    def requires(self):
+        return self.required
+
+    def dump(self):
+        """
+        The code preceded by its include directives, as load() reads it.
+
+        :rtype: str
+        """
+        return "\n".join(format_includes(self.required) + [self.code])
+
+    @staticmethod
+    def load(text):
+        """
+        :type text: str
+        :rtype: Verbatim
+        """
+        lines = text.split("\n")
+        required = []
+        while lines and lines[0].startswith("#include "):
+            required.append(lines.pop(0)[len("#include "):])
+            if lines and not lines[0] and lines[1:2] and lines[1].startswith("#include "):
+                lines.pop(0)
+        return Verbatim("\n".join(lines), required)
+
+    def build(self, ctx):
+        return render(self, ctx)
+
+    def emit(self, ctx, writer):
+        for line in self.code.split("\n"):
+            writer.write_line(line)
+
+
 class Module(Base):
 
+    __slots__ = ("body",)
+
     _fields = ["body"]
 
+    type = Type.Block
+
     def __init__(self, body):
-        super(Module, self).__init__(Type.Block)
         self.body = body
 
+    def __iter__(self):
+        return iter(self.body)
+
+    def __getitem__(self, index):
+        return self.body[index]
+
     def build(self, ctx):
-        return "\n\n".join([x.build(ctx) for x in self.body])
+        return render(self, ctx)
+
+    def emit(self, ctx, writer):
+        for i, node in enumerate(self.body):
+            if i:
+                writer.write_line()
+            node.emit(ctx, writer)
 
 
 class CodeStatement(Base):
 
-    _fields = ["stmt"]
+    __slots__ = ()
+
+    type = Type.Stmt
 
-    def __init__(self, stmt):
-        super(CodeStatement, self).__init__(Type.Stmt)
-        self.stmt = stmt
+    @property
+    def stmt(self):
+        """statements of the block, same as ``body``"""
+        return self.body
+
+    def build(self, ctx):
+        return render(self, ctx)
 
 
 class FunctionDef(CodeStatement):
 
+    __slots__ = ("name", "args", "body", "docstring", "returns")
+
     _fields = ["name", "args", "body", "docstring", "returns"]
 
     def __init__(self, name, args, body, docstring, returns=None):
-        super(FunctionDef, self).__init__(body)
         self.name = name
         self.args = args
+        self.body = body
         self.docstring = docstring
         self.returns = returns
-        self.body = self.stmt
 
-    def build(self, ctx):
+    def emit(self, ctx, writer):
         with BuildContext(ctx, self) as new_ctx:
-            body = [x.build(new_ctx) for x in self.stmt]
             # __init__ special case
             if self.name == "__init__" and ctx.in_class():
-                return "\n".join([
-                    "{}{}({}) {{".format(
-                        ctx.indent(),
-                        ctx.stack[-1].name,
-                        self.args.build(new_ctx),
-                    ),
-                    "\n".join(body),
-                    ctx.indent() + "}",
-                ])
-            return "\n".join([
-                "{}{} {}({}) {{".format(
-                    ctx.indent(),
+                writer.write_line("{}({}) {{".format(
+                    ctx.class_def.name,
+                    self.args.build(new_ctx),
+                ))
+            else:
+                writer.write_line("{} {}({}) {{".format(
                     self.rtype(ctx),
                     self.name,
                     self.args.build(new_ctx),
-                ),
-                "\n".join(body),
-                ctx.indent() + "}",
-            ])
+                ))
+            with writer.indent():
+                emit_block(self.body, new_ctx, writer)
+            writer.write_line("}")
 
     def rtype(self, ctx):
-        if self.returns:
-            rtype = self.returns.build(ctx)
-            return CppTypeRegistry.detect(rtype, rettype=True)
+        if self.returns is not None:
+            return CppTypeRegistry.detect(self.returns, rettype=True)
         if self.docstring is None:
             return "void"
-        rtype = docstring.get_rtype(self.docstring)
-        rtype = docstring.parse_type_of(rtype)
-        return CppTypeRegistry.detect(rtype, rettype=True)
+        return CppTypeRegistry.detect(docstring.get_rtype(self.docstring), rettype=True)
+
+    def requires(self):
+        if self.returns is not None:
+            return type_registry.requires(self.returns)
+        if self.docstring is None:
+            return ()
+        return type_registry.requires(docstring.get_rtype(self.docstring))
 
 
 class ClassDef(CodeStatement):
 
+    __slots__ = ("name", "bases", "body", "docstring", "keywords")
+
     _fields = ["name", "bases", "body", "docstring"]
 
     def __init__(self, name, bases, body, docstring, **kwargs):
-        super(ClassDef, self).__init__(body)
         self.name = name
         self.bases = bases
         self.keywords = kwargs.get("keywords", [])
+        self.body = body
         self.docstring = docstring
 
-    def build(self, ctx):
+    def emit(self, ctx, writer):
         with BuildContext(ctx, self) as new_ctx:
-            body = [x.build(new_ctx) for x in self.stmt]
-            return "\n".join([
-                "{}class {}{} {{".format(
-                    ctx.indent(),
-                    self.name,
-                    " : {}".format(", ".join(["public " + x.build(ctx) for x in self.bases])) if self.bases else "",
-                ),
-                "\n".join(body),
-                ctx.indent() + "};",
-            ])
+            writer.write_line("class {}{} {{".format(
+                self.name,
+                " : {}".format(", ".join(["public " + x.build(ctx) for x in self.bases])) if self.bases else "",
+            ))
+            with writer.indent():
+                emit_block(self.body, new_ctx, writer)
+            writer.write_line("};")
 
 
 class Return(CodeStatement):
 
+    __slots__ = ("value",)
+
     _fields = ["value"]
 
     def __init__(self, value):
         self.value = value
 
-    def build(self, ctx):
+    def emit(self, ctx, writer):
         if self.value:
-            return ctx.indent() + "return {};".format(self.value.build(ctx))
+            writer.write_line("return {};".format(self.value.build(ctx)))
         else:
-            return ctx.indent() + "return;"
+            writer.write_line("return;")
 
 
 class Assign(CodeStatement):
 
+    __slots__ = ("targets", "value", "declare")
+
     _fields = ["targets", "value"]
 
-    def __init__(self, targets, value):
+    def __init__(self, targets, value, declare=None):
+        """
+        :param declare: type of the variable that is declared by this
+                        assignment, if any
+        :type declare: types.PyType
+        """
         self.targets = targets
         self.value = value
+        self.declare = declare
+
+    def emit(self, ctx, writer):
+        targets = " = ".join([x.build(ctx) for x in self.targets])
+        if self.declare is None:
+            writer.write_line("{} = {};".format(targets, self.value.build(ctx)))
+        elif isinstance(self.value, Construct):
+            writer.write_line("{} {};".format(CppTypeRegistry.detect(self.declare), targets))
+        else:
+            writer.write_line("{} {} = {};".format(
+                CppTypeRegistry.detect(self.declare),
+                targets,
+                self.value.build(ctx)
+            ))
 
-    def build(self, ctx):
-        return ctx.indent() + "{} = {};".format(
-            " = ".join([x.build(ctx) for x in self.targets]),
-            self.value.build(ctx)
-        )
+    def requires(self):
+        return type_registry.requires(self.declare)
+
+
+class Declare(CodeStatement):
+
+    __slots__ = ("name", "declare", "like")
+
+    _fields = ["name", "like"]
+
+    def __init__(self, name, declare, like=None):
+        """
+        :type declare: types.PyType
+        :param like: expression whose type is declared instead, for a
+                     *declare* that is not known
+        """
+        self.name = name
+        self.declare = declare
+        self.like = like
+
+    def emit(self, ctx, writer):
+        if self.like is not None:
+            declare = "std::decay_t<decltype({})>".format(self.like.build(ctx))
+        else:
+            declare = CppTypeRegistry.detect(self.declare)
+        writer.write_line("{} {};".format(declare, self.name))
+
+    def requires(self):
+        if self.like is not None:
+            return ("<type_traits>",)
+        return type_registry.requires(self.declare)
+
+
+class Unsupported(CodeStatement):
+    """a comment about python code that has no C++ equivalent"""
+
+    __slots__ = ("message",)
+
+    _fields = []
+
+    def __init__(self, message):
+        self.message = message
+
+    def emit(self, ctx, writer):
+        writer.write_line("// UNSUPPORTED: {}".format(self.message))
+
+
+class StaticTable(CodeStatement):
+    """module level data computed when converting; see tables.py"""
+
+    __slots__ = ("name", "ctype", "lines")
+
+    _fields = ["name"]
+
+    def __init__(self, name, ctype, lines):
+        """
+        :param ctype: C++ type of the table
+        :param lines: lines of the braced initializer
+        :type lines: list of str
+        """
+        self.name = name
+        self.ctype = ctype
+        self.lines = lines
+
+    def emit(self, ctx, writer):
+        first = "static constexpr {} {} = {}".format(self.ctype, self.name, self.lines[0])
+        if len(self.lines) == 1:
+            writer.write_line(first + ";")
+            return
+        writer.write_line(first)
+        for line in self.lines[1:-1]:
+            writer.write_line(line)
+        writer.write_line(self.lines[-1] + ";")
+
+    def requires(self):
+        if self.ctype.startswith("py2cpp::"):
+            return ('"py2cpp/tables.hpp"',)
+        return ("<array>",)
 
 
 class AugAssign(CodeStatement):
 
+    __slots__ = ("target", "op", "value")
+
     _fields = ["target", "op", "value"]
 
     def __init__(self, target, op, value):
@@ -256,101 +560,177 @@ class AugAssign(CodeStatement):
         self.op = op
         self.value = value
 
-    def build(self, ctx):
-        return ctx.indent() + "{} {}= {};".format(
+    def emit(self, ctx, writer):
+        writer.write_line("{} {}= {};".format(
             self.target.build(ctx),
             self.op,
             self.value.build(ctx)
-        )
+        ))
 
 
 class For(CodeStatement):
 
-    _fields = ["target", "iter", "body", "orelse"]
+    __slots__ = ("target", "iter", "body", "orelse", "prologue", "item")
+
+    _fields = ["target", "iter", "body", "orelse", "prologue"]
 
-    def __init__(self, target, iter, body, orelse):
-        super(For, self).__init__(body)
+    def __init__(self, target, iter, body, orelse, prologue=None, item=None):
+        """
+        :param prologue: statements before the loop, e.g. ``reserve()`` of
+                         the lists that it fills
+        :param item: name of the loop variable when the target is a variable
+                     of the function, which is assigned each item so that it
+                     keeps the last one after the loop, as in python
+        """
         self.target = target
         self.iter = iter
+        self.body = body
         self.orelse = orelse
-        self.body = self.stmt
+        self.prologue = prologue or []
+        self.item = item
 
-    def build(self, ctx):
+    def emit(self, ctx, writer):
+        for node in self.prologue:
+            node.emit(ctx, writer)
         with BuildContext(ctx, self) as new_ctx:
-            body = [x.build(new_ctx) for x in self.stmt]
             # TODO: orelse
-            return "\n".join(["{}for (auto {} : {}) {{".format(
-                    ctx.indent(),
-                    self.target.build(ctx),
-                    self.iter.build(ctx)
-                ),
-                "\n".join(body),
-                ctx.indent() + "}",
-            ])
+            writer.write_line("for (auto {} : {}) {{".format(
+                self.item or self.target.build(ctx),
+                self.iter.build(ctx)
+            ))
+            self.emit_body(new_ctx, writer)
+            writer.write_line("}")
+
+    def emit_body(self, ctx, writer):
+        with writer.indent():
+            if self.item is not None:
+                writer.write_line("{} = {};".format(self.target.build(ctx), self.item))
+            emit_block(self.body, ctx, writer)
+
+
+class RangeFor(For):
+    """``for`` over ``range()``, as a counted loop"""
+
+    __slots__ = ("declare", "start", "stop", "step", "sign", "stop_name", "step_name")
+
+    _fields = ["target", "start", "stop", "step", "body", "orelse", "prologue"]
+
+    def __init__(self, target, declare, start, stop, step, sign, body, orelse,
+                 stop_name=None, step_name=None, prologue=None, item=None):
+        """
+        :type declare: types.PyType
+        :param step: magnitude of a constant step, the step if *sign* is
+                     None, or None for 1
+        :param sign: sign of the step, or None if it is only known at run time
+        :param stop_name: variable holding the stop value, if it must be
+                          evaluated only once
+        :param step_name: variable holding the step, if it must be evaluated
+                          only once
+        """
+        super(RangeFor, self).__init__(target, None, body, orelse, prologue, item)
+        self.declare = declare
+        self.start = start
+        self.stop = stop
+        self.step = step
+        self.sign = sign
+        self.stop_name = stop_name
+        self.step_name = step_name
+
+    def header(self, ctx):
+        index = self.item or self.target.build(ctx)
+        init = ["{} {} = {}".format(CppTypeRegistry.detect(self.declare), index, self.start.build(ctx))]
+        stop = self.stop.build(ctx)
+        if self.stop_name is not None:
+            init.append("{} = {}".format(self.stop_name, stop))
+            stop = self.stop_name
+        step = self.step.build(ctx) if self.step is not None else None
+        if self.step_name is not None:
+            init.append("{} = {}".format(self.step_name, step))
+            step = self.step_name
+        if self.sign is None:
+            cond = "{0} > 0 ? {1} < {2} : {1} > {2}".format(step, index, stop)
+            incr = "{} += {}".format(index, step)
+        else:
+            cond = "{} {} {}".format(index, "<" if self.sign > 0 else ">", stop)
+            if step is None or step == "1":
+                incr = ("++" if self.sign > 0 else "--") + index
+            else:
+                incr = "{} {}= {}".format(index, "+" if self.sign > 0 else "-", step)
+        return "for ({}; {}; {}) {{".format(", ".join(init), cond, incr)
+
+    def requires(self):
+        return type_registry.requires(self.declare)
+
+    def emit(self, ctx, writer):
+        for node in self.prologue:
+            node.emit(ctx, writer)
+        with BuildContext(ctx, self) as new_ctx:
+            # TODO: orelse
+            writer.write_line(self.header(ctx))
+            self.emit_body(new_ctx, writer)
+            writer.write_line("}")
 
 
 class While(CodeStatement):
 
+    __slots__ = ("test", "body", "orelse")
+
     _fields = ["test", "body", "orelse"]
 
     def __init__(self, test, body, orelse):
-        super(While, self).__init__(body)
         self.test = test
+        self.body = body
         self.orelse = orelse
 
-    def build(self, ctx):
+    def emit(self, ctx, writer):
         with BuildContext(ctx, self) as new_ctx:
-            body = [x.build(new_ctx) for x in self.stmt]
             # TODO: orelse
-            return "\n".join(["{}while ({}) {{".format(
-                    ctx.indent(),
-                    self.test.build(ctx)
-                ),
-                "\n".join(body),
-                ctx.indent() + "}",
-            ])
+            writer.write_line("while ({}) {{".format(
+                self.test.build(ctx)
+            ))
+            with writer.indent():
+                emit_block(self.body, new_ctx, writer)
+            writer.write_line("}")
 
 
 class If(CodeStatement):
 
+    __slots__ = ("test", "body", "orelse")
+
     _fields = ["test", "body", "orelse"]
 
     def __init__(self, test, body, orelse):
-        super(If, self).__init__(body)
         self.test = test
+        self.body = body
         self.orelse = orelse
 
-    def build(self, ctx):
-        with BuildContext(ctx, self) as new_ctx:
-            body = [x.build(new_ctx) for x in self.stmt]
-            # TODO: orelse
-            result = [
-                "{}if ({}) {{".format(
-                    ctx.indent(),
-                    self.test.build(ctx)
-                ),
-                "\n".join(body),
-                ctx.indent() + "}",
-            ]
-            if len(self.orelse) == 1 and self.orelse[0].__class__ == If:
-                lines = self.orelse[0].build(ctx).split("\n")
-                assert len(lines) > 1
-                result[-1] = "}} else {}".format(lines[0])
-                result.extend(lines[1:])
-            elif self.orelse:
-                result[-1] = "} else {"
-                result.extend([
-                ] + [x.build(ctx) for x in self.orelse] + [
-                    "}",
-                ])
-            return "\n".join(result)
+    def emit(self, ctx, writer):
+        node = self
+        writer.write_line("if ({}) {{".format(self.test.build(ctx)))
+        # else-if chain is written iteratively
+        while True:
+            with BuildContext(ctx, node) as new_ctx, writer.indent():
+                emit_block(node.body, new_ctx, writer)
+            orelse = node.orelse
+            if len(orelse) == 1 and orelse[0].__class__ == If:
+                node = orelse[0]
+                writer.write_line("}} else if ({}) {{".format(node.test.build(ctx)))
+                continue
+            if orelse:
+                writer.write_line("} else {")
+                with BuildContext(ctx, node) as new_ctx, writer.indent():
+                    emit_block(orelse, new_ctx, writer)
+            writer.write_line("}")
+            break
 
 
 class Raise(CodeStatement):
 
     if six.PY3:
+        __slots__ = ("exc", "cause")
         _fields = ["exc", "cause"]
     else:
+        __slots__ = ("type", "inst", "tback")
         _fields = ["type", "inst", "tback"]
 
     def __init__(self, **kwargs):
@@ -362,57 +742,74 @@ class Raise(CodeStatement):
             self.inst = kwargs.get("inst")
             self.tback = kwargs.get("tback")
 
-    def build(self, ctx):
-        if six.PY3:
-            return ctx.indent() + "throw {}();".format(self.exc.build(ctx))
-        elif six.PY2:
-            return ctx.indent() + "throw {}();".format(self.type.build(ctx))
+    def emit(self, ctx, writer):
+        exc = self.exc if six.PY3 else self.type
+        if exc is None:
+            writer.write_line("throw;")
+        elif isinstance(exc, Call):
+            # raise ValueError("...")
+            writer.write_line("throw {};".format(exc.build(ctx)))
+        else:
+            writer.write_line("throw {}();".format(exc.build(ctx)))
 
 
 class Expr(CodeStatement):
 
+    __slots__ = ("value",)
+
     _fields = ["value"]
 
     def __init__(self, value):
-        super(Expr, self).__init__(value)
         self.value = value
-        del self.stmt
 
-    def build(self, ctx):
-        return ctx.indent() + "{};".format(self.value.build(ctx))
+    def emit(self, ctx, writer):
+        writer.write_line("{};".format(self.value.build(ctx)))
 
 
 class Pass(CodeStatement):
+
+    __slots__ = ()
+
     def __init__(self):
         pass
 
-    def build(self, ctx):
-        return ""
+    def emit(self, ctx, writer):
+        writer.write_line()
 
 
 class Break(CodeStatement):
+
+    __slots__ = ()
+
     def __init__(self):
         pass
 
-    def build(self, ctx):
-        return ctx.indent() + "break;"
+    def emit(self, ctx, writer):
+        writer.write_line("break;")
 
 
 class Continue(CodeStatement):
+
+    __slots__ = ()
+
     def __init__(self):
         pass
 
-    def build(self, ctx):
-        return ctx.indent() + "continue;"
+    def emit(self, ctx, writer):
+        writer.write_line("continue;")
 
 
 class CodeExpression(Base):
-    def __init__(self):
-        super(CodeExpression, self).__init__(Type.Expr)
+
+    __slots__ = ()
+
+    type = Type.Expr
 
 
 class BoolOp(CodeExpression):
 
+    __slots__ = ("op", "values")
+
     _fields = ["op", "values"]
 
     def __init__(self, op, values):
@@ -431,20 +828,50 @@ class BoolOp(CodeExpression):
 
 class BinOp(CodeExpression):
 
+    __slots__ = ("left", "op", "right")
+
     _fields = ["left", "op", "right"]
 
     def __init__(self, left, op, right):
-        super(BinOp, self).__init__()
         self.left = left
         self.op = op
         self.right = right
 
+    # C++ precedence of the operators; lower binds tighter
+    PRECEDENCE = {
+        "*": 5, "/": 5, "%": 5,
+        "+": 6, "-": 6,
+        "<<": 7, ">>": 7,
+        "&": 11,
+        "^": 12,
+        "|": 13,
+    }
+
     def build(self, ctx):
-        return " ".join([self.left.build(ctx), self.op, self.right.build(ctx)])
+        precedence = self.PRECEDENCE.get(self.op, 0)
+        left = self.left.build(ctx)
+        right = self.right.build(ctx)
+        # the tree of the python expression is kept; operators are left
+        # associative
+        if self.operand_precedence(self.left) > precedence:
+            left = "({})".format(left)
+        if self.operand_precedence(self.right) >= precedence:
+            right = "({})".format(right)
+        return " ".join([left, self.op, right])
+
+    @classmethod
+    def operand_precedence(cls, node):
+        if isinstance(node, BinOp):
+            return cls.PRECEDENCE.get(node.op, 0)
+        if isinstance(node, (BoolOp, Compare)):
+            return 16
+        return 0
 
 
 class UnaryOp(CodeExpression):
 
+    __slots__ = ("op", "operand")
+
     _fields = ["op", "operand"]
 
     def __init__(self, op, operand):
@@ -453,13 +880,15 @@ class UnaryOp(CodeExpression):
 
     def build(self, ctx):
         operand = self.operand.build(ctx)
-        if isinstance(self.operand, BoolOp):
+        if isinstance(self.operand, (BoolOp, BinOp, Compare)):
             operand = "({})".format(operand)
         return "{}{}".format(self.op, operand)
 
 
 class Lambda(CodeExpression):
 
+    __slots__ = ("args", "body")
+
     _fields = ["args", "body"]
 
     def __init__(self, args, body):
@@ -474,6 +903,8 @@ class Lambda(CodeExpression):
 
 class IfExp(CodeExpression):
 
+    __slots__ = ("test", "body", "orelse")
+
     _fields = ["test", "body", "orelse"]
 
     def __init__(self, test, body, orelse):
@@ -489,6 +920,11 @@ class IfExp(CodeExpression):
 
 
 class Compare(CodeExpression):
+
+    __slots__ = ("left", "ops", "comparators")
+
+    _fields = ["left", "ops", "comparators"]
+
     def __init__(self, left, ops, comparators):
         self.left = left
         self.ops = ops
@@ -503,6 +939,8 @@ class Compare(CodeExpression):
 
 class Call(CodeExpression):
 
+    __slots__ = ("func", "args", "keywords", "starargs", "kwargs")
+
     _fields = ["func", "args", "keywords", "starargs", "kwargs"]
 
     def __init__(self, func, args=[], keywords=[], starargs=None, kwargs=None):
@@ -517,31 +955,112 @@ class Call(CodeExpression):
         return "{}({})".format(self.func.build(ctx), args)
 
 
+class Construct(CodeExpression):
+    """value-initialized object, e.g. the empty container of ``list()``"""
+
+    __slots__ = ("declare",)
+
+    _fields = []
+
+    def __init__(self, declare):
+        """
+        :type declare: types.PyType
+        """
+        self.declare = declare
+
+    def build(self, ctx):
+        return "{}()".format(CppTypeRegistry.detect(self.declare))
+
+    def requires(self):
+        return type_registry.requires(self.declare)
+
+
+class Comprehension(CodeExpression):
+    """A comprehension, as a lambda that is called where it is defined.
+
+    The lambda runs *setup*, the nest of loops and conditions *loop* and
+    then *finish*; *inner* is the body of the innermost block of *loop*,
+    which handles each item *elt*.
+    """
+
+    __slots__ = ("setup", "loop", "inner", "finish", "elt")
+
+    _fields = ["setup", "loop", "finish"]
+
+    def __init__(self, setup, loop, inner, finish, elt=None):
+        self.setup = setup
+        self.loop = loop
+        self.inner = inner
+        self.finish = finish
+        self.elt = elt
+
+    def build(self, ctx):
+        stream = io.StringIO()
+        writer = CodeWriter(stream, 1)
+        for node in self.setup + [self.loop] + self.finish:
+            node.emit(ctx, writer)
+        # only a lambda in a function may capture
+        capture = "[&]" if ctx.function_def is not None else "[]"
+        return "{}() {{\n{}}}()".format(capture, stream.getvalue())
+
+
 class Num(CodeExpression):
 
+    __slots__ = ("n",)
+
     _fields = ["n"]
 
     def __init__(self, n):
-        super(Num, self).__init__()
         self.n = n
 
     def build(self, ctx):
         return "{}".format(self.n)
 
 
+# escape sequences of the characters that cannot be written as they are in
+# a string literal; the other control characters are written in octal
+ESCAPES = {
+    "\\": "\\\\",
+    "\"": "\\\"",
+    "\n": "\\n",
+    "\r": "\\r",
+    "\t": "\\t",
+}
+
+
+def string_literal(s):
+    """
+    :type s: str
+    :rtype: str
+    """
+    chars = []
+    for c in s:
+        if c in ESCAPES:
+            chars.append(ESCAPES[c])
+        elif ord(c) < 0x20 or ord(c) == 0x7f:
+            chars.append("\\{:03o}".format(ord(c)))
+        else:
+            chars.append(c)
+    return "\"{}\"".format("".join(chars))
+
+
 class Str(CodeExpression):
 
+    __slots__ = ("s",)
+
     _fields = ["s"]
 
     def __init__(self, s):
         self.s = s
 
     def build(self, ctx):
-        return "\"{}\"".format(self.s.replace('"', '\\"'))
+        return string_literal(self.s)
 
 
 class NameConstant(CodeExpression):
 
+    __slots__ = ("value",)
+
     _fields = ["value"]
 
     def __init__(self, value):
@@ -551,15 +1070,18 @@ class NameConstant(CodeExpression):
         # boolean special case
         if type(self.value) == bool:
             return "true" if self.value else "false"
+        if self.value is None:
+            return "nullptr"
         return self.value
 
 
 class Attribute(CodeExpression):
 
+    __slots__ = ("value", "attr")
+
     _fields = ["value", "attr"]
 
     def __init__(self, value, attr):
-        super(Attribute, self).__init__()
         self.value = value
         self.attr = attr
 
@@ -569,10 +1091,11 @@ class Attribute(CodeExpression):
 
 class Subscript(CodeExpression):
 
+    __slots__ = ("value", "slice")
+
     _fields = ["value", "slice"]
 
     def __init__(self, value, slice):
-        super(Subscript).__init__()
         self.value = value
         self.slice = slice
 
@@ -582,10 +1105,11 @@ class Subscript(CodeExpression):
 
 class Name(CodeExpression):
 
+    __slots__ = ("id",)
+
     _fields = ["id"]
 
     def __init__(self, id):
-        super(Name, self).__init__()
         self.id = id
 
     def build(self, ctx):
@@ -599,6 +1123,8 @@ class Name(CodeExpression):
 
 class List(CodeExpression):
 
+    __slots__ = ("elts",)
+
     _fields = ["elts"]
 
     def __init__(self, elts):
@@ -610,6 +1136,8 @@ class List(CodeExpression):
 
 class Tuple(CodeExpression):
 
+    __slots__ = ("elts",)
+
     _fields = ["elts"]
 
     def __init__(self, elts):
@@ -623,10 +1151,11 @@ class Tuple(CodeExpression):
 
 class Index(CodeExpression):
 
+    __slots__ = ("value",)
+
     _fields = ["value"]
 
     def __init__(self, value):
-        super(Index, self).__init__()
         self.value = value
 
     def build(self, ctx):
@@ -635,14 +1164,26 @@ class Index(CodeExpression):
 
 class arguments(Base):
 
+    __slots__ = ("args", "vararg", "kwarg", "defaults", "types", "modes")
+
     _fields = ["args", "vararg", "kwarg", "defaults"]
 
+    type = Type.arguments
+
+    # declarations of a parameter of the type T by its passing mode
+    MODES = {
+        None: "{}",
+        "const": "const {}&",
+        "ref": "{}&",
+    }
+
     def __init__(self, args, vararg, kwarg, defaults):
         self.args = args
         self.vararg = vararg
         self.kwarg = kwarg
         self.defaults = defaults
         self.types = {}
+        self.modes = {}
 
     def get_arg_names(self, ctx):
         return [x.build(ctx) for x in self.args]
@@ -651,25 +1192,31 @@ class arguments(Base):
         return [x.build(ctx) for x in self.defaults]
 
     def set_arg_type(self, name, type):
+        """
+        :type type: str or types.PyType
+        """
         #assert name in self.get_arg_names(ctx)
         self.types[name] = type
 
+    def set_arg_mode(self, name, mode):
+        """
+        :param mode: "const" or "ref" to pass the argument by reference, or
+                     None to pass it by value
+        """
+        self.modes[name] = mode
+
     def build(self, ctx):
-        types = dict(self.types)
+        arg_types = dict(self.types)
         names = self.get_arg_names(ctx)
         values = self.get_arg_values(ctx)
         for arg in self.args:
-            name = arg.build(ctx)
-            if arg.annotation:
-                types[name] = arg.annotation.build(ctx)
-            if name not in types:
-                # not defined
-                types[name] = "int"
+            if arg.annotation is not None:
+                arg_types[arg.build(ctx)] = arg.annotation
         start = len(names) - len(values)
         args = []
         for i, name in enumerate(names):
-            type = types[name]
-            type = CppTypeRegistry.detect(type)
+            # not defined: the default type
+            type = self.MODES[self.modes.get(name)].format(CppTypeRegistry.detect(arg_types.get(name)))
             if i < start:
                 args.append("{} {}".format(type, name))
             else:
@@ -679,9 +1226,17 @@ class arguments(Base):
             args = args[1:]
         return ", ".join(args)
 
+    def requires(self):
+        ret = set()
+        for type in self.types.values():
+            ret.update(type_registry.requires(type))
+        return ret
+
 
 class arg(Base):
 
+    __slots__ = ("arg", "annotation")
+
     _fields = ["arg", "annotation"]
 
     def __init__(self, arg, annotation=None):
@@ -691,9 +1246,14 @@ class arg(Base):
     def build(self, ctx):
         return self.arg
 
+    def requires(self):
+        return type_registry.requires(self.annotation)
+
 
 class keyword(Base):
 
+    __slots__ = ("name", "value")
+
     _fields = ["name", "value"]
 
     def __init__(self, name, value):
@@ -711,17 +1271,60 @@ class keyword(Base):
 # for C++ syntax special case
 #
 
+RUNTIME = '"py2cpp/py2cpp.hpp"'
+
+# headers of the qualified names that hooks generate; other py2cpp:: names
+# are looked for in the whole runtime
+SCOPE_HEADERS = {
+    "std::floor": "<cmath>",
+    "std::pow": "<cmath>",
+    "std::invalid_argument": "<stdexcept>",
+    "std::make_tuple": "<tuple>",
+    "std::move": "<utility>",
+    "py2cpp::endswith": '"py2cpp/str.hpp"',
+    "py2cpp::floordiv": '"py2cpp/division.hpp"',
+    "py2cpp::join": '"py2cpp/str.hpp"',
+    "py2cpp::len": '"py2cpp/containers.hpp"',
+    "py2cpp::lvalue": '"py2cpp/utility.hpp"',
+    "py2cpp::lower": '"py2cpp/str.hpp"',
+    "py2cpp::lstrip": '"py2cpp/str.hpp"',
+    "py2cpp::max": '"py2cpp/containers.hpp"',
+    "py2cpp::min": '"py2cpp/containers.hpp"',
+    "py2cpp::mod": '"py2cpp/division.hpp"',
+    "py2cpp::pop": '"py2cpp/containers.hpp"',
+    "py2cpp::err": '"py2cpp/print.hpp"',
+    "py2cpp::out": '"py2cpp/print.hpp"',
+    "py2cpp::pow": '"py2cpp/power.hpp"',
+    "py2cpp::print": '"py2cpp/print.hpp"',
+    "py2cpp::print_options": '"py2cpp/print.hpp"',
+    "py2cpp::range": '"py2cpp/range.hpp"',
+    "py2cpp::replace": '"py2cpp/str.hpp"',
+    "py2cpp::rstrip": '"py2cpp/str.hpp"',
+    "py2cpp::split": '"py2cpp/str.hpp"',
+    "py2cpp::square": '"py2cpp/power.hpp"',
+    "py2cpp::startswith": '"py2cpp/str.hpp"',
+    "py2cpp::str": '"py2cpp/str.hpp"',
+    "py2cpp::strip": '"py2cpp/str.hpp"',
+    "py2cpp::sum": '"py2cpp/containers.hpp"',
+    "py2cpp::upper": '"py2cpp/str.hpp"',
+}
+
+
 class CppScope(Attribute):
-    def build(self, ctx):
-        return "{}::{}".format(self.value.build(ctx), self.attr)
 
+    __slots__ = ()
 
-class StdCout(Expr):
     def build(self, ctx):
-        temp = ["std::cout"]
-        temp += [x.build(ctx) for x in self.value.args]
-        temp += ["std::endl"]
-        return ctx.indent() + " << ".join(temp) + ";"
+        return "{}::{}".format(self.value.build(ctx), self.attr)
+
+    def requires(self):
+        if not isinstance(self.value, Name):
+            return ()
+        name = "{}::{}".format(self.value.id, self.attr)
+        header = SCOPE_HEADERS.get(name)
+        if header is not None:
+            return (header,)
+        return (RUNTIME,) if self.value.id == "py2cpp" else ()
 
 
 #
@@ -729,29 +1332,143 @@ class StdCout(Expr):
 #
 
 class CppTypeRegistry(types.TypeRegistry):
+    """C++ spellings of python types.
+
+    Names that are neither registered nor provided are spelled as they are
+    (``a.B`` as ``a::B``), so that the classes of the input are used as they
+    are; missing parameters of a generic are ``default``.
+    """
+
+    default = "int"
+
+    def __init__(self):
+        super(CppTypeRegistry, self).__init__()
+        self.spellings = {}
+        # registered name -> header that declares its C++ type
+        self.headers = {}
+        # memo of requires()
+        self.required = {}
+
+    def register(self, pytype, cpptype, header=None):
+        """
+        :param header: header to include for *cpptype*, e.g. "<string>"
+        """
+        super(CppTypeRegistry, self).register(pytype, cpptype)
+        self.set_header(pytype, header)
+
+    def register_generic(self, name, format, arity=1, header=None):
+        super(CppTypeRegistry, self).register_generic(name, format, arity)
+        self.set_header(name, header)
+
+    def set_header(self, name, header):
+        if header is None:
+            self.headers.pop(name, None)
+        else:
+            self.headers[name] = header
+        self.spellings.clear()
+        self.required.clear()
+
+    def add_provider(self, provider):
+        super(CppTypeRegistry, self).add_provider(provider)
+        self.spellings.clear()
+
     def convert(self, type):
-        if type in self:
-            return self.type_map[type]
-        # TODO
-        return "int"
+        """
+        :type type: str or types.PyType
+        :rtype: str
+        """
+        if isinstance(type, six.string_types):
+            type = types.parse(type)
+        cpptype = self.spellings.get(type)
+        if cpptype is None:
+            cpptype = self.spellings[type] = self.spell(type)
+        return cpptype
+
+    def spell(self, type):
+        """
+        :type type: types.PyType
+        :rtype: str
+        """
+        if type.name == "Tuple" and type.args[-1:] == (types.ELLIPSIS,):
+            # Tuple[int, ...] is a homogeneous sequence
+            return self.convert(types.make_type("List", type.args[:1]))
+        generic = self.generics.get(type.name)
+        args = [self.convert(x) for x in type.args]
+        if generic is not None:
+            format, arity = generic
+            if arity is None:
+                return format.format(", ".join(args or [self.default]))
+            args += [self.default] * (arity - len(args))
+            return format.format(*args[:arity])
+        cpptype = self.lookup(type.name)
+        if cpptype is None:
+            cpptype = type.name.replace(".", "::")
+        if args:
+            cpptype = "{}<{}>".format(cpptype, ", ".join(args))
+        return cpptype
+
+    def requires(self, type):
+        """
+        Headers that the spelling of *type* needs.
+
+        :type type: str or types.PyType or None
+        :rtype: frozenset of str
+        """
+        if type is None:
+            return frozenset()
+        if isinstance(type, six.string_types):
+            try:
+                type = types.parse(type)
+            except ValueError:
+                return frozenset()
+        ret = self.required.get(type)
+        if ret is None:
+            name = type.name
+            if name == "Tuple" and type.args[-1:] == (types.ELLIPSIS,):
+                name = "List"
+            ret = set([self.headers[name]]) if name in self.headers else set()
+            for x in type.args:
+                ret.update(self.requires(x))
+            ret = self.required[type] = frozenset(ret)
+        return ret
 
     @staticmethod
     def detect(type, rettype=False):
-        if type is None or type not in type_registry:
-            return "void" if rettype else "int"
-        return type_registry.convert(type)
+        """
+        :type type: str or types.PyType or None
+        :param rettype: *type* is a return type; then no type is void
+        :rtype: str
+        """
+        if type is None:
+            return "void" if rettype else type_registry.default
+        try:
+            return type_registry.convert(type)
+        except ValueError:
+            # free-form docstring type
+            return type_registry.default
 
 
 type_registry = CppTypeRegistry()
 
 # built-in types
+type_registry.register("None", "void")
+type_registry.register(types.UNKNOWN.name, "auto")
 type_registry.register("bool", "bool")
 type_registry.register("int", "int")
 type_registry.register("long", "long")
 type_registry.register("float", "double")
-type_registry.register("complex", "std::complex<double>")
-type_registry.register("str", "std::string")
-type_registry.register("bytearray", "std::string")
-#type_registry.register("list", "std::vector")
-type_registry.register("List[int]", "std::vector<int>")
-#type_registry.register("tuple", "std::tuple")
+type_registry.register("complex", "std::complex<double>", "<complex>")
+type_registry.register("str", "std::string", "<string>")
+type_registry.register("bytearray", "std::string", "<string>")
+type_registry.register("bytes", "std::string", "<string>")
+
+# generics, by their typing names; see types.ALIASES
+type_registry.register_generic("List", "std::vector<{}>", header="<vector>")
+type_registry.register_generic("Sequence", "std::vector<{}>", header="<vector>")
+type_registry.register_generic("Iterable", "std::vector<{}>", header="<vector>")
+type_registry.register_generic("Dict", "std::unordered_map<{}, {}>", 2, "<unordered_map>")
+type_registry.register_generic("Mapping", "std::unordered_map<{}, {}>", 2, "<unordered_map>")
+type_registry.register_generic("Set", "std::unordered_set<{}>", header="<unordered_set>")
+type_registry.register_generic("FrozenSet", "std::unordered_set<{}>", header="<unordered_set>")
+type_registry.register_generic("Tuple", "std::tuple<{}>", None, "<tuple>")
+type_registry.register_generic("Optional", "{}")
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import ast
+import io
+
+from .converter import Converter
+from .cpp import BuildContext
+from .cpp import CodeWriter
+from .cpp import Verbatim
+from .cpp import format_includes
+from .cpp import includes
+from .cpp import render
+from .profiler import instrument_ir
+
+
+def write_header(output, name):
+    print("// generate by py2cpp", file=output)
+    print("// original source code:", name, file=output)
+
+
+def emit(source, output, store=None, converter=None, profiler=None):
+    """
+    Convert python *source* and write the C++ code, without the header
+    comment, to *output*. The code includes only the headers it uses.
+
+    :type source: str
+    :type output: file
+    :param store: reuse the code of unchanged top-level definitions from
+                  this store (see Converter)
+    :param converter: Converter to use instead of a new one; its own store
+                      is used
+    :type profiler: py2cpp.profiler.Profiler
+    :rtype: Converter
+    """
+    if profiler is None:
+        node = ast.parse(source)
+    else:
+        with profiler.measure("parse"):
+            node = ast.parse(source)
+    conv = converter if converter is not None else Converter(store=store, profiler=profiler)
+    cpp_node = conv.visit(node)
+
+    ctx = BuildContext.create(profiler)
+    if profiler is None:
+        emit_module(cpp_node, ctx, conv, output)
+    else:
+        with instrument_ir():
+            emit_module(cpp_node, ctx, conv, output)
+    return conv
+
+
+def emit_module(cpp_node, ctx, conv, output):
+    store = conv.store
+    if store is not None:
+        for definition in conv.definitions.values():
+            if definition.reused:
+                continue
+            node = cpp_node.body[definition.index]
+            verbatim = Verbatim(render(node, ctx), includes(node))
+            store.put(definition.fingerprint, verbatim.dump())
+            cpp_node.body[definition.index] = verbatim
+    lines = format_includes(includes(cpp_node))
+    if lines:
+        output.write(u"\n".join(lines) + u"\n\n")
+    cpp_node.emit(ctx, CodeWriter(output))
+
+
+def convert(source, store=None, converter=None, profiler=None):
+    """
+    :type source: str
+    :rtype: str
+    """
+    stream = io.StringIO()
+    emit(source, stream, store=store, converter=converter, profiler=profiler)
+    return stream.getvalue()
+
+
+def transpile(source, name, output, cache=None, converter=None, profiler=None):
+    """
+    Convert python *source* and write the C++ code to *output*.
+
+    :type source: str
+    :type name: str
+    :param name: source file name written to the header
+    :type output: file
+    :type cache: py2cpp.cache.Cache
+    :type converter: Converter
+    :type profiler: py2cpp.profiler.Profiler
+    :return: True if the code was taken from *cache*
+    """
+    write_header(output, name)
+    if cache is None:
+        emit(source, output, converter=converter, profiler=profiler)
+        return False
+    key = cache.key(source)
+    code = cache.get(key)
+    if code is not None:
+        output.write(code)
+        return True
+    # top-level definitions are cached too, so that editing one function
+    # only converts that function again
+    code = convert(source, store=cache, converter=converter, profiler=profiler)
+    cache.put(key, code)
+    output.write(code)
+    return False
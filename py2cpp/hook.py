@@ -8,9 +8,19 @@ import six
 
 from . import cpp
 from . import docstring
+from . import infer
+from . import passing
 
 
 class Hook(object):
+
+    # AST node classes this hook may match; None means every node
+    node_types = None
+
+    # part of the transpile cache key; bump it when the output of the hook
+    # changes without a change to its code
+    version = 0
+
     def __init__(self, visitor):
         self.visitor = visitor
 
@@ -30,6 +40,9 @@ class CallHook(Hook):
 
 
 class MathPowHook(CallHook):
+
+    node_types = (ast.Call,)
+
     def match(self, node):
         if node.__class__ != ast.Call:
             return False
@@ -46,6 +59,9 @@ class MathPowHook(CallHook):
 
 
 class TupleHook(CallHook):
+
+    node_types = (ast.Call,)
+
     def match(self, node):
         if node.__class__ != ast.Call:
             return False
@@ -60,9 +76,16 @@ class TupleHook(CallHook):
 
 
 class NoneHook(CallHook):
+
+    if six.PY3:
+        # python 3.8 parses every literal into a Constant
+        node_types = (ast.NameConstant, getattr(ast, "Constant", ast.NameConstant))
+    else:
+        node_types = (ast.Name,)
+
     def match(self, node):
         if six.PY3:
-            if node.__class__ != ast.NameConstant:
+            if node.__class__.__name__ not in ("NameConstant", "Constant"):
                 return False
             return node.value is None
         elif six.PY2:
@@ -76,6 +99,9 @@ class NoneHook(CallHook):
 
 
 class ArgTypeHook(CallHook):
+
+    node_types = (ast.FunctionDef,)
+
     def match(self, node):
         return node.__class__ == ast.FunctionDef
 
@@ -83,11 +109,15 @@ class ArgTypeHook(CallHook):
         if ret.docstring is None:
             return ret
         for type in docstring.get_params(ret.docstring):
-            ret.args.set_arg_type(type["param"], cpp.type_registry.convert(type["type"]))
+            if type["type"] is not None:
+                ret.args.set_arg_type(type["param"], type["type"])
         return ret
 
 
 class RangeHook(CallHook):
+
+    node_types = (ast.Call,)
+
     def match(self, node):
         if node.__class__ != ast.Call:
             return False
@@ -101,7 +131,99 @@ class RangeHook(CallHook):
         return ret
 
 
+class RangeForHook(Hook):
+    """``for i in range(...)`` as a counted loop instead of a range object"""
+
+    node_types = (ast.For,)
+
+    RANGES = ("range", "xrange")
+
+    def match(self, node):
+        if node.__class__ != ast.For or node.target.__class__ != ast.Name:
+            return False
+        call = node.iter
+        if call.__class__ != ast.Call or call.func.__class__ != ast.Name:
+            return False
+        if call.func.id not in self.RANGES or call.func.id in self.visitor.module_types.functions:
+            return False
+        if call.keywords or not 1 <= len(call.args) <= 3:
+            return False
+        if any(x.__class__.__name__ == "Starred" for x in call.args):
+            return False
+        if getattr(call, "starargs", None) or getattr(call, "kwargs", None):
+            return False
+        # rebinding the index in the body does not change the iteration
+        if node.target.id in self.stored(node.body + node.orelse):
+            return False
+        # range() raises for a zero step
+        return self.step(call) != 0
+
+    @staticmethod
+    def stored(body):
+        return set(x.id for stmt in body for x in ast.walk(stmt)
+                   if isinstance(x, ast.Name) and not isinstance(x.ctx, ast.Load))
+
+    @staticmethod
+    def step(call):
+        """
+        :return: the constant step of a range() call, or None
+        """
+        return infer.range_step(call)
+
+    def invariant(self, node, stored):
+        """whether *node* has the same value in every iteration"""
+        for x in ast.walk(node):
+            if isinstance(x, (ast.Call, ast.Attribute, ast.Subscript)):
+                return False
+            if isinstance(x, ast.Name) and x.id in stored:
+                return False
+        return True
+
+    def apply(self, node, ret):
+        call = node.iter
+        args = ret.iter.args
+        if len(args) == 1:
+            start, stop = cpp.Num(0), args[0]
+        else:
+            start, stop = args[0], args[1]
+        step = self.step(call)
+        stored = self.stored(node.body)
+        names = set(x.id for x in ast.walk(node) if isinstance(x, ast.Name))
+        index = node.target.id
+        stop_name = step_name = None
+        if not self.invariant(call.args[-1 if len(args) < 3 else 1], stored):
+            stop_name = self.unique(index + "_stop", names)
+        if step is None:
+            step_arg, sign = args[2], None
+            if not self.invariant(call.args[2], stored):
+                step_name = self.unique(index + "_step", names)
+        else:
+            step_arg, sign = cpp.Num(abs(step)), 1 if step > 0 else -1
+        return cpp.RangeFor(target=ret.target, declare=self.index_type(call), start=start, stop=stop,
+                            step=step_arg, sign=sign, body=ret.body, orelse=ret.orelse,
+                            stop_name=stop_name, step_name=step_name, prologue=ret.prologue,
+                            item=ret.item)
+
+    @staticmethod
+    def unique(name, names):
+        while name in names:
+            name += "_"
+        return name
+
+    def index_type(self, call):
+        """int, or long if one of the arguments is a long"""
+        inference = self.visitor.inference()
+        result = infer.INT
+        for x in call.args:
+            if inference.expr_type(x) is infer.LONG:
+                result = infer.LONG
+        return result
+
+
 class PrintHook(ExprHook):
+
+    node_types = (ast.Expr,)
+
     def match(self, node):
         if node.__class__ != ast.Expr:
             return False
@@ -112,8 +234,288 @@ class PrintHook(ExprHook):
             return False
         return value.func.id == "print"
 
+    # keyword arguments, as the setters of py2cpp::print_options
+    OPTIONS = ("sep", "end", "file", "flush")
+
+    def apply(self, node, ret):
+        call = ret.value
+        call.func = cpp.CppScope(value=cpp.Name(id="py2cpp"), attr="print")
+        options = None
+        for keyword, value in zip(node.value.keywords, call.keywords):
+            # None is the default
+            if keyword.arg not in self.OPTIONS or infer.constant(keyword.value) == (True, None):
+                continue
+            if options is None:
+                options = cpp.Call(cpp.CppScope(value=cpp.Name(id="py2cpp"), attr="print_options"), [])
+            options = cpp.Call(cpp.Attribute(options, keyword.arg), [value.value])
+        if options is not None:
+            call.args = [options] + call.args
+        call.keywords = []
+        return ret
+
+
+class DivisionHook(ExprHook):
+    """python's ``//`` and ``%`` by the types and signs of the operands"""
+
+    node_types = (ast.BinOp,)
+
+    INTEGERS = (infer.BOOL, infer.INT, infer.LONG)
+
+    def match(self, node):
+        return node.__class__ == ast.BinOp and node.op.__class__ in (ast.FloorDiv, ast.Mod)
+
+    def apply(self, node, ret):
+        inference = self.visitor.inference()
+        left = inference.expr_type(node.left)
+        right = inference.expr_type(node.right)
+        if left is infer.STR:
+            # formatting
+            return ret
+        floordiv = node.op.__class__ == ast.FloorDiv
+        names = self.visitor.scopes[-1].nonnegative if self.visitor.scopes else set()
+        # C++ and python agree when neither operand is negative; the loop
+        # indexes among the names are not in the types of the scope
+        if left in self.INTEGERS + (infer.UNKNOWN,) and right in self.INTEGERS + (infer.UNKNOWN,):
+            if inference.nonnegative(node.left, names) and inference.nonnegative(node.right, names):
+                return ret
+        if floordiv and infer.FLOAT in (left, right) and left in infer.NUMBERS and right in infer.NUMBERS:
+            quotient = cpp.BinOp(ret.left, "/", ret.right)
+            return cpp.Call(cpp.CppScope(value=cpp.Name(id="std"), attr="floor"), [quotient])
+        name = "floordiv" if floordiv else "mod"
+        return cpp.Call(cpp.CppScope(value=cpp.Name(id="py2cpp"), attr=name), [ret.left, ret.right])
+
+
+class PowerHook(ExprHook):
+    """``**`` by the types of the operands: multiplications for small
+    exponents and exponentiation by squaring for integers, ``std::pow``
+    otherwise"""
+
+    node_types = (ast.BinOp,)
+
+    # the largest integer exponent written out as multiplications
+    CHAIN = 3
+
+    def match(self, node):
+        return node.__class__ == ast.BinOp and node.op.__class__ == ast.Pow
+
+    def apply(self, node, ret):
+        inference = self.visitor.inference()
+        names = self.visitor.scopes[-1].nonnegative if self.visitor.scopes else set()
+        left = inference.expr_type(node.left)
+        right = inference.expr_type(node.right)
+        base, exponent = ret.args
+        power = infer.constant_power(node)
+        if power is infer.FLOAT:
+            # python's exact integer does not fit in 64 bits
+            return ret
+        if power is infer.LONG and left is not infer.LONG:
+            base = cpp.Num("{}L".format(infer.constant(node.left)[1]))
+        found, value = infer.constant(node.right)
+        if not found or isinstance(value, bool) or not isinstance(value, six.integer_types):
+            value = None
+        # the loop indexes among the names are not in the types of the scope
+        integral = left in DivisionHook.INTEGERS or (left is infer.UNKNOWN and inference.nonnegative(node.left, names))
+        if value == 2 and (integral or left in (infer.FLOAT, infer.UNKNOWN)):
+            # x * x is rounded once, like pow(x, 2)
+            return self.chain(node, base, 2)
+        if not integral or right not in DivisionHook.INTEGERS + (infer.UNKNOWN,):
+            return ret
+        if not inference.nonnegative(node.right, names):
+            # python's result is a float for a negative exponent
+            return ret
+        if value is not None and 1 <= value <= self.CHAIN and node.left.__class__ == ast.Name:
+            return self.chain(node, base, value)
+        return cpp.Call(cpp.CppScope(value=cpp.Name(id="py2cpp"), attr="pow"), [base, exponent])
+
+    @staticmethod
+    def chain(node, base, n):
+        if node.left.__class__ != ast.Name:
+            # evaluated once
+            return cpp.Call(cpp.CppScope(value=cpp.Name(id="py2cpp"), attr="square"), [base])
+        ret = base
+        for _ in range(n - 1):
+            ret = cpp.BinOp(ret, "*", base)
+        return ret
+
+
+class StreamHook(ExprHook):
+    """``sys.stdout`` and ``sys.stderr`` as the buffered streams of the runtime"""
+
+    node_types = (ast.Attribute,)
+
+    STREAMS = {
+        "stdout": "out",
+        "stderr": "err",
+    }
+
+    def match(self, node):
+        if node.__class__ != ast.Attribute or node.value.__class__ != ast.Name:
+            return False
+        return node.value.id == "sys" and node.attr in self.STREAMS
+
+    def apply(self, node, ret):
+        return cpp.Call(cpp.CppScope(value=cpp.Name(id="py2cpp"), attr=self.STREAMS[node.attr]), [])
+
+
+class ReductionHook(CallHook):
+    """``sum``, ``min``, ``max``, ``any`` and ``all`` of a comprehension as a
+    single loop, without the intermediate container"""
+
+    node_types = (ast.Call,)
+
+    REDUCTIONS = ("all", "any", "max", "min", "sum")
+
+    def match(self, node):
+        if node.__class__ != ast.Call or node.func.__class__ != ast.Name:
+            return False
+        name = node.func.id
+        if name not in self.REDUCTIONS or name in self.visitor.module_types.functions:
+            return False
+        if node.keywords or not 1 <= len(node.args) <= (2 if name == "sum" else 1):
+            return False
+        return node.args[0].__class__ in (ast.GeneratorExp, ast.ListComp)
+
+    def apply(self, node, ret):
+        comprehension = ret.args[0]
+        if not isinstance(comprehension, cpp.Comprehension):
+            return ret
+        name = node.func.id
+        elt = comprehension.elt
+        inner = comprehension.inner
+        del inner[:]
+        if name in ("any", "all"):
+            test = elt if name == "any" else cpp.UnaryOp(op="!", operand=elt)
+            inner.append(cpp.If(test=test, body=[cpp.Return(cpp.NameConstant(name == "any"))], orelse=[]))
+            comprehension.setup = []
+            comprehension.finish = [cpp.Return(cpp.NameConstant(name == "all"))]
+            return comprehension
+        declare = infer.concrete(self.visitor.inference().expr_type(node))
+        if name == "sum":
+            total = cpp.Name(self.visitor.unique_name("total", node))
+            start = ret.args[1] if len(ret.args) > 1 else cpp.Num(0)
+            inner.append(cpp.AugAssign(total, "+", elt))
+            comprehension.setup = [cpp.Assign([total], start, declare=declare)]
+            comprehension.finish = [cpp.Return(total)]
+            return comprehension
+        first, best, value = [cpp.Name(self.visitor.unique_name(x, node)) for x in ("first", "best", "value")]
+        # the first of equal items wins, as in python
+        better = cpp.Compare(value, ["<"], [best]) if name == "min" else cpp.Compare(best, ["<"], [value])
+        inner.append(cpp.Assign([value], elt, declare=declare))
+        inner.append(cpp.If(
+            test=cpp.BoolOp("||", [first, better]),
+            body=[cpp.Assign([best], value), cpp.Assign([first], cpp.NameConstant(False))],
+            orelse=[]))
+        empty = cpp.Call(cpp.CppScope(value=cpp.Name(id="std"), attr="invalid_argument"),
+                         [cpp.Str("{}() arg is an empty sequence".format(name))])
+        comprehension.setup = [cpp.Assign([first], cpp.NameConstant(True), declare=infer.BOOL),
+                               cpp.Declare(best.id, declare)]
+        comprehension.finish = [cpp.If(test=first, body=[cpp.Raise(exc=empty)], orelse=[]),
+                                cpp.Return(best)]
+        return comprehension
+
+
+class BuiltinHook(CallHook):
+    """built-in functions that the runtime implements"""
+
+    node_types = (ast.Call,)
+
+    BUILTINS = ("len", "max", "min", "str", "sum")
+
+    def match(self, node):
+        if node.__class__ != ast.Call or node.func.__class__ != ast.Name:
+            return False
+        if node.keywords:
+            return False
+        return node.func.id in self.BUILTINS and node.func.id not in self.visitor.module_types.functions
+
+    def apply(self, node, ret):
+        ret.func = cpp.CppScope(value=cpp.Name(id="py2cpp"), attr=node.func.id)
+        return ret
+
+
+class AppendHook(CallHook):
+    """``list.append`` as ``std::vector::push_back``"""
+
+    node_types = (ast.Call,)
+
+    def match(self, node):
+        if node.__class__ != ast.Call or node.func.__class__ != ast.Attribute:
+            return False
+        if node.func.attr != "append" or len(node.args) != 1 or node.keywords:
+            return False
+        return self.visitor.inference().expr_type(node.func.value).name == "List"
+
+    def apply(self, node, ret):
+        ret.func.attr = "push_back"
+        return ret
+
+
+class StrMethodHook(CallHook):
+    """methods of ``str`` that the runtime implements, e.g. ``s.split()`` as
+    ``py2cpp::split(s)`` and ``sep.join(items)`` as ``py2cpp::join(sep, items)``"""
+
+    node_types = (ast.Call,)
+
+    # the numbers of arguments of each method
+    METHODS = {
+        "split": (0, 1),
+        "join": (1,),
+        "strip": (0,),
+        "lstrip": (0,),
+        "rstrip": (0,),
+        "upper": (0,),
+        "lower": (0,),
+        "startswith": (1,),
+        "endswith": (1,),
+        "replace": (2,),
+    }
+
+    def match(self, node):
+        if node.__class__ != ast.Call or node.func.__class__ != ast.Attribute:
+            return False
+        if len(node.args) not in self.METHODS.get(node.func.attr, ()) or node.keywords:
+            return False
+        # s.split(None) splits at whitespace
+        if any(x.__class__.__name__ == "Starred" or infer.constant(x) == (True, None) for x in node.args):
+            return False
+        return self.visitor.inference().expr_type(node.func.value) is infer.STR
+
+    def apply(self, node, ret):
+        func = cpp.CppScope(value=cpp.Name(id="py2cpp"), attr=node.func.attr)
+        return cpp.Call(func, [ret.func.value] + ret.args)
+
+
+class PopHook(CallHook):
+    """``list.pop()`` as ``py2cpp::pop``, which returns the removed item"""
+
+    node_types = (ast.Call,)
+
+    def match(self, node):
+        if node.__class__ != ast.Call or node.func.__class__ != ast.Attribute:
+            return False
+        if node.func.attr != "pop" or node.args or node.keywords:
+            return False
+        return self.visitor.inference().expr_type(node.func.value).name == "List"
+
+    def apply(self, node, ret):
+        return cpp.Call(cpp.CppScope(value=cpp.Name(id="py2cpp"), attr="pop"), [ret.func.value])
+
+
+class LvalueHook(CallHook):
+    """temporaries as arguments of ``T&`` parameters; see :mod:`passing`"""
+
+    node_types = (ast.Call,)
+
+    def match(self, node):
+        if node.__class__ != ast.Call or node.func.__class__ != ast.Name:
+            return False
+        refs = self.visitor.module_types.refs.get(node.func.id, ())
+        return any(i < len(node.args) and not passing.lvalue(node.args[i]) for i in refs)
+
     def apply(self, node, ret):
-        ret = cpp.StdCout(value=ret.value)
+        for i in self.visitor.module_types.refs[node.func.id]:
+            if i < len(node.args) and not passing.lvalue(node.args[i]):
+                ret.args[i] = cpp.Call(cpp.CppScope(value=cpp.Name(id="py2cpp"), attr="lvalue"), [ret.args[i]])
         return ret
 
 
@@ -123,5 +525,15 @@ Hooks = [
     NoneHook,
     ArgTypeHook,
     RangeHook,
+    RangeForHook,
     PrintHook,
+    DivisionHook,
+    PowerHook,
+    StreamHook,
+    ReductionHook,
+    BuiltinHook,
+    AppendHook,
+    StrMethodHook,
+    PopHook,
+    LvalueHook,
 ]
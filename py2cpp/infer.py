@@ -0,0 +1,1087 @@
+# -*- coding: utf-8 -*-
+
+"""Type inference of the local variables of functions.
+
+Types are inferred from literals, annotations, docstrings, the known
+return types of builtins and the signatures of the module level
+functions. The statements of a function are walked in order until the
+types of its locals stop changing, so that a local takes the join of the
+types of all of its assignments, and containers the types of the items
+added to them (``x = list(); x.append(1)`` makes ``x`` a ``List[int]``).
+Only the signatures of other definitions are used, so the result for a
+function depends on nothing the incremental converter does not
+fingerprint; the parameter modes of :mod:`passing` are part of those
+signatures.
+"""
+
+from __future__ import absolute_import
+
+import ast
+
+import six
+
+from . import docstring
+from . import types
+from .types import PyType
+from .types import make_type
+
+UNKNOWN = types.UNKNOWN
+NONE = types.NONE
+BOOL = PyType("bool")
+INT = PyType("int")
+LONG = PyType("long")
+FLOAT = PyType("float")
+COMPLEX = PyType("complex")
+STR = PyType("str")
+
+# numeric types, narrowest first
+NUMBERS = [BOOL, INT, LONG, FLOAT, COMPLEX]
+
+DEFAULT = INT
+
+BUILTINS = {
+    "int": INT,
+    "float": FLOAT,
+    "complex": COMPLEX,
+    "str": STR,
+    "bool": BOOL,
+    "len": INT,
+    "ord": INT,
+    "hash": INT,
+    "chr": STR,
+    "repr": STR,
+    "input": STR,
+    "any": BOOL,
+    "all": BOOL,
+}
+
+# empty containers, typed by the items added to them later
+CONSTRUCTORS = {
+    "list": "List",
+    "dict": "Dict",
+    "set": "Set",
+}
+
+MATH_INT = ["floor", "ceil", "trunc"] if six.PY3 else []
+MATH_INT += ["factorial", "gcd"]
+
+STR_METHODS = {
+    "find": INT,
+    "rfind": INT,
+    "index": INT,
+    "count": INT,
+    "startswith": BOOL,
+    "endswith": BOOL,
+    "isdigit": BOOL,
+    "isalpha": BOOL,
+    "isspace": BOOL,
+    "split": make_type("List", [STR]),
+}
+
+SCOPES = (ast.FunctionDef, ast.ClassDef, ast.Lambda)
+
+# expressions that become lambdas, which C++14 does not allow in decltype
+UNDEDUCIBLE = (ast.Lambda, ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)
+
+# containers whose size() is cheap
+SIZED = ("List", "Set", "FrozenSet", "Dict")
+
+
+def constant(node):
+    """
+    :return: (True, value) if *node* is a literal, else (False, None)
+    """
+    name = node.__class__.__name__
+    if name in ("Constant", "NameConstant"):
+        return True, node.value
+    if name == "Num":
+        return True, node.n
+    if name == "Str":
+        return True, node.s
+    if six.PY2 and isinstance(node, ast.Name) and node.id in ("True", "False", "None"):
+        return True, {"True": True, "False": False, "None": None}[node.id]
+    return False, None
+
+
+def constant_power(node):
+    """
+    :return: the type of the ``**`` *node* of integer literals with a
+             non-negative exponent, float if the result is wider than 64
+             bits, which no C++ integer holds; None for other operands
+    """
+    found, base = constant(node.left)
+    found_exponent, exponent = constant(node.right)
+    if not (found and found_exponent):
+        return None
+    if any(isinstance(x, bool) or not isinstance(x, six.integer_types) for x in (base, exponent)):
+        return None
+    if exponent < 0:
+        return None
+    # at least 2 ** 64, computed without building a huge number
+    if abs(base) > 1 and exponent * (abs(base).bit_length() - 1) >= 64:
+        return FLOAT
+    return integer_type(base ** exponent) or FLOAT
+
+
+def range_step(call):
+    """
+    :return: the constant step of a range() call, or None
+    """
+    if len(call.args) < 3:
+        return 1
+    node = call.args[2]
+    sign = 1
+    if node.__class__ == ast.UnaryOp and node.op.__class__ in (ast.USub, ast.UAdd):
+        sign = -1 if node.op.__class__ == ast.USub else 1
+        node = node.operand
+    found, value = constant(node)
+    if found and isinstance(value, six.integer_types) and not isinstance(value, bool):
+        return sign * value
+    return None
+
+
+# the values of the C++ integer types
+INTEGER_RANGES = [
+    (INT, -2 ** 31, 2 ** 31 - 1),
+    (LONG, -2 ** 63, 2 ** 63 - 1),
+]
+
+
+def integer_type(value):
+    """
+    :return: the narrowest integer type that holds *value*, or None
+    """
+    for t, low, high in INTEGER_RANGES:
+        if low <= value <= high:
+            return t
+    return None
+
+
+def literal_type(value):
+    if isinstance(value, bool):
+        return BOOL
+    if isinstance(value, six.integer_types):
+        return integer_type(value) or LONG
+    if isinstance(value, float):
+        return FLOAT
+    if isinstance(value, complex):
+        return COMPLEX
+    if isinstance(value, six.string_types + (bytes,)):
+        return STR
+    if value is None:
+        return NONE
+    return UNKNOWN
+
+
+def join(a, b):
+    """
+    Smallest type of the values of both *a* and *b*; of two unrelated
+    types, the first one.
+
+    :type a: PyType or None
+    :type b: PyType
+    :rtype: PyType
+    """
+    if a is None or a is UNKNOWN or a is NONE:
+        return b
+    if b is UNKNOWN or b is NONE or a is b:
+        return a
+    if a in NUMBERS and b in NUMBERS:
+        return max(a, b, key=NUMBERS.index)
+    if a.name == b.name and len(a.args) == len(b.args):
+        return make_type(a.name, [join(x, y) for x, y in zip(a.args, b.args)])
+    return a
+
+
+def compatible(a, b):
+    """
+    :return: whether a variable of type *a* can also hold the values of
+             type *b*, after join()
+    :type a: PyType or None
+    :type b: PyType
+    """
+    if a is None or a is b or UNKNOWN in (a, b) or NONE in (a, b):
+        return True
+    if a in NUMBERS and b in NUMBERS:
+        return True
+    return (a.name == b.name and len(a.args) == len(b.args)
+            and all(compatible(x, y) for x, y in zip(a.args, b.args)))
+
+
+def concrete(t, default=DEFAULT):
+    """
+    :return: *t* with its unknown parts replaced by *default*
+    :rtype: PyType
+    """
+    if t is UNKNOWN or t is NONE:
+        return default
+    if not t.args:
+        return t
+    return make_type(t.name, [concrete(x, default) for x in t.args])
+
+
+def element_type(t):
+    """type of the items of an iterable of type *t*"""
+    if t is STR:
+        return STR
+    if t.name in ("List", "Set", "FrozenSet", "Sequence", "Iterable", "Dict") and t.args:
+        return t.args[0]
+    if t.name == "Tuple" and t.args:
+        items = UNKNOWN
+        for x in t.args:
+            if x is not types.ELLIPSIS:
+                items = join(items, x)
+        return items
+    return UNKNOWN
+
+
+def docstring_type(s):
+    if s is None:
+        return None
+    try:
+        return types.parse(s)
+    except ValueError:
+        return None
+
+
+def declared_returns(node):
+    """
+    :type node: ast.FunctionDef
+    :return: the return type given by the annotation or the docstring
+    :rtype: PyType or None
+    """
+    returns = getattr(node, "returns", None)
+    if returns is not None:
+        return types.from_ast(returns)
+    doc = ast.get_docstring(node)
+    if doc is None:
+        return None
+    return docstring_type(docstring.get_rtype(doc))
+
+
+def iter_statements(body):
+    """statements of *body* and of their blocks, not of nested scopes"""
+    for stmt in body:
+        yield stmt
+        if isinstance(stmt, SCOPES):
+            continue
+        for field in ("body", "orelse", "finalbody"):
+            block = getattr(stmt, field, None)
+            if isinstance(block, list):
+                for x in iter_statements(block):
+                    yield x
+
+
+def iter_blocks(body):
+    """*body* and the blocks of its statements, not of nested scopes"""
+    yield body
+    for stmt in iter_statements(body):
+        if isinstance(stmt, SCOPES):
+            continue
+        for field in ("body", "orelse", "finalbody"):
+            block = getattr(stmt, field, None)
+            if isinstance(block, list):
+                yield block
+
+
+def exits(nodes, loop=True):
+    """whether *nodes* may leave the loop whose body they are before its end"""
+    for node in nodes:
+        if isinstance(node, ast.Return) or (loop and isinstance(node, (ast.Break, ast.Continue))):
+            return True
+        if isinstance(node, SCOPES):
+            continue
+        if exits(ast.iter_child_nodes(node), loop and not isinstance(node, (ast.For, ast.While))):
+            return True
+    return False
+
+
+def target_names(target):
+    if isinstance(target, ast.Name):
+        return [target.id]
+    if isinstance(target, (ast.Tuple, ast.List)):
+        return [y for x in target.elts for y in target_names(x)]
+    return []
+
+
+def count_names(nodes, name):
+    return sum(1 for node in nodes for x in ast.walk(node)
+               if isinstance(x, ast.Name) and x.id == name)
+
+
+BLOCK_FIELDS = ("body", "orelse", "finalbody")
+
+
+def _collect_names(node, names, here, paths):
+    if isinstance(node, ast.Name):
+        if node.id in names:
+            paths[node.id].append(here)
+        return
+    for field in node._fields:
+        value = getattr(node, field, None)
+        if isinstance(value, list):
+            for x in value:
+                if isinstance(x, ast.AST):
+                    _collect_names(x, names, here, paths)
+        elif isinstance(value, ast.AST):
+            _collect_names(value, names, here, paths)
+
+
+def escaping_indexes(body):
+    """
+    :return: the names of the for loop targets that are also used outside
+             of the loops that bind them, e.g. read after the loop
+    :rtype: set
+    """
+    loops = {}
+    for stmt in iter_statements(body):
+        if isinstance(stmt, ast.For) and isinstance(stmt.target, ast.Name):
+            inside = loops.setdefault(stmt.target.id, set())
+            for node in [stmt.target] + stmt.body + stmt.orelse:
+                inside.update(id(x) for x in ast.walk(node) if isinstance(x, ast.Name))
+    ret = set()
+    for stmt in body:
+        for x in ast.walk(stmt):
+            if isinstance(x, ast.Name) and x.id in loops and id(x) not in loops[x.id]:
+                ret.add(x.id)
+    return ret
+
+
+def scan(body, names):
+    """
+    Find where each of *names* is first assigned and where it occurs.
+
+    :return: (first, paths): the (block, index) of the statement that first
+             assigns each name, and for each name the paths of its
+             occurrences; a path is the (id of the block, index) of each
+             enclosing statement
+    :rtype: tuple of dict
+    """
+    first = {}
+    paths = dict((x, []) for x in names)
+
+    def visit_block(block, path):
+        for i, stmt in enumerate(block):
+            here = path + ((id(block), i),)
+            if isinstance(stmt, ast.Assign):
+                targets = stmt.targets
+            elif isinstance(stmt, ast.AugAssign) or stmt.__class__.__name__ == "AnnAssign":
+                targets = [stmt.target]
+            elif isinstance(stmt, ast.For):
+                targets = [stmt.target]
+            else:
+                targets = []
+            for target in targets:
+                for name in target_names(target):
+                    if name in names and name not in first:
+                        first[name] = (block, i)
+            nested = isinstance(stmt, SCOPES)
+            for field in stmt._fields:
+                value = getattr(stmt, field, None)
+                if field in BLOCK_FIELDS and not nested and isinstance(value, list):
+                    visit_block(value, here)
+                elif isinstance(value, list):
+                    for x in value:
+                        if isinstance(x, ast.AST):
+                            _collect_names(x, names, here, paths)
+                elif isinstance(value, ast.AST):
+                    _collect_names(value, names, here, paths)
+
+    visit_block(body, ())
+    return first, paths
+
+
+def empty_container(node):
+    """
+    :return: whether *node* is ``list()``, ``[]`` or an other empty container
+    """
+    if isinstance(node, ast.Call):
+        return (isinstance(node.func, ast.Name) and node.func.id in CONSTRUCTORS
+                and not node.args and not node.keywords)
+    if isinstance(node, (ast.List, ast.Set)):
+        return not node.elts
+    if isinstance(node, ast.Dict):
+        return not node.keys
+    return False
+
+
+class ModuleTypes(object):
+    """Types of the module level names that functions refer to."""
+    def __init__(self, node=None):
+        """
+        :type node: ast.Module
+        """
+        self.functions = {}
+        self.classes = set()
+        self.globals = {}
+        self.methods = {}
+        # see passing.pass_parameters
+        self.passing = {}
+        self.refs = {}
+        for stmt in node.body if node is not None else []:
+            if isinstance(stmt, ast.FunctionDef):
+                self.functions[stmt.name] = declared_returns(stmt)
+            elif isinstance(stmt, ast.ClassDef):
+                self.classes.add(stmt.name)
+                for x in stmt.body:
+                    if isinstance(x, ast.FunctionDef):
+                        self.methods[x] = stmt.name
+            elif isinstance(stmt, ast.Assign):
+                # see tables.StaticTable
+                t = getattr(stmt, "table_type", None)
+                if t is None:
+                    t = Inference(self).expr_type(stmt.value)
+                for target in stmt.targets:
+                    for name in target_names(target):
+                        self.globals[name] = join(self.globals.get(name), t)
+
+
+class FunctionTypes(object):
+    """Inferred types of a function.
+
+    :ivar locals: type by name of the local variables
+    :ivar declarations: declared type by the Assign statement that first
+                        assigns a local, if the local can be declared there
+    :ivar hoisted: (name, type) of the locals that are declared at the
+                   start of the function, because they are used outside the
+                   block of their first assignment
+    :ivar deduced: by the name of a hoisted local of unknown type, the
+                   value of its first assignment, whose type it is declared
+                   with
+    :ivar conflicts: by the name of a local assigned values of types that
+                     one C++ variable cannot hold, the first two such types
+    :ivar params: type by name of the parameters that only have a default
+    :ivar returns: type of the returned values if not declared, or None
+    :ivar env: type by name of the parameters and the locals
+    :ivar variables: the names of the parameters and the locals, which for
+                     loops assign instead of declaring their own index
+    :ivar reserves: by the For statement that fills new lists, the (name,
+                    terms) of each list; see :meth:`FunctionInference.appends`
+    :ivar moves: the Name nodes of the last uses of locals that are moved
+    :ivar nonnegative: the integer locals and loop indexes that are never
+                       negative
+    """
+    def __init__(self):
+        self.env = {}
+        self.variables = set()
+        self.locals = {}
+        self.declarations = {}
+        self.hoisted = []
+        self.deduced = {}
+        self.conflicts = {}
+        self.reserves = {}
+        self.moves = set()
+        self.nonnegative = set()
+        self.params = {}
+        self.returns = None
+
+
+class Inference(object):
+    def __init__(self, module, env=None):
+        """
+        :type module: ModuleTypes
+        """
+        self.module = module
+        self.env = {} if env is None else env
+
+    def name_type(self, name):
+        if name in self.env:
+            return self.env[name]
+        if name in self.module.globals:
+            return self.module.globals[name]
+        if name in ("True", "False"):
+            return BOOL
+        return UNKNOWN
+
+    def expr_type(self, node):
+        """
+        :type node: ast.expr
+        :rtype: PyType
+        """
+        found, value = constant(node)
+        if found:
+            return literal_type(value)
+        method = getattr(self, "type_" + node.__class__.__name__, None)
+        if method is None:
+            return UNKNOWN
+        return method(node)
+
+    def type_Name(self, node):
+        return self.name_type(node.id)
+
+    def item_type(self, iter):
+        """type of the items that a loop over *iter* yields"""
+        if isinstance(iter, ast.Call) and isinstance(iter.func, ast.Name) and iter.func.id in ("range", "xrange"):
+            return INT
+        return element_type(self.expr_type(iter))
+
+    def countable(self, iter):
+        """whether the number of items of *iter* is cheap to compute before a
+        loop over it"""
+        if isinstance(iter, ast.Name):
+            return self.expr_type(iter).name in SIZED
+        if not (isinstance(iter, ast.Call) and isinstance(iter.func, ast.Name)):
+            return False
+        if iter.func.id not in ("range", "xrange") or iter.func.id in self.module.functions:
+            return False
+        if iter.keywords or not 1 <= len(iter.args) <= 3:
+            return False
+        # the arguments are evaluated again
+        for x in iter.args:
+            for y in ast.walk(x):
+                if isinstance(y, ast.Call) and not (isinstance(y.func, ast.Name) and y.func.id == "len"):
+                    return False
+                if y.__class__.__name__ in ("Starred", "NamedExpr"):
+                    return False
+        return True
+
+    # operators whose result is not negative if their operands are not
+    NONNEGATIVE_OPS = (ast.Add, ast.Mult, ast.FloorDiv, ast.Pow, ast.LShift, ast.RShift, ast.BitOr, ast.BitXor)
+
+    def nonnegative(self, node, names):
+        """
+        whether the integer expression *node* is never negative
+
+        :param names: the names that are never negative
+        """
+        found, value = constant(node)
+        if found:
+            return isinstance(value, six.integer_types) and value >= 0
+        if isinstance(node, ast.Name):
+            return node.id in names
+        if isinstance(node, ast.BinOp):
+            if isinstance(node.op, ast.Mod):
+                # python's remainder has the sign of the divisor
+                return self.nonnegative(node.right, names)
+            if isinstance(node.op, ast.BitAnd):
+                return self.nonnegative(node.left, names) or self.nonnegative(node.right, names)
+            return (isinstance(node.op, self.NONNEGATIVE_OPS)
+                    and self.nonnegative(node.left, names) and self.nonnegative(node.right, names))
+        if isinstance(node, ast.IfExp):
+            return self.nonnegative(node.body, names) and self.nonnegative(node.orelse, names)
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+            return node.func.id in ("len", "abs") and node.func.id not in self.module.functions
+        return False
+
+    def nonnegative_range(self, iter, names):
+        """whether the items of the range() call *iter* are never negative"""
+        if not (isinstance(iter, ast.Call) and isinstance(iter.func, ast.Name)):
+            return False
+        if iter.func.id not in ("range", "xrange") or iter.func.id in self.module.functions:
+            return False
+        if iter.keywords or not 1 <= len(iter.args) <= 3:
+            return False
+        step = range_step(iter)
+        if step is None or step == 0:
+            return False
+        if len(iter.args) == 1:
+            return True
+        if step > 0:
+            return self.nonnegative(iter.args[0], names)
+        # the items are greater than the stop
+        stop = iter.args[1]
+        if isinstance(stop, ast.UnaryOp) and isinstance(stop.op, ast.USub):
+            found, value = constant(stop.operand)
+            return found and value == 1
+        found, value = constant(stop)
+        if found and value == -1:
+            return True
+        return self.nonnegative(stop, names)
+
+    def comprehension(self, generators):
+        """
+        :return: Inference in the scope of the targets of *generators*
+        :rtype: Inference
+        """
+        ret = Inference(self.module, dict(self.env))
+        for generator in generators:
+            item = ret.item_type(generator.iter)
+            for name in target_names(generator.target):
+                ret.env[name] = item if isinstance(generator.target, ast.Name) else UNKNOWN
+        return ret
+
+    def type_ListComp(self, node):
+        return make_type("List", [self.comprehension(node.generators).expr_type(node.elt)])
+
+    def type_SetComp(self, node):
+        return make_type("Set", [self.comprehension(node.generators).expr_type(node.elt)])
+
+    def type_GeneratorExp(self, node):
+        return make_type("Iterable", [self.comprehension(node.generators).expr_type(node.elt)])
+
+    def type_DictComp(self, node):
+        inference = self.comprehension(node.generators)
+        return make_type("Dict", [inference.expr_type(node.key), inference.expr_type(node.value)])
+
+    def type_BinOp(self, node):
+        if isinstance(node.op, ast.Pow) and constant_power(node) is not None:
+            return constant_power(node)
+        if isinstance(node.op, ast.Pow) and self.expr_type(node.left) in NUMBERS:
+            # e.g. 2 ** -1 == 0.5
+            exponent = node.right
+            sign = 1
+            if isinstance(exponent, ast.UnaryOp) and isinstance(exponent.op, ast.USub):
+                exponent = exponent.operand
+                sign = -1
+            found, value = constant(exponent)
+            if found and isinstance(value, six.integer_types + (float,)) and sign * value < 0:
+                return join(FLOAT, self.expr_type(node.left))
+        return self.binop_type(self.expr_type(node.left), node.op, self.expr_type(node.right))
+
+    def binop_type(self, left, op, right):
+        if left in NUMBERS and right in NUMBERS:
+            if isinstance(op, ast.Div) and six.PY3:
+                return join(FLOAT, join(left, right))
+            if isinstance(op, (ast.BitAnd, ast.BitOr, ast.BitXor, ast.LShift, ast.RShift)):
+                return join(INT, join(left, right))
+            return join(INT, join(left, right)) if BOOL in (left, right) else join(left, right)
+        if isinstance(op, ast.Add) and left is right:
+            return left
+        if isinstance(op, ast.Mult) and (left in NUMBERS or right in NUMBERS):
+            return right if left in NUMBERS else left
+        if isinstance(op, ast.Mod) and left is STR:
+            return STR
+        return UNKNOWN
+
+    def type_UnaryOp(self, node):
+        if isinstance(node.op, ast.Not):
+            return BOOL
+        operand = self.expr_type(node.operand)
+        return INT if operand is BOOL else operand
+
+    def type_BoolOp(self, node):
+        return BOOL
+
+    def type_Compare(self, node):
+        return BOOL
+
+    def type_IfExp(self, node):
+        return join(self.expr_type(node.body), self.expr_type(node.orelse))
+
+    def type_List(self, node):
+        items = UNKNOWN
+        for x in node.elts:
+            items = join(items, self.expr_type(x))
+        return make_type("List", [items])
+
+    def type_Set(self, node):
+        return make_type("Set", self.type_List(node).args)
+
+    def type_Dict(self, node):
+        keys = values = UNKNOWN
+        for k, v in zip(node.keys, node.values):
+            if k is not None:
+                keys = join(keys, self.expr_type(k))
+                values = join(values, self.expr_type(v))
+        return make_type("Dict", [keys, values])
+
+    def type_Subscript(self, node):
+        value = self.expr_type(node.value)
+        index = node.slice
+        if index.__class__.__name__ == "Index":
+            index = index.value
+        if isinstance(index, ast.Slice):
+            return value
+        if value is STR:
+            return STR
+        if value.name == "Dict" and len(value.args) == 2:
+            return value.args[1]
+        if value.name == "Tuple":
+            found, i = constant(index)
+            if found and isinstance(i, six.integer_types) and -len(value.args) <= i < len(value.args):
+                return value.args[i]
+        return element_type(value)
+
+    def type_Call(self, node):
+        func = node.func
+        args = [self.expr_type(x) for x in node.args]
+        if isinstance(func, ast.Name):
+            name = func.id
+            if name in self.env:
+                return UNKNOWN
+            if name in self.module.functions:
+                return self.module.functions[name] or UNKNOWN
+            if name in self.module.classes:
+                return PyType(name)
+            if name in BUILTINS:
+                return BUILTINS[name]
+            if name in CONSTRUCTORS:
+                if not args:
+                    generic = CONSTRUCTORS[name]
+                    return make_type(generic, [UNKNOWN] * (2 if generic == "Dict" else 1))
+                if name == "dict":
+                    return args[0]
+                return make_type(CONSTRUCTORS[name], [element_type(args[0])])
+            if name == "tuple":
+                # tuple displays, see TupleTransformer
+                return make_type("Tuple", args)
+            if name == "sorted" and args:
+                return make_type("List", [element_type(args[0])])
+            if name in ("abs", "round") and args:
+                return INT if name == "round" and len(args) == 1 else args[0]
+            if name in ("min", "max", "sum") and args:
+                items = element_type(args[0]) if len(args) == 1 else UNKNOWN
+                for x in args if len(args) > 1 else []:
+                    items = join(items, x)
+                return INT if name == "sum" and items in (UNKNOWN, BOOL) else items
+            return UNKNOWN
+        if isinstance(func, ast.Attribute):
+            if isinstance(func.value, ast.Name) and func.value.id == "math" and "math" not in self.env:
+                return INT if func.attr in MATH_INT else FLOAT
+            return self.method_type(self.expr_type(func.value), func.attr)
+        return UNKNOWN
+
+    def method_type(self, value, attr):
+        if value is STR:
+            return STR_METHODS.get(attr, STR)
+        if value.name == "List" and value.args:
+            if attr == "pop":
+                return value.args[0]
+            if attr in ("index", "count"):
+                return INT
+            if attr == "copy":
+                return value
+        if value.name == "Dict" and len(value.args) == 2:
+            if attr in ("get", "pop", "setdefault"):
+                return value.args[1]
+            if attr == "copy":
+                return value
+        return UNKNOWN
+
+    def type_Attribute(self, node):
+        if isinstance(node.value, ast.Name) and node.value.id == "math" and "math" not in self.env:
+            return FLOAT
+        return UNKNOWN
+
+
+class FunctionInference(Inference):
+    """Walk the statements of a function until the types are stable."""
+
+    max_passes = 10
+
+    def __init__(self, node, module):
+        """
+        :type node: ast.FunctionDef
+        :type module: ModuleTypes
+        """
+        super(FunctionInference, self).__init__(module)
+        self.node = node
+        self.result = FunctionTypes()
+        self.params = self.param_types()
+        self.names = self.local_names()
+        self.annotated = {}
+        self.returned = None
+
+    def param_types(self):
+        node = self.node
+        args = node.args.args
+        documented = {}
+        doc = ast.get_docstring(node)
+        if doc is not None:
+            for param in docstring.get_params(doc):
+                t = docstring_type(param["type"])
+                if t is not None:
+                    documented[param["param"]] = t
+        defaults = [None] * (len(args) - len(node.args.defaults)) + list(node.args.defaults)
+        result = {}
+        for i, (arg, default) in enumerate(zip(args, defaults)):
+            name = arg.arg if six.PY3 else arg.id
+            annotation = getattr(arg, "annotation", None)
+            if annotation is not None:
+                t = types.from_ast(annotation)
+            elif name in documented:
+                t = documented[name]
+            elif i == 0 and self.node in self.module.methods:
+                t = PyType(self.module.methods[self.node])
+            elif default is not None and self.expr_type(default) is not UNKNOWN:
+                t = self.expr_type(default)
+                self.result.params[name] = t
+            else:
+                t = None
+            result[name] = t or DEFAULT
+        return result
+
+    def local_names(self):
+        names = set()
+        nonlocal_names = set()
+        for stmt in iter_statements(self.node.body):
+            if isinstance(stmt, ast.Assign):
+                for target in stmt.targets:
+                    names.update(target_names(target))
+            elif isinstance(stmt, (ast.AugAssign, getattr(ast, "AnnAssign", ast.AugAssign))):
+                names.update(target_names(stmt.target))
+            elif isinstance(stmt, ast.Global) or stmt.__class__.__name__ == "Nonlocal":
+                nonlocal_names.update(stmt.names)
+        names.update(escaping_indexes(self.node.body))
+        return names - nonlocal_names - set(self.params)
+
+    def infer(self):
+        """
+        :rtype: FunctionTypes
+        """
+        result = self.result
+        for _ in range(self.max_passes):
+            previous = dict(result.locals)
+            self.env = dict(self.params)
+            self.env.update(result.locals)
+            self.returned = None
+            self.walk(self.node.body)
+            if result.locals == previous:
+                break
+        result.locals.update(self.annotated)
+        result.env = dict(self.params)
+        result.env.update(result.locals)
+        result.variables = set(self.params) | self.names
+        self.declare()
+        self.reserve()
+        self.find_nonnegative()
+        if declared_returns(self.node) is None and self.returned is not None:
+            result.returns = UNKNOWN if self.returned in (UNKNOWN, NONE) else concrete(self.returned)
+        return result
+
+    def assign(self, name, t):
+        if name not in self.names:
+            return
+        previous = self.annotated.get(name, self.result.locals.get(name))
+        if not compatible(previous, t):
+            self.result.conflicts.setdefault(name, (previous, t))
+        if name in self.annotated:
+            t = self.annotated[name]
+        t = join(self.result.locals.get(name), t)
+        self.result.locals[name] = self.env[name] = t
+
+    def walk(self, body):
+        for stmt in body:
+            method = getattr(self, "walk_" + stmt.__class__.__name__, None)
+            if method is not None:
+                method(stmt)
+
+    def walk_Assign(self, stmt):
+        t = self.expr_type(stmt.value)
+        for target in stmt.targets:
+            self.assign_target(target, t)
+
+    def assign_target(self, target, t):
+        if isinstance(target, ast.Name):
+            self.assign(target.id, t)
+        elif isinstance(target, (ast.Tuple, ast.List)):
+            for i, x in enumerate(target.elts):
+                item = t.args[i] if t.name == "Tuple" and len(t.args) == len(target.elts) else element_type(t)
+                self.assign_target(x, item)
+        elif isinstance(target, ast.Subscript) and isinstance(target.value, ast.Name):
+            # d[k] = v types an empty dict
+            container = self.name_type(target.value.id)
+            if container.name == "Dict":
+                index = target.slice
+                if index.__class__.__name__ == "Index":
+                    index = index.value
+                self.assign(target.value.id, make_type("Dict", [self.expr_type(index), t]))
+
+    def walk_AnnAssign(self, stmt):
+        if isinstance(stmt.target, ast.Name) and stmt.target.id in self.names:
+            t = types.from_ast(stmt.annotation)
+            if t is not None:
+                self.annotated[stmt.target.id] = t
+                self.assign(stmt.target.id, t)
+
+    def walk_AugAssign(self, stmt):
+        if isinstance(stmt.target, ast.Name):
+            left = self.name_type(stmt.target.id)
+            self.assign(stmt.target.id, self.binop_type(left, stmt.op, self.expr_type(stmt.value)))
+
+    def walk_For(self, stmt):
+        item = self.item_type(stmt.iter)
+        for name in target_names(stmt.target):
+            if name not in self.names:
+                self.env[name] = item if isinstance(stmt.target, ast.Name) else UNKNOWN
+        self.assign_target(stmt.target, item)
+        self.walk(stmt.body)
+        self.walk(stmt.orelse)
+
+    def walk_While(self, stmt):
+        self.walk(stmt.body)
+        self.walk(stmt.orelse)
+
+    def walk_If(self, stmt):
+        self.walk(stmt.body)
+        self.walk(stmt.orelse)
+
+    def walk_Expr(self, stmt):
+        # x.append(item) and the like type an empty container
+        call = stmt.value
+        if not (isinstance(call, ast.Call) and isinstance(call.func, ast.Attribute)
+                and isinstance(call.func.value, ast.Name) and call.args):
+            return
+        name = call.func.value.id
+        container = self.name_type(name)
+        attr = call.func.attr
+        item = self.expr_type(call.args[-1])
+        if container.name == "List" and attr in ("append", "insert"):
+            self.assign(name, make_type("List", [item]))
+        elif container.name == "List" and attr == "extend":
+            self.assign(name, make_type("List", [element_type(item)]))
+        elif container.name == "Set" and attr == "add":
+            self.assign(name, make_type("Set", [item]))
+
+    def walk_Return(self, stmt):
+        if stmt.value is not None:
+            self.returned = join(self.returned, self.expr_type(stmt.value))
+
+    def declare(self):
+        """place the declarations of the locals"""
+        result = self.result
+        if not self.names:
+            return
+        first, paths = scan(self.node.body, self.names)
+        for name in sorted(first):
+            block, i = first[name]
+            stmt = block[i]
+            t = result.locals.get(name, UNKNOWN)
+            # every occurrence is in the block, after the first assignment
+            scoped = all(any(b == id(block) and j >= i for b, j in path) for path in paths[name])
+            inline = (
+                isinstance(stmt, ast.Assign) and len(stmt.targets) == 1
+                and isinstance(stmt.targets[0], ast.Name)
+                and count_names([stmt.value], name) == 0
+                and scoped
+            )
+            if stmt.__class__.__name__ == "AnnAssign":
+                inline = scoped
+            if inline:
+                result.declarations[stmt] = t if t is UNKNOWN else concrete(t)
+            elif t is UNKNOWN or t is NONE:
+                # declared with the type of its first value, which must not
+                # depend on locals that are not declared yet
+                result.hoisted.append((name, UNKNOWN))
+                value = stmt.value if isinstance(stmt, ast.Assign) and len(stmt.targets) == 1 \
+                    and isinstance(stmt.targets[0], ast.Name) else None
+                if value is not None and not any(
+                        isinstance(x, UNDEDUCIBLE) or (isinstance(x, ast.Name) and x.id in self.names)
+                        for x in ast.walk(value)):
+                    result.deduced[name] = value
+            else:
+                result.hoisted.append((name, concrete(t)))
+
+    def find_nonnegative(self):
+        """the integer locals and loop indexes that are never negative"""
+        names = set(x for x, t in self.result.locals.items() if t in (BOOL, INT, LONG))
+        assignments = []
+        # the stores that the assignments cover
+        covered = set()
+        for stmt in iter_statements(self.node.body):
+            if isinstance(stmt, ast.Assign):
+                for target in stmt.targets:
+                    if isinstance(target, ast.Name):
+                        assignments.append((target.id, stmt.value, False))
+                        covered.add(target)
+                    else:
+                        assignments += [(x, None, False) for x in target_names(target)]
+            elif isinstance(stmt, ast.AugAssign) and isinstance(stmt.target, ast.Name):
+                value = ast.BinOp(left=ast.Name(id=stmt.target.id, ctx=ast.Load()), op=stmt.op, right=stmt.value)
+                assignments.append((stmt.target.id, value, False))
+                covered.add(stmt.target)
+            elif stmt.__class__.__name__ == "AnnAssign" and isinstance(stmt.target, ast.Name):
+                if stmt.value is not None:
+                    assignments.append((stmt.target.id, stmt.value, False))
+                    covered.add(stmt.target)
+            elif isinstance(stmt, ast.For):
+                if isinstance(stmt.target, ast.Name):
+                    names.add(stmt.target.id)
+                    assignments.append((stmt.target.id, stmt.iter, True))
+                    covered.add(stmt.target)
+                else:
+                    assignments += [(x, None, False) for x in target_names(stmt.target)]
+        # every name is taken to be nonnegative until one of its values may
+        # not be; the values only depend on the names
+        stored = set(x.id for x in ast.walk(self.node) if isinstance(x, ast.Name)
+                     and isinstance(x.ctx, (ast.Store, ast.Del)) and x not in covered)
+        names -= stored
+        names -= set(self.params)
+        changed = True
+        while changed:
+            changed = False
+            for name, value, loop in assignments:
+                if name not in names:
+                    continue
+                if value is None:
+                    ok = False
+                elif loop:
+                    ok = self.nonnegative_range(value, names)
+                else:
+                    ok = self.nonnegative(value, names)
+                if not ok:
+                    names.discard(name)
+                    changed = True
+        self.result.nonnegative = names
+
+    def reserve(self):
+        """find the loops that fill a list right after it is created"""
+        for block in iter_blocks(self.node.body):
+            for i, stmt in enumerate(block):
+                if isinstance(stmt, ast.Assign) and len(stmt.targets) == 1:
+                    target = stmt.targets[0]
+                elif stmt.__class__.__name__ == "AnnAssign" and stmt.value is not None:
+                    target = stmt.target
+                else:
+                    continue
+                if not (isinstance(target, ast.Name) and empty_container(stmt.value)):
+                    continue
+                name = target.id
+                if self.result.locals.get(name, UNKNOWN).name != "List":
+                    continue
+                for loop in block[i + 1:]:
+                    if isinstance(loop, ast.For):
+                        terms = self.appends(loop, name)
+                        if terms:
+                            self.result.reserves.setdefault(loop, []).append((name, terms))
+                            break
+                    if count_names([loop], name):
+                        break
+
+    def appends(self, loop, name):
+        """
+        Count the items that *loop* appends to the list *name*.
+
+        :return: terms of the sum, each the tuple of the iterables whose
+                 lengths multiply, or None if the count is not known before
+                 the loop
+        :rtype: list of tuple
+        """
+        stored = set(x.id for x in ast.walk(loop) if isinstance(x, ast.Name) and not isinstance(x.ctx, ast.Load))
+        if name in stored:
+            return None
+        return self._appends(loop, name, stored, ())
+
+    def _appends(self, loop, name, stored, outer):
+        if loop.orelse or not self.countable(loop.iter) or exits(loop.body):
+            return None
+        # the lengths of the inner iterables are computed before the outermost loop
+        if outer and any(isinstance(x, ast.Name) and x.id in stored for x in ast.walk(loop.iter)):
+            return None
+        terms = []
+        for stmt in loop.body:
+            call = stmt.value if isinstance(stmt, ast.Expr) else None
+            if (isinstance(call, ast.Call) and isinstance(call.func, ast.Attribute)
+                    and call.func.attr == "append" and isinstance(call.func.value, ast.Name)
+                    and call.func.value.id == name and len(call.args) == 1 and not call.keywords
+                    and not count_names(call.args, name)):
+                terms.append(outer + (loop.iter,))
+            elif not count_names([stmt], name):
+                continue
+            elif isinstance(stmt, ast.For):
+                inner = self._appends(stmt, name, stored, outer + (loop.iter,))
+                if inner is None:
+                    return None
+                terms.extend(inner)
+            else:
+                return None
+        return terms
+
+
+def infer_function(node, module):
+    """
+    :type node: ast.FunctionDef
+    :type module: ModuleTypes
+    :rtype: FunctionTypes
+    """
+    return FunctionInference(node, module).infer()
@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+
+"""How the parameters of functions are passed, and where locals are moved.
+
+Numbers are passed by value. Other parameters are passed by ``const T&``
+when the function only reads them, by ``T&`` when it changes them in place
+(e.g. ``xs.append(x)`` or ``xs[i] = x``) without letting them escape into
+an other value, and by value when it rebinds them. ``T&`` is only used for
+module level functions that are only called by name, so that every call
+site is known; arguments that are not lvalues are passed through
+``py2cpp::lvalue``. Passing a parameter on to a ``T&`` parameter changes
+it too, so the modes of the functions of a module are computed together
+until they are stable.
+
+A local of a container, string or class type is moved instead of copied
+where it is used for the last time as an assigned, returned or appended
+value.
+"""
+
+from __future__ import absolute_import
+
+import ast
+
+import six
+
+from . import infer
+from .infer import UNKNOWN
+
+CONST = "const"
+REF = "ref"
+
+# methods that change a container in place
+MUTATORS = {
+    "List": ("append", "extend", "insert", "pop", "remove", "clear", "sort", "reverse"),
+    "Dict": ("clear", "pop", "popitem", "setdefault", "update"),
+    "Set": ("add", "clear", "discard", "pop", "remove", "update", "difference_update",
+            "intersection_update", "symmetric_difference_update"),
+}
+
+# types whose methods never change them
+IMMUTABLE = ("str", "bytes", "Tuple", "FrozenSet", "Iterable", "Sequence")
+
+# std::unordered_map::operator[] is not const
+MAPPINGS = ("Dict", "Mapping")
+
+# calls that store their argument in the receiver
+STORES = ("append", "insert", "add", "setdefault")
+
+
+def arg_name(arg):
+    return arg.arg if six.PY3 else arg.id
+
+
+def root(node):
+    """
+    :return: the name that *node* is an item or attribute of, or None
+    """
+    while isinstance(node, (ast.Subscript, ast.Attribute)):
+        node = node.value
+    return node.id if isinstance(node, ast.Name) else None
+
+
+def by_value(t):
+    """whether values of the type *t* are passed and assigned by value"""
+    return t in infer.NUMBERS or t in (UNKNOWN, infer.NONE)
+
+
+def parents(node):
+    """
+    :return: the parent of each node under *node*
+    :rtype: dict
+    """
+    ret = {}
+    for x in ast.walk(node):
+        for child in ast.iter_child_nodes(x):
+            ret[child] = x
+    return ret
+
+
+def escapes(name, parent):
+    """whether the occurrence *name* becomes part of an other value"""
+    node = name
+    while True:
+        up = parent.get(node)
+        if isinstance(up, ast.IfExp) and node is not up.test:
+            node = up
+            continue
+        if isinstance(up, (ast.Return, ast.Yield, ast.List, ast.Tuple, ast.Set, ast.Dict)):
+            return True
+        if isinstance(up, ast.Assign) or up.__class__.__name__ in ("AnnAssign", "YieldFrom"):
+            return node is up.value
+        if isinstance(up, ast.Call) and isinstance(up.func, ast.Attribute):
+            return up.func.attr in STORES and node in up.args
+        return False
+
+
+def parameter_modes(node, module, refs):
+    """
+    :type node: ast.FunctionDef
+    :type module: infer.ModuleTypes
+    :param refs: whether parameters may be passed by ``T&``
+    :return: CONST or REF by name of the parameters not passed by value
+    :rtype: dict
+    """
+    inference = infer.FunctionInference(node, module)
+    inference.env = dict(inference.params)
+    args = node.args.args
+    candidates = set()
+    for i, arg in enumerate(args[:len(args) - len(node.args.defaults)]):
+        name = arg_name(arg)
+        if i == 0 and node in module.methods:
+            continue
+        if not by_value(inference.params[name]):
+            candidates.add(name)
+    if not candidates:
+        return {}
+    rebound = set()
+    mutated = set()
+    escaped = set()
+    parent = parents(node)
+    for x in ast.walk(node):
+        if isinstance(x, ast.Name) and x.id in candidates:
+            if not isinstance(x.ctx, ast.Load):
+                rebound.add(x.id)
+            elif escapes(x, parent):
+                escaped.add(x.id)
+        elif isinstance(x, (ast.Subscript, ast.Attribute)):
+            if not isinstance(x.ctx, ast.Load):
+                mutated.add(root(x))
+            elif isinstance(x, ast.Subscript) and inference.expr_type(x.value).name in MAPPINGS:
+                mutated.add(root(x))
+        elif isinstance(x, ast.Call) and isinstance(x.func, ast.Attribute):
+            t = inference.expr_type(x.func.value)
+            if t.name in MUTATORS:
+                if x.func.attr in MUTATORS[t.name]:
+                    mutated.add(root(x.func.value))
+            elif t.name not in IMMUTABLE and t not in infer.NUMBERS:
+                # a method of a class, or of an unknown type
+                mutated.add(root(x.func.value))
+        elif isinstance(x, ast.Call) and isinstance(x.func, ast.Name):
+            for i in module.refs.get(x.func.id, ()):
+                if i < len(x.args):
+                    mutated.add(root(x.args[i]))
+    ret = {}
+    for name in candidates - rebound:
+        if name not in mutated:
+            ret[name] = CONST
+        elif refs and name not in escaped:
+            ret[name] = REF
+    return ret
+
+
+def pass_parameters(node, module):
+    """
+    Set the parameter modes of the functions and methods of *node*.
+
+    :type node: ast.Module
+    :type module: infer.ModuleTypes
+    """
+    functions = [x for x in node.body if isinstance(x, ast.FunctionDef)]
+    # functions that are only called by name with positional arguments
+    calls = set()
+    for x in ast.walk(node):
+        if isinstance(x, ast.Call) and not x.keywords and not any(
+                y.__class__.__name__ == "Starred" for y in x.args):
+            if not getattr(x, "starargs", None) and not getattr(x, "kwargs", None):
+                calls.add(x.func)
+    values = set(x.id for x in ast.walk(node)
+                 if isinstance(x, ast.Name) and isinstance(x.ctx, ast.Load) and x not in calls)
+    for _ in range(len(functions) + 1):
+        previous = module.refs
+        for x in functions:
+            module.passing[x] = parameter_modes(x, module, x.name not in values)
+        for x in module.methods:
+            module.passing[x] = parameter_modes(x, module, False)
+        refs = {}
+        for x in functions:
+            modes = module.passing[x]
+            refs[x.name] = [i for i, y in enumerate(x.args.args) if modes.get(arg_name(y)) == REF]
+        module.refs = dict((k, v) for k, v in refs.items() if v)
+        if module.refs == previous:
+            break
+
+
+def lvalue(node):
+    """whether the argument *node* can bind to a ``T&`` parameter"""
+    return root(node) is not None
+
+
+class Moves(object):
+    """The last uses of the locals of a function that can be moved."""
+
+    def __init__(self, node, types, modes):
+        """
+        :type node: ast.FunctionDef
+        :type types: infer.FunctionTypes
+        :param modes: see :func:`parameter_modes`
+        """
+        self.node = node
+        self.names = set(x for x, t in types.env.items()
+                         if not by_value(t) and x not in modes)
+        # a local that a nested function reads may be read after its last
+        # use here
+        for x in ast.walk(node):
+            if isinstance(x, infer.SCOPES) and x is not node:
+                self.names -= set(y.id for y in ast.walk(x) if isinstance(y, ast.Name))
+
+    def find(self):
+        """
+        :return: the Name nodes to move
+        :rtype: set
+        """
+        self.moves = set()
+        if self.names:
+            self.visit_block(self.node.body, [])
+        return self.moves
+
+    def visit_block(self, block, path):
+        for i, stmt in enumerate(block):
+            here = path + [(block, i)]
+            if isinstance(stmt, infer.SCOPES):
+                continue
+            for site in self.sites(stmt):
+                if site.id in self.names and self.last_use(site.id, here):
+                    self.moves.add(site)
+            for field in infer.BLOCK_FIELDS:
+                value = getattr(stmt, field, None)
+                if isinstance(value, list):
+                    self.visit_block(value, here)
+
+    def sites(self, stmt):
+        """the Names in *stmt* whose value is copied"""
+        values = []
+        if isinstance(stmt, ast.Assign) or stmt.__class__.__name__ == "AnnAssign":
+            values.append(stmt.value)
+        elif isinstance(stmt, ast.Return) and not isinstance(stmt.value, ast.Name):
+            # a returned local is moved by the compiler
+            values.append(stmt.value)
+        elif isinstance(stmt, ast.Expr) and isinstance(stmt.value, ast.Call):
+            call = stmt.value
+            if isinstance(call.func, ast.Attribute) and call.func.attr in STORES and call.args:
+                values.append(call.args[-1])
+        ret = []
+        while values:
+            value = values.pop()
+            if isinstance(value, ast.Name):
+                ret.append(value)
+            elif isinstance(value, ast.IfExp):
+                values += [value.body, value.orelse]
+            elif isinstance(value, (ast.Tuple, ast.List)):
+                values += value.elts
+        return ret
+
+    def last_use(self, name, path):
+        """whether the statement at *path* uses *name* for the last time"""
+        block, i = path[-1]
+        if infer.count_names([block[i]], name) != 1:
+            return False
+        for depth in range(len(path) - 1, -1, -1):
+            block, i = path[depth]
+            if infer.count_names(block[i + 1:], name):
+                return False
+            if depth == 0:
+                break
+            outer, j = path[depth - 1]
+            stmt = outer[j]
+            if not isinstance(stmt, (ast.For, ast.While, ast.If)):
+                # e.g. try: the handlers may run after the statement
+                return False
+            if isinstance(stmt, (ast.For, ast.While)):
+                if block is stmt.orelse:
+                    continue
+                if infer.count_names(stmt.orelse, name):
+                    return False
+                # the loop reads its iterable or its condition again
+                header = stmt.test if isinstance(stmt, ast.While) else stmt.iter
+                if infer.count_names([header], name):
+                    return False
+                # the next iteration must assign it before reading it
+                if not self.assigned_first(name, block[:i]):
+                    return False
+        return True
+
+    @staticmethod
+    def assigned_first(name, statements):
+        for stmt in statements:
+            if not infer.count_names([stmt], name):
+                continue
+            if isinstance(stmt, ast.Assign):
+                targets, value = stmt.targets, stmt.value
+            elif stmt.__class__.__name__ == "AnnAssign" and stmt.value is not None:
+                targets, value = [stmt.target], stmt.value
+            else:
+                return False
+            return (len(targets) == 1 and isinstance(targets[0], ast.Name)
+                    and targets[0].id == name and not infer.count_names([value], name))
+        return False
+
+
+def moves(node, types, modes):
+    """
+    :type node: ast.FunctionDef
+    :type types: infer.FunctionTypes
+    :return: the Name nodes of the last uses of locals to move
+    :rtype: set
+    """
+    return Moves(node, types, modes).find()
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+
+import contextlib
+import functools
+import json
+import threading
+import timeit
+
+from . import cpp
+
+
+class Profiler(object):
+    """Wall time and call counts of the transpiler phases.
+
+    Phases are nested: enter()/leave() maintain a stack of phase names.
+    For every name the profiler records the number of calls, the total
+    time (recursive calls are counted once) and the self time, and for
+    every stack the self time, which is what flame graphs are drawn from.
+    """
+    def __init__(self, timer=timeit.default_timer):
+        self.timer = timer
+        self.stack = []
+        self.starts = []
+        self.children = []
+        self.active = {}
+        self.phases = {}
+        self.stacks = {}
+
+    def enter(self, name):
+        self.stack.append(name)
+        self.children.append(0.0)
+        self.active[name] = self.active.get(name, 0) + 1
+        self.starts.append(self.timer())
+
+    def leave(self):
+        elapsed = self.timer() - self.starts.pop()
+        own = elapsed - self.children.pop()
+        key = tuple(self.stack)
+        name = self.stack.pop()
+        self.stacks[key] = self.stacks.get(key, 0.0) + own
+        phase = self.phases.get(name)
+        if phase is None:
+            phase = self.phases[name] = [0, 0.0, 0.0]
+        phase[0] += 1
+        phase[2] += own
+        self.active[name] -= 1
+        if not self.active[name]:
+            phase[1] += elapsed
+        if self.children:
+            self.children[-1] += elapsed
+
+    @contextlib.contextmanager
+    def measure(self, name):
+        self.enter(name)
+        try:
+            yield self
+        finally:
+            self.leave()
+
+    def wrap(self, name, func):
+        """
+        :return: *func* recorded as phase *name*
+        """
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            self.enter(name)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.leave()
+        return wrapper
+
+    def report(self):
+        """
+        :rtype: dict
+        """
+        phases = {}
+        for name, (count, total, own) in self.phases.items():
+            phases[name] = {"count": count, "time": total, "self_time": own}
+        return {"phases": phases}
+
+    def write_json(self, fp):
+        json.dump(self.report(), fp, indent=2, sort_keys=True)
+        fp.write("\n")
+
+    def write_folded(self, fp):
+        """
+        Write the stacks in the folded format of flamegraph.pl; the values
+        are self times in microseconds.
+        """
+        for key in sorted(self.stacks):
+            value = int(round(self.stacks[key] * 1e6))
+            if value:
+                fp.write("{} {}\n".format(";".join(key), value))
+
+
+def _subclasses(cls):
+    for sub in cls.__subclasses__():
+        yield sub
+        for x in _subclasses(sub):
+            yield x
+
+
+def _instrument(name, func):
+    @functools.wraps(func)
+    def wrapper(self, ctx, *args):
+        profiler = ctx.profiler
+        if profiler is None:
+            return func(self, ctx, *args)
+        profiler.enter(name)
+        try:
+            return func(self, ctx, *args)
+        finally:
+            profiler.leave()
+    return wrapper
+
+
+# the original methods while instrument_ir() blocks are active
+_saved = []
+_depth = [0]
+_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def instrument_ir():
+    """
+    Record build() and emit() of every IR class in the profiler of the
+    BuildContext they are called with. The methods are restored when the
+    last active block exits, so the IR has no profiling overhead outside
+    of profiled runs, even when several threads profile at the same time.
+    """
+    with _lock:
+        if not _depth[0]:
+            for cls in set([cpp.Base]) | set(_subclasses(cpp.Base)):
+                for method in ("build", "emit"):
+                    func = cls.__dict__.get(method)
+                    if func is None:
+                        continue
+                    _saved.append((cls, method, func))
+                    setattr(cls, method, _instrument("{}:{}".format(method, cls.__name__), func))
+        _depth[0] += 1
+    try:
+        yield
+    finally:
+        with _lock:
+            _depth[0] -= 1
+            if not _depth[0]:
+                for cls, method, func in _saved:
+                    setattr(cls, method, func)
+                del _saved[:]
@@ -1,11 +1,35 @@
 # -*- coding: utf-8 -*-
 
-from PyQt4 import Qt
+from __future__ import print_function
+
+import os
 
 from . import cpp
+from . import types
+
+# pre-generated list of the Q* names, see main() below
+NAMES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "qt_names.txt")
+
+
+def binding_names():
+    from PyQt4 import Qt
+    return [x for x in dir(Qt) if x.startswith("Q")]
+
+
+def names():
+    if os.path.exists(NAMES_FILE):
+        return types.load_names(NAMES_FILE)
+    return binding_names()
+
+
+cpp.type_registry.add_provider(types.NameProvider(names, "{} *", prefix="Q", source="PyQt4.Qt"))
+
+
+def main():
+    """write the name list of the installed binding to stdout"""
+    for name in sorted(binding_names()):
+        print(name)
 
 
-for name in dir(Qt):
-    if not name.startswith("Q"):
-        continue
-    cpp.type_registry.register(name, "{} *".format(name))
+if __name__ == '__main__':
+    main()
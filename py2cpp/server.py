@@ -0,0 +1,241 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Long-running transpiler.
+
+Requests and responses are JSON objects, one per line::
+
+    {"id": 1, "source": "def f(): pass", "name": "f.py"}
+    {"id": 1, "code": "// generate by py2cpp ...", "cached": false}
+
+A request may give "path" instead of "source" to read the file, and
+"output" to write the code to a file instead of returning it. The
+"command" key selects "transpile" (default), "ping", "stats" or
+"shutdown". Failures are returned as {"id": ..., "error": "..."}.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import argparse
+import io
+import json
+import os
+import sys
+import threading
+from multiprocessing.pool import ThreadPool
+
+from six.moves import socketserver
+
+from py2cpp import driver
+from py2cpp.cache import Cache
+from py2cpp.converter import Converter
+
+
+# transpile requests between two evictions of the cache
+EVICT_EVERY = 100
+
+
+class Server(object):
+    """Warm transpiler state shared by every connection.
+
+    Each handling thread keeps its own Converter; the converter resets its
+    per-module state on every conversion, so memory does not grow with the
+    number of requests.
+    """
+    def __init__(self, cache=None, tables=False, evict_every=EVICT_EVERY):
+        """
+        :type cache: Cache
+        :param tables: evaluate module level constant tables (see py2cpp.tables)
+        :param evict_every: evict the cache after this many transpile
+                            requests, so that it does not grow without bound
+        """
+        self.cache = cache
+        self.tables = tables
+        self.evict_every = evict_every
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.shutdown = None
+
+    def converter(self):
+        conv = getattr(self.local, "converter", None)
+        if conv is None:
+            conv = self.local.converter = Converter(store=self.cache, tables=self.tables)
+        return conv
+
+    def handle(self, request):
+        """
+        :type request: dict
+        :rtype: dict
+        """
+        response = {"id": request.get("id")}
+        try:
+            response.update(self.dispatch(request))
+        except Exception as e:
+            with self.lock:
+                self.errors += 1
+            response["error"] = "{}: {}".format(e.__class__.__name__, e)
+        return response
+
+    def dispatch(self, request):
+        command = request.get("command", "transpile")
+        if command == "ping":
+            return {"result": "pong"}
+        if command == "stats":
+            stats = {"requests": self.requests, "errors": self.errors}
+            if self.cache is not None:
+                stats["cache"] = self.cache.stats()
+            return {"stats": stats}
+        if command == "shutdown":
+            if self.shutdown is not None:
+                self.shutdown()
+            return {"result": "bye"}
+        if command != "transpile":
+            raise ValueError("unknown command: {}".format(command))
+        with self.lock:
+            self.requests += 1
+            evict = self.cache is not None and self.requests % self.evict_every == 0
+        source = request.get("source")
+        path = request.get("path")
+        if source is None:
+            with io.open(path, encoding="utf-8") as fp:
+                source = fp.read()
+        name = request.get("name", path or "<string>")
+        stream = io.StringIO()
+        cached = driver.transpile(source, name, stream, cache=self.cache, converter=self.converter())
+        if evict:
+            self.cache.evict()
+        output = request.get("output")
+        if output is None:
+            return {"code": stream.getvalue(), "cached": cached}
+        with io.open(output, "w", encoding="utf-8") as fp:
+            fp.write(stream.getvalue())
+        return {"output": output, "cached": cached}
+
+    def handle_line(self, line):
+        """
+        :type line: str
+        :rtype: str
+        """
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            return json.dumps({"id": None, "error": "ValueError: {}".format(e)})
+        return json.dumps(self.handle(request), sort_keys=True)
+
+
+def serve_stdio(server, input, output, threads=4):
+    """
+    Handle requests read from *input*; responses are written to *output* as
+    they complete, so they may come out of order. A ``shutdown`` request is
+    handled as soon as it is read: the requests read before it complete,
+    and nothing after it is read.
+    """
+    lock = threading.Lock()
+    stop = threading.Event()
+    server.shutdown = stop.set
+
+    def write(response):
+        with lock:
+            output.write(response + "\n")
+            output.flush()
+
+    def run(request):
+        write(json.dumps(server.handle(request), sort_keys=True))
+
+    pool = ThreadPool(threads)
+    try:
+        for line in iter(input.readline, ""):
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+            except ValueError:
+                write(server.handle_line(line))
+                continue
+            if isinstance(request, dict) and request.get("command") == "shutdown":
+                run(request)
+            else:
+                pool.apply_async(run, (request,))
+            if stop.is_set():
+                break
+    finally:
+        pool.close()
+        pool.join()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            line = line.decode("utf-8")
+            if not line.strip():
+                continue
+            response = self.server.transpiler.handle_line(line)
+            self.wfile.write((response + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+
+class UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+
+    daemon_threads = True
+
+    def __init__(self, path, transpiler):
+        socketserver.UnixStreamServer.__init__(self, path, _Handler)
+        self.transpiler = transpiler
+        transpiler.shutdown = lambda: threading.Thread(target=self.shutdown).start()
+
+
+def serve_unix(server, path):
+    if os.path.exists(path):
+        os.remove(path)
+    unix_server = UnixServer(path, server)
+    try:
+        unix_server.serve_forever()
+    finally:
+        unix_server.server_close()
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--socket", help="listen on this unix socket")
+    group.add_argument("--stdio", action="store_true", help="read requests from stdin")
+    parser.add_argument("--threads", type=int, default=4,
+                        help="worker threads in --stdio mode")
+    parser.add_argument("--using-qt", action="store_true")
+    parser.add_argument("--cache-dir")
+    parser.add_argument("--cache-size", type=int, default=None)
+    parser.add_argument("--constant-tables", action="store_true",
+                        help="evaluate module level lookup tables into static constexpr arrays")
+
+    args = parser.parse_args(argv)
+
+    if args.using_qt:
+        from py2cpp import qt
+
+    cache = None
+    if args.cache_dir is not None:
+        options = {"tables": True} if args.constant_tables else None
+        cache = Cache(args.cache_dir, max_bytes=args.cache_size, options=options)
+
+    server = Server(cache, tables=args.constant_tables)
+    try:
+        if args.stdio:
+            serve_stdio(server, sys.stdin, sys.stdout, threads=args.threads)
+        else:
+            serve_unix(server, args.socket)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if cache is not None:
+            cache.evict()
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,586 @@
+# -*- coding: utf-8 -*-
+
+"""Module level tables computed when converting.
+
+With ``Converter(tables=True)`` (``--constant-tables`` on the command
+line) the module level statements are run in order, before the module is
+converted, by a restricted interpreter: only literals, operators,
+comprehensions, a few builtins and methods, ``math`` and the functions of
+the module that use nothing else are allowed, and large values or long
+loops stop the evaluation. A name that is bound once to a list, a tuple
+or a dict of numbers, and that the module only indexes, iterates or takes
+the ``len()`` of, becomes a :class:`StaticTable`. The converter writes it
+at the start of the module as ``static constexpr`` data: a
+``std::array``, nested for rectangular tables, or a
+``py2cpp::static_map``, whose items are sorted by key for binary search.
+
+Statements that cannot be evaluated are left as they are, and so are the
+names they bind or use, since they may change them.
+"""
+
+from __future__ import absolute_import
+
+import ast
+import copy
+import math
+import sys
+
+import six
+from six.moves import builtins
+
+from . import infer
+from . import passing
+from .cpp import CppTypeRegistry
+from .transformer import bound_names
+from .types import make_type
+
+# the most items of a table, and of a value computed on the way
+MAX_ITEMS = 1 << 16
+
+# the items and characters that one statement may produce in all
+MAX_PRODUCED = 1 << 22
+
+# the widest integer computed on the way
+MAX_BITS = 4096
+
+# trace events, i.e. calls and lines, that one statement may run
+MAX_STEPS = 1000000
+
+# the range of each integer type of the items
+INTEGER_RANGES = [
+    (infer.INT, 2 ** 31 - 1),
+    (infer.LONG, 2 ** 63 - 1),
+]
+
+SAFE_BUILTINS = ("abs", "all", "any", "bin", "bool", "chr", "dict", "divmod", "enumerate", "filter",
+                 "float", "frozenset", "hex", "int", "len", "list", "map", "max", "min", "oct", "ord",
+                 "reversed", "round", "set", "sorted", "str", "sum", "tuple", "zip")
+
+# the methods that grow the object they are called on by their arguments
+GROWING_METHODS = frozenset(["append", "extend", "insert", "add", "update", "setdefault"])
+
+# the values whose items or characters count against MAX_PRODUCED
+SIZED = (list, tuple, dict, set, frozenset) + six.string_types + (bytes,)
+
+# methods that neither run code given as a string nor reach other objects
+SAFE_METHODS = frozenset([
+    "append", "extend", "insert", "pop", "remove", "index", "count", "reverse", "sort", "copy",
+    "get", "items", "keys", "values", "setdefault", "update", "add", "discard", "union",
+    "intersection", "difference", "lower", "upper", "strip", "lstrip", "rstrip", "split", "join",
+    "startswith", "endswith", "replace", "find", "isdigit", "isalpha", "isspace", "encode",
+    "bit_length", "is_integer",
+])
+
+SAFE_NODES = frozenset([
+    # statements of functions
+    "FunctionDef", "Return", "Assign", "AugAssign", "AnnAssign", "For", "While", "If", "Break",
+    "Continue", "Pass", "Expr", "Assert", "Delete",
+    # expressions
+    "BoolOp", "BinOp", "UnaryOp", "Lambda", "IfExp", "Dict", "Set", "ListComp", "SetComp",
+    "DictComp", "GeneratorExp", "Compare", "Call", "Num", "Str", "Bytes", "NameConstant",
+    "Constant", "JoinedStr", "FormattedValue", "Attribute", "Subscript", "Starred", "Name",
+    "List", "Tuple", "Slice", "Index", "ExtSlice",
+    # parts
+    "comprehension", "arguments", "arg", "keyword", "Load", "Store", "Del",
+    "And", "Or", "Add", "Sub", "Mult", "Div", "Mod", "Pow", "LShift", "RShift", "BitOr", "BitXor",
+    "BitAnd", "FloorDiv", "Invert", "Not", "UAdd", "USub", "Eq", "NotEq", "Lt", "LtE", "Gt",
+    "GtE", "Is", "IsNot", "In", "NotIn",
+])
+
+
+class NotConstant(Exception):
+    """the statement cannot be computed when converting"""
+
+
+class StaticTable(ast.Assign):
+    """``name = value`` computed when converting
+
+    :ivar table: the value
+    :ivar table_type: the type of the value
+    """
+
+    _fields = ast.Assign._fields + ("table",)
+
+
+def checked(node):
+    """
+    :return: *node* if it only uses what the interpreter allows
+    :raise NotConstant: otherwise
+    """
+    for x in ast.walk(node):
+        name = x.__class__.__name__
+        if name not in SAFE_NODES:
+            raise NotConstant(name)
+        if name == "FunctionDef" and x.decorator_list:
+            raise NotConstant("decorator")
+        if isinstance(x, ast.Name) and x.id.startswith("__"):
+            raise NotConstant(x.id)
+        if isinstance(x, ast.Attribute):
+            if x.attr.startswith("_"):
+                raise NotConstant(x.attr)
+            if x.attr not in SAFE_METHODS and not (isinstance(x.value, ast.Name) and x.value.id == "math"):
+                raise NotConstant(x.attr)
+        if isinstance(x, ast.AugAssign) and isinstance(x.op, tuple(Guard.OPERATORS)):
+            if not isinstance(x.target, ast.Name):
+                raise NotConstant("augmented assignment")
+    return node
+
+
+def _sized(value, count):
+    return hasattr(value, "__len__") and isinstance(count, six.integer_types) and len(value) * count > MAX_ITEMS
+
+
+def _multiply(a, b):
+    if _sized(a, b) or _sized(b, a):
+        raise NotConstant("too many items")
+    if isinstance(a, six.integer_types) and isinstance(b, six.integer_types):
+        if a.bit_length() + b.bit_length() > MAX_BITS:
+            raise NotConstant("too large")
+    return a * b
+
+
+def _power(a, b, *args):
+    if isinstance(a, six.integer_types) and isinstance(b, six.integer_types) and not args:
+        if b > 0 and a.bit_length() * b > MAX_BITS:
+            raise NotConstant("too large")
+    return pow(a, b, *args)
+
+
+def _shift(a, b):
+    if isinstance(b, six.integer_types) and b > MAX_BITS:
+        raise NotConstant("too large")
+    return a << b
+
+
+def _range(*args):
+    ret = six.moves.range(*args)
+    if len(ret) > MAX_ITEMS:
+        raise NotConstant("too many items")
+    return ret
+
+
+class Budget(object):
+    """The items and characters that a statement may still produce.
+
+    :ivar remaining: the number of them
+    """
+
+    def __init__(self):
+        self.remaining = MAX_PRODUCED
+
+    def charge(self, value, size=None):
+        """
+        :param size: the number of items that *value* adds, by default its
+                     length if it is a sequence, a set, a dict or a string
+        :return: *value*
+        :raise NotConstant: if the budget is exhausted
+        """
+        if size is None:
+            size = len(value) if isinstance(value, SIZED) else 0
+        self.remaining -= size
+        if self.remaining < 0:
+            raise NotConstant("too many items")
+        return value
+
+    def multiply(self, a, b):
+        return self.charge(_multiply(a, b))
+
+    def call(self, *args, **kwargs):
+        func, args = args[0], args[1:]
+        if getattr(func, "__name__", None) in GROWING_METHODS:
+            # e.g. append() grows a list without returning it
+            self.charge(None, sum(max(1, len(x) if isinstance(x, SIZED) else 0) for x in args))
+        return self.charge(func(*args, **kwargs))
+
+
+class Guard(ast.NodeTransformer):
+    """Check the size of the results of ``*``, ``**`` and ``<<``, and
+    charge the items and characters that operators, calls and
+    comprehensions produce to the :class:`Budget`."""
+
+    OPERATORS = {
+        ast.Mult: "__multiply",
+        ast.Pow: "__power",
+        ast.LShift: "__shift",
+    }
+
+    # the operators that may build strings or sequences of their operands
+    CHARGED = (ast.Add, ast.Mod)
+
+    @staticmethod
+    def call(name, args, node):
+        func = ast.Name(id=name, ctx=ast.Load())
+        return ast.copy_location(ast.Call(func=func, args=args, keywords=[]), node)
+
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, self.CHARGED):
+            return self.call("__charge", [node], node)
+        if node.op.__class__ not in self.OPERATORS:
+            return node
+        return self.call(self.OPERATORS[node.op.__class__], [node.left, node.right], node)
+
+    def visit_AugAssign(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Add):
+            # x += y grows x by the items of y
+            node.value = self.call("__charge", [node.value], node.value)
+            return node
+        if node.op.__class__ not in self.OPERATORS:
+            return node
+        load = ast.Name(id=node.target.id, ctx=ast.Load())
+        value = self.visit_BinOp(ast.BinOp(left=load, op=node.op, right=node.value))
+        return ast.copy_location(ast.Assign(targets=[node.target], value=value), node)
+
+    def visit_Call(self, node):
+        self.generic_visit(node)
+        node.args = [node.func] + node.args
+        node.func = ast.Name(id="__call", ctx=ast.Load())
+        return node
+
+    def charged(self, node):
+        self.generic_visit(node)
+        return self.call("__charge", [node], node)
+
+    visit_ListComp = visit_SetComp = visit_DictComp = visit_JoinedStr = charged
+
+
+def sandbox():
+    """a namespace in which the module level statements run"""
+    names = dict((x, getattr(builtins, x)) for x in SAFE_BUILTINS)
+    names["range"] = _range
+    names["pow"] = _power
+    budget = Budget()
+    return {
+        "__builtins__": names,
+        "__budget": budget,
+        "__charge": budget.charge,
+        "__call": budget.call,
+        "__multiply": budget.multiply,
+        "__power": _power,
+        "__shift": _shift,
+    }
+
+
+def run(stmt, namespace):
+    """
+    Run the module level statement *stmt* in *namespace*.
+
+    :raise NotConstant: if it uses something else than the interpreter
+                        allows, or takes too long
+    """
+    stmt = Guard().visit(copy.deepcopy(checked(stmt)))
+    if sys.version_info >= (3, 8):
+        module = ast.Module(body=[stmt], type_ignores=[])
+    else:
+        module = ast.Module(body=[stmt])
+    code = compile(ast.fix_missing_locations(module), "<table>", "exec")
+    steps = [MAX_STEPS]
+    namespace["__budget"].remaining = MAX_PRODUCED
+
+    def trace(frame, event, arg):
+        steps[0] -= 1
+        if steps[0] < 0:
+            raise NotConstant("too many steps")
+        return trace
+
+    previous = sys.gettrace()
+    sys.settrace(trace)
+    try:
+        six.exec_(code, namespace)
+    except NotConstant:
+        raise
+    except Exception as e:
+        # e.g. NameError of a name the interpreter does not know
+        raise NotConstant(e)
+    finally:
+        sys.settrace(previous)
+
+
+def execute(stmt, namespace):
+    """
+    Run the module level statement *stmt*, or forget the names that it
+    binds or uses if it cannot run.
+
+    :return: whether it ran
+    """
+    try:
+        if isinstance(stmt, ast.Import):
+            for alias in stmt.names:
+                if alias.name != "math":
+                    raise NotConstant(alias.name)
+                namespace[alias.asname or alias.name] = math
+        elif isinstance(stmt, ast.ImportFrom):
+            if stmt.module != "math" or getattr(stmt, "level", 0):
+                raise NotConstant(stmt.module)
+            for alias in stmt.names:
+                if alias.name.startswith("_") or not hasattr(math, alias.name):
+                    raise NotConstant(alias.name)
+                namespace[alias.asname or alias.name] = getattr(math, alias.name)
+        elif stmt.__class__.__name__ == "AnnAssign":
+            if stmt.value is None:
+                return True
+            # the annotation is a type, which the interpreter does not know
+            run(ast.copy_location(ast.Assign(targets=[stmt.target], value=stmt.value), stmt), namespace)
+        elif isinstance(stmt, (ast.Assign, ast.FunctionDef)):
+            run(stmt, namespace)
+        else:
+            raise NotConstant(stmt.__class__.__name__)
+    except NotConstant:
+        # what runs at module level may change the values of the names it
+        # uses; a function only runs its defaults and decorators
+        if isinstance(stmt, ast.FunctionDef):
+            namespace.pop(stmt.name, None)
+            nodes = stmt.decorator_list + stmt.args.defaults + [x for x in getattr(stmt.args, "kw_defaults", []) if x]
+        else:
+            nodes = [stmt]
+        for node in nodes:
+            for x in ast.walk(node):
+                for name in [x.id] if isinstance(x, ast.Name) else bound_names(x):
+                    namespace.pop(name, None)
+        return False
+    return True
+
+
+def candidates(node):
+    """
+    :type node: ast.Module
+    :return: by the module level names that are bound once and only read,
+             by indexing, iteration, ``len()`` or ``get()``, the fewest
+             subscripts after which their items are read as values, or
+             None, and whether the name itself is iterated; a table whose
+             rows are read as values may be changed through them
+    :rtype: dict
+    """
+    stores = {}
+    for x in ast.walk(node):
+        for name in bound_names(x):
+            stores[name] = stores.get(name, 0) + 1
+        if x.__class__.__name__ in ("Global", "Nonlocal"):
+            for name in x.names:
+                stores[name] = 2
+    ret = dict((k, (None, False)) for k, v in stores.items() if v == 1)
+    parent = passing.parents(node)
+    for x in ast.walk(node):
+        if isinstance(x, ast.Name) and isinstance(x.ctx, ast.Load) and x.id in ret:
+            read, depth = read_only(x, parent, stores)
+            if not read:
+                del ret[x.id]
+                continue
+            least, iterated = ret[x.id]
+            if depth is not None and (least is None or depth < least):
+                least = depth
+            up = parent.get(x)
+            if isinstance(up, (ast.For, ast.comprehension)) and up.iter is x:
+                iterated = True
+            ret[x.id] = least, iterated
+    return ret
+
+
+def read_only(name, parent, stores):
+    """
+    :return: (whether the use *name* only reads the table, the number of
+             subscripts after which it reads items as values, or None)
+    """
+    node = name
+    depth = 0
+    up = parent.get(node)
+    while isinstance(up, ast.Subscript) and up.value is node:
+        # T[i][j] = 1 or del T[i]
+        if not isinstance(up.ctx, ast.Load):
+            return False, None
+        node = up
+        depth += 1
+        up = parent.get(node)
+    if isinstance(up, (ast.For, ast.comprehension)) and up.iter is node:
+        # the target is bound to the items
+        return True, depth + 1
+    if isinstance(up, ast.Call) and up.args == [node]:
+        if isinstance(up.func, ast.Name) and up.func.id == "len" and "len" not in stores and not up.keywords:
+            return True, None
+    if isinstance(up, ast.Attribute):
+        # e.g. T[0].append(1); dicts only map to numbers
+        call = parent.get(up)
+        read = depth == 0 and up.attr == "get" and isinstance(call, ast.Call) and call.func is up
+        return read, 1 if read else None
+    if depth == 0 or (isinstance(up, ast.Call) and up.func is node):
+        return False, None
+    return True, depth
+
+
+def dimensions(t):
+    """the number of subscripts of a table of type *t* that give a number"""
+    if t.name == "List":
+        return 1 + dimensions(t.args[0])
+    return 1 if t.name == "Dict" else 0
+
+
+def item_type(values):
+    """
+    :return: the type of the numbers *values*, if they have one C++ can
+             represent, or None
+    """
+    kinds = set(type(x) for x in values)
+    if kinds == set([bool]):
+        return infer.BOOL
+    if kinds == set([float]):
+        if any(math.isinf(x) or math.isnan(x) for x in values):
+            return None
+        return infer.FLOAT
+    if kinds and all(issubclass(x, six.integer_types) and x is not bool for x in kinds):
+        largest = max(abs(x) for x in values)
+        for t, limit in INTEGER_RANGES:
+            if largest <= limit:
+                return t
+    return None
+
+
+def shape(value):
+    """
+    :return: the lengths of the dimensions of the rectangular list or tuple
+             *value*, and its items, or (None, None)
+    """
+    if not isinstance(value, (list, tuple)) or not value:
+        return None, None
+    if all(isinstance(x, (list, tuple)) for x in value):
+        shapes = [shape(x) for x in value]
+        if shapes[0][0] is None or any(x[0] != shapes[0][0] for x in shapes):
+            return None, None
+        return [len(value)] + shapes[0][0], [y for x in shapes for y in x[1]]
+    return [len(value)], list(value)
+
+
+def literal(value):
+    """the C++ literal of the number or string *value*"""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, six.string_types):
+        data = value.encode("utf-8")
+        chars = []
+        for c in six.iterbytes(data):
+            if c in (0x22, 0x5c) or not 0x20 <= c < 0x7f:
+                chars.append("\\{:03o}".format(c))
+            else:
+                chars.append(chr(c))
+        return '"{}"'.format("".join(chars))
+    return repr(value)
+
+
+def initializer(items, braces, width=100):
+    """
+    :return: the lines of the braced initializer of the literals *items*,
+             wrapped before *width* columns
+    """
+    line = ", ".join(items)
+    if len(line) + 2 * len(braces[0]) <= width:
+        return [braces[0] + line + braces[1]]
+    lines = [braces[0]]
+    row = []
+    for item in items:
+        if row and len("    " + ", ".join(row + [item]) + ",") > width:
+            lines.append("    " + ", ".join(row) + ",")
+            row = []
+        row.append(item)
+    return lines + ["    " + ", ".join(row) + ",", braces[1]]
+
+
+def arrays(items, dimensions):
+    """the lines of the initializer of nested std::arrays of *items*"""
+    if len(dimensions) == 1:
+        return initializer([literal(x) for x in items], ("{{", "}}"))
+    size = len(items) // dimensions[0]
+    lines = ["{{"]
+    for i in range(dimensions[0]):
+        inner = arrays(items[i * size:(i + 1) * size], dimensions[1:])
+        inner[-1] += ","
+        lines += ["    " + x for x in inner]
+    return lines + ["}}"]
+
+
+def static_table(stmt, name, value):
+    """
+    :return: *stmt* as a StaticTable of *value*, or None if it is not a
+             table of numbers
+    """
+    if isinstance(value, dict):
+        if not value or len(value) > MAX_ITEMS:
+            return None
+        keys = item_type(list(value.keys()))
+        if keys is None and all(isinstance(x, six.text_type) for x in value):
+            keys = infer.STR
+        values = item_type(list(value.values()))
+        if keys in (None, infer.BOOL) or values is None or "\0" in "".join(
+                x for x in value if isinstance(x, six.string_types)):
+            return None
+        table_type = make_type("Dict", [keys, values])
+    else:
+        dimensions, items = shape(value)
+        if dimensions is None or len(items) > MAX_ITEMS:
+            return None
+        element = item_type(items)
+        if element is None:
+            return None
+        table_type = element
+        for _ in dimensions:
+            table_type = make_type("List", [table_type])
+    ret = StaticTable(targets=[ast.Name(id=name, ctx=ast.Store())],
+                      value=ast.copy_location(ast.NameConstant(value=None), stmt), table=value)
+    ret.table_type = table_type
+    return ast.copy_location(ret, stmt)
+
+
+def replace_tables(node):
+    """
+    Replace the module level tables of *node* by StaticTable statements at
+    the start of the module.
+
+    :type node: ast.Module
+    """
+    names = candidates(node)
+    namespace = sandbox()
+    tables = []
+    body = []
+    for stmt in node.body:
+        ran = execute(stmt, namespace)
+        target = None
+        if isinstance(stmt, ast.Assign) and len(stmt.targets) == 1:
+            target = stmt.targets[0]
+        elif stmt.__class__.__name__ == "AnnAssign" and stmt.value is not None:
+            target = stmt.target
+        table = None
+        if ran and isinstance(target, ast.Name) and target.id in names and target.id in namespace:
+            table = static_table(stmt, target.id, namespace[target.id])
+            depth, iterated = names[target.id]
+            if table is not None and depth is not None and depth < dimensions(table.table_type):
+                table = None
+            # a static_map is iterated by pairs in the order of its keys
+            if table is not None and iterated and isinstance(table.table, dict):
+                table = None
+        if table is None:
+            body.append(stmt)
+        else:
+            tables.append(table)
+    node.body = tables + body
+
+
+def declaration(node):
+    """
+    :type node: StaticTable
+    :return: the C++ type, and the lines of the initializer of the table
+    :rtype: (str, list of str)
+    """
+    value = node.table
+    if isinstance(value, dict):
+        keys, values = node.table_type.args
+        key = "const char*" if keys is infer.STR else CppTypeRegistry.detect(keys)
+        ctype = "py2cpp::static_map<{}, {}, {}>".format(key, CppTypeRegistry.detect(values), len(value))
+        items = ["{{{}, {}}}".format(literal(k), literal(v)) for k, v in sorted(value.items())]
+        return ctype, initializer(items, ("{{{", "}}}"))
+    dimensions, items = shape(value)
+    element = node.table_type
+    while element.name == "List":
+        element = element.args[0]
+    ctype = CppTypeRegistry.detect(element)
+    for n in reversed(dimensions):
+        ctype = "std::array<{}, {}>".format(ctype, n)
+    return ctype, arrays(items, dimensions)
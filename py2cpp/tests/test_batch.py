@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+from .. import batch
+from ..cache import Cache
+
+
+def write(path, text):
+    dirname = os.path.dirname(path)
+    if not os.path.isdir(dirname):
+        os.makedirs(dirname)
+    with open(path, "w") as fp:
+        fp.write(text)
+
+
+def make_tree(root):
+    write(os.path.join(root, "a.py"), "def a() -> int:\n    return 1\n")
+    write(os.path.join(root, "pkg", "b.py"), "def b():\n    pass\n")
+    write(os.path.join(root, "pkg", "bad.py"), "def bad(:\n")
+    write(os.path.join(root, "pkg", "data.txt"), "not python\n")
+
+
+def read_tree(root):
+    result = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            with open(path) as fp:
+                result[os.path.relpath(path, root)] = fp.read()
+    return result
+
+
+class TestBatch:
+    def test_collect(self, tmpdir):
+        src = str(tmpdir.join("src"))
+        make_tree(src)
+        assert [x[1] for x in batch.collect([src])] == [
+            "a.py",
+            os.path.join("pkg", "b.py"),
+            os.path.join("pkg", "bad.py"),
+        ]
+        pattern = os.path.join(src, "pkg", "b*.py")
+        assert [x[1] for x in batch.collect([pattern])] == ["b.py", "bad.py"]
+
+    def test_run(self, tmpdir):
+        src = str(tmpdir.join("src"))
+        out = str(tmpdir.join("out"))
+        make_tree(src)
+        results = batch.run([src], out, processes=1)
+        assert [x.error is None for x in results] == [True, True, False]
+        assert "SyntaxError" in results[2].error
+        tree = read_tree(out)
+        assert sorted(tree) == ["a.cpp", os.path.join("pkg", "b.cpp")]
+        assert tree["a.cpp"].endswith("int a() {\n    return 1;\n}\n")
+
+    def test_deterministic(self, tmpdir):
+        src = str(tmpdir.join("src"))
+        make_tree(src)
+        for i in range(10):
+            write(os.path.join(src, "gen", "m{}.py".format(i)), "def f{0}(x):\n    return x + {0}\n".format(i))
+        serial = batch.run([src], str(tmpdir.join("out1")), processes=1)
+        parallel = batch.run([src], str(tmpdir.join("out2")), processes=3)
+        assert [(x.source, x.error) for x in serial] == [(x.source, x.error) for x in parallel]
+        assert read_tree(str(tmpdir.join("out1"))) == read_tree(str(tmpdir.join("out2")))
+
+    def test_cache_stats(self, tmpdir):
+        src = str(tmpdir.join("src"))
+        make_tree(src)
+        stats = []
+        for processes in (1, 3):
+            cache = Cache(str(tmpdir.join("cache{}".format(processes))))
+            for i in range(2):
+                batch.run([src], str(tmpdir.join("out{}".format(processes))), processes=processes, cache=cache)
+                stats.append((cache.hits, cache.misses))
+        assert stats[:2] == stats[2:]
+        # the modules and their functions, then the modules again; bad.py
+        # does not parse and misses every time
+        assert stats[:2] == [(0, 5), (2, 6)]
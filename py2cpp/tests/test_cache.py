@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+import io
+import os
+import time
+
+from .. import driver
+from .. import hook
+from ..cache import Cache
+
+
+SOURCE = "def f() -> int:\n    return 1\n"
+
+
+class VersionedHook(hook.CallHook):
+
+    version = 1
+
+    def match(self, node):
+        return False
+
+
+class TestCache:
+    def test_hit(self, tmpdir):
+        cache = Cache(str(tmpdir))
+        first = io.StringIO()
+        assert not driver.transpile(SOURCE, "f.py", first, cache=cache)
+        second = io.StringIO()
+        assert driver.transpile(SOURCE, "f.py", second, cache=cache)
+        assert first.getvalue() == second.getvalue()
+        stats = cache.stats()
+        # the module and its function
+        assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 2, 2)
+        assert stats["bytes"] == 2 * len(driver.convert(SOURCE)) - 1
+
+    def test_key(self, tmpdir):
+        cache = Cache(str(tmpdir))
+        assert cache.key(SOURCE) == Cache(str(tmpdir)).key(SOURCE)
+        assert cache.key(SOURCE) != cache.key(SOURCE + "\n")
+
+    def test_hook_invalidates(self, tmpdir):
+        hooks = hook.Hooks + [VersionedHook]
+        key = Cache(str(tmpdir), hooks=hooks).key(SOURCE)
+        assert key != Cache(str(tmpdir)).key(SOURCE)
+        VersionedHook.version = 2
+        try:
+            assert key != Cache(str(tmpdir), hooks=hooks).key(SOURCE)
+        finally:
+            VersionedHook.version = 1
+
+    def test_evict(self, tmpdir):
+        cache = Cache(str(tmpdir), max_bytes=10)
+        keys = [cache.key(str(i)) for i in range(3)]
+        past = time.time() - 100
+        for i, key in enumerate(keys):
+            cache.put(key, "x" * 5)
+            os.utime(cache.entry_path(key), (past + i, past + i))
+        # touch the oldest entry
+        assert cache.get(keys[0]) == "x" * 5
+        cache.evict()
+        assert cache.get(keys[1]) is None
+        assert cache.get(keys[2]) == "x" * 5
+        assert cache.stats()["evictions"] == 1
+
+    def test_clear(self, tmpdir):
+        cache = Cache(str(tmpdir))
+        cache.put(cache.key(SOURCE), "code")
+        cache.clear()
+        assert cache.stats()["entries"] == 0
@@ -1,9 +1,16 @@
 # -*- coding: utf-8 -*-
 
 import ast
+import io
 
+from .. import cpp
+from .. import driver
+from .. import hook
+from .. import transformer
+from ..cache import Cache
 from ..converter import Converter
 from ..cpp import BuildContext
+from ..cpp import CodeWriter
 
 def convert(src):
     node = ast.parse(src)
@@ -67,6 +74,30 @@ def test():
 """.strip())
         assert conv[0].docstring == "docstring"
 
+    def test_generic_annotations(self):
+        conv = convert("""
+def test(a: Dict[str, List[int]], b: Tuple[int, float]) -> List[float]:
+    pass
+""".strip())
+        assert build(conv) == [
+            "std::vector<double> test(const std::unordered_map<std::string, std::vector<int>>& a, "
+            "const std::tuple<int, double>& b) {\n\n}"
+        ]
+
+    def test_docstring_types(self):
+        conv = convert("""
+def test(a, b):
+    '''
+    :param list a:
+    :param Foo b:
+    :rtype: list of map of (str, float)
+    '''
+    pass
+""".strip())
+        assert build(conv) == [
+            "std::vector<std::unordered_map<std::string, double>> test(const std::vector<int>& a, const Foo& b) {\n\n}"
+        ]
+
 
 class TestClassDef:
     def test_pass(self):
@@ -84,6 +115,14 @@ class test(a, b):
 """.strip())
         assert build(conv) == ["class test : public a, public b {\n    void test() {\n\n    }\n};"]
 
+    def test_init(self):
+        conv = convert("""
+class test:
+    def __init__(self, x):
+        pass
+""".strip())
+        assert build(conv) == ["class test {\n    test(int x) {\n\n    }\n};"]
+
     def test_docstring(self):
         conv = convert("""
 class test:
@@ -105,8 +144,8 @@ class TestReturn:
 
 class TestAssign:
     def test_assign(self):
-        conv = convert("a = 1")
-        assert build(conv) == ["a = 1;"]
+        conv = convert("a = x")
+        assert build(conv) == ["a = x;"]
 
     def test_assigns(self):
         conv = convert("a = b = c")
@@ -132,7 +171,7 @@ class TestAugAssign:
 
     def test_Mod(self):
         conv = convert("x %= 1")
-        assert build(conv) == ["x %= 1;"]
+        assert build(conv) == ["x = py2cpp::mod(x, 1);"]
 
     def test_LShift(self):
         conv = convert("x <<= 1")
@@ -160,7 +199,7 @@ class TestAugAssign:
 
     def test_FloorDiv(self):
         conv = convert("x //= 1")
-        assert build(conv) == ["x = int(x / 1);"]
+        assert build(conv) == ["x = py2cpp::floordiv(x, 1);"]
 
 
 class TestFor:
@@ -171,6 +210,98 @@ for i in x:
 """.strip())
         assert build(conv) == ["for (auto i : x) {\n\n}"]
 
+    def test_range(self):
+        conv = convert("""
+for i in range(10):
+    pass
+for i in range(1, n + 1):
+    pass
+for i in range(10, 0, -2):
+    pass
+""".strip())
+        assert build(conv) == [
+            "for (int i = 0; i < 10; ++i) {\n\n}",
+            "for (int i = 1; i < n + 1; ++i) {\n\n}",
+            "for (int i = 10; i > 0; i -= 2) {\n\n}",
+        ]
+
+    def test_range_variable_step(self):
+        conv = convert("""
+for i in range(a, b, c):
+    pass
+""".strip())
+        assert build(conv) == ["for (int i = a; c > 0 ? i < b : i > b; i += c) {\n\n}"]
+
+    def test_range_evaluated_once(self):
+        conv = convert("""
+for i in range(len(x), 0, f()):
+    b = 1
+for i in range(0, b, c):
+    b -= 1
+    c += 1
+""".strip())
+        assert build(conv) == [
+            "for (int i = py2cpp::len(x), i_step = f(); i_step > 0 ? i < 0 : i > 0; i += i_step) {\n    b = 1;\n}",
+            "for (int i = 0, i_stop = b, i_step = c; i_step > 0 ? i < i_stop : i > i_stop; i += i_step) {\n"
+            "    b -= 1;\n    c += 1;\n}",
+        ]
+
+    def test_range_object(self):
+        conv = convert("""
+for i in range(10):
+    i = 1
+x = range(10)
+""".strip())
+        assert build(conv) == [
+            "for (auto i : py2cpp::range(10)) {\n    i = 1;\n}",
+            "x = py2cpp::range(10);",
+        ]
+
+    def test_range_local_index(self):
+        conv = convert("""
+def f(n: int) -> int:
+    i = -1
+    for i in range(n):
+        if i * i > 50:
+            break
+    return i
+""".strip())
+        assert build(conv) == [
+            "int f(int n) {\n    int i = -1;\n"
+            "    for (int i_item = 0; i_item < n; ++i_item) {\n        i = i_item;\n"
+            "        if (i * i > 50) {\n            break;\n        }\n    }\n    return i;\n}"]
+
+    def test_index_read_after_loop(self):
+        conv = convert("""
+def f(n: int, xs: List[str]) -> str:
+    for i in range(n):
+        pass
+    for x in xs:
+        pass
+    return x * i
+""".strip())
+        assert build(conv)[0].splitlines()[:9] == [
+            "std::string f(int n, const std::vector<std::string>& xs) {",
+            "    int i;",
+            "    std::string x;",
+            "    for (int i_item = 0; i_item < n; ++i_item) {",
+            "        i = i_item;",
+            "",
+            "    }",
+            "    for (auto x_item : xs) {",
+            "        x = x_item;",
+        ]
+
+    def test_index_only_in_loops(self):
+        conv = convert("""
+def f(n: int):
+    for i in range(n):
+        print(i)
+    for i in range(n):
+        print(i)
+""".strip())
+        assert "for (int i = 0; i < n; ++i)" in build(conv)[0]
+
 
 class TestWhile:
     def test_while1(self):
@@ -182,28 +313,28 @@ while True:
 
     def test_while2(self):
         conv = convert("""
-while True or False:
+while a or b:
     continue
 """.strip())
-        assert build(conv) == ["while (true || false) {\n    continue;\n}"]
+        assert build(conv) == ["while (a || b) {\n    continue;\n}"]
 
 
 class TestIf:
     def test_if(self):
         conv = convert("""
-if True:
+if a:
     pass
 """.strip())
-        assert build(conv) == ["if (true) {\n\n}"]
+        assert build(conv) == ["if (a) {\n\n}"]
 
     def test_if_orelse1(self):
         conv = convert("""
-if True:
+if a:
     pass
 else:
     pass
 """.strip())
-        assert build(conv) == ["if (true) {\n\n} else {\n\n}"]
+        assert build(conv) == ["if (a) {\n\n} else {\n\n}"]
 
     def test_if_orelse2(self):
         conv = convert("""
@@ -216,12 +347,28 @@ else:
 """.strip())
         assert build(conv) == ["if (a) {\n\n} else if (b) {\n\n} else {\n\n}"]
 
+    def test_if_nested_orelse(self):
+        conv = convert("""
+def test():
+    if a:
+        x = 1
+    elif b:
+        x = 2
+    else:
+        x = 3
+""".strip())
+        assert build(conv) == ["void test() {\n    int x;\n    if (a) {\n        x = 1;\n    } else if (b) {\n        x = 2;\n    } else {\n        x = 3;\n    }\n}"]
+
 
 class TestRaise:
     def test_type(self):
         conv = convert("raise NotImplementedError")
         assert build(conv) == ["throw NotImplementedError();"]
 
+    def test_instance(self):
+        conv = convert("raise ValueError('x')")
+        assert build(conv) == ['throw ValueError("x");']
+
 
 class TestBoolOp:
     def test_And(self):
@@ -260,7 +407,7 @@ class TestBinOp:
 
     def test_Mod(self):
         conv = convert("x % 1")
-        assert build(conv) == ["x % 1;"]
+        assert build(conv) == ["py2cpp::mod(x, 1);"]
 
     def test_LShift(self):
         conv = convert("x << 1")
@@ -288,7 +435,17 @@ class TestBinOp:
 
     def test_FloorDiv(self):
         conv = convert("x // 1")
-        assert build(conv) == ["int(x / 1);"]
+        assert build(conv) == ["py2cpp::floordiv(x, 1);"]
+
+    def test_nested(self):
+        conv = convert("a ** 2 + b // 3")
+        assert build(conv) == ["a * a + py2cpp::floordiv(b, 3);"]
+
+    def test_precedence(self):
+        conv = convert("(a + b) * c - (d - e) + f % (g + 1) + (a < b)")
+        assert build(conv) == ["(a + b) * c - (d - e) + py2cpp::mod(f, g + 1) + (a < b);"]
+        conv = convert("a * b + c * d - e")
+        assert build(conv) == ["a * b + c * d - e;"]
 
 
 class TestUnaryOp:
@@ -308,6 +465,10 @@ class TestUnaryOp:
         conv = convert("not (a and b)")
         assert build(conv) == ["!(a && b);"]
 
+    def test_Not_with_Compare(self):
+        conv = convert("not a < b")
+        assert build(conv) == ["!(a < b);"]
+
     def test_UAdd(self):
         conv = convert("+a")
         assert build(conv) == ["+a;"]
@@ -317,6 +478,285 @@ class TestUnaryOp:
         assert build(conv) == ["-a;"]
 
 
+class TestDivision:
+    def test_int(self):
+        conv = convert("""
+def f(a: int, b: int) -> int:
+    return a // b + a % b
+""")
+        assert build(conv) == ["int f(int a, int b) {\n    return py2cpp::floordiv(a, b) + py2cpp::mod(a, b);\n}"]
+
+    def test_nonnegative(self):
+        conv = convert("""
+def f(xs: List[int]):
+    n = len(xs)
+    for i in range(n):
+        print(i % (n + 1), i // 2, (i - 1) // 2)
+""")
+        assert "py2cpp::print(i % (n + 1), i / 2, py2cpp::floordiv(i - 1, 2));" in build(conv)[0]
+
+    def test_float(self):
+        conv = convert("""
+def f(x: float, n: int) -> float:
+    return x // n + x % n
+""")
+        assert build(conv) == ["double f(double x, int n) {\n    return std::floor(x / n) + py2cpp::mod(x, n);\n}"]
+
+    def test_str(self):
+        conv = convert("""
+def f(x: int) -> str:
+    return "%d" % x
+""")
+        assert build(conv) == ['std::string f(int x) {\n    return "%d" % x;\n}']
+
+
+class TestPower:
+    def test_square(self):
+        conv = convert("""
+def f(x: float, y: float) -> float:
+    return x ** 2 + (x - y) ** 2
+""")
+        assert build(conv) == ["double f(double x, double y) {\n    return x * x + py2cpp::square(x - y);\n}"]
+
+    def test_int(self):
+        conv = convert("""
+def f(a: int, n: int):
+    for i in range(n):
+        print(a ** 3, a ** i, (a + 1) ** 3, a ** n)
+""")
+        assert "py2cpp::print(a * a * a, py2cpp::pow(a, i), py2cpp::pow(a + 1, 3), std::pow(a, n));" in build(conv)[0]
+
+    def test_float(self):
+        conv = convert("""
+def f(x: float, n: int) -> float:
+    return x ** 3 + n ** -1 + math.pow(n, 2)
+""")
+        assert build(conv) == ["double f(double x, int n) {\n"
+                               "    return std::pow(x, 3) + std::pow(n, -1) + std::pow(n, 2);\n}"]
+
+    def test_wide_literals(self):
+        conv = convert("""
+def f() -> int:
+    a = 2 ** 100
+    b = 10 ** 20 // 10 ** 18
+    c = 2 ** 40
+    return 0
+""")
+        assert build(conv)[0].splitlines()[1:4] == [
+            "    double a = std::pow(2, 100);",
+            "    double b = std::floor(std::pow(10, 20) / 1000000000000000000);",
+            "    long c = 1099511627776;",
+        ]
+
+    def test_widened_base(self):
+        # without constant folding
+        transformers = [x for x in transformer.Transformers if x.__name__ != "ConstantFolder"]
+        node = Converter(transformers=transformers).visit(ast.parse("x = 2 ** 40\ny = 3 ** 50"))
+        assert build(node) == ["x = py2cpp::pow(2L, 40);", "y = std::pow(3, 50);"]
+
+
+class TestComprehension:
+    def test_ListComp(self):
+        conv = convert("""
+def f(n: int) -> List[int]:
+    return [i * i for i in range(n)]
+""")
+        assert build(conv) == [
+            "std::vector<int> f(int n) {\n"
+            "    return [&]() {\n"
+            "        std::vector<int> result;\n"
+            "        result.reserve(py2cpp::range(n).size());\n"
+            "        for (int i = 0; i < n; ++i) {\n"
+            "            result.push_back(i * i);\n"
+            "        }\n"
+            "        return result;\n"
+            "    }();\n"
+            "}"]
+
+    def test_SetComp(self):
+        conv = convert("""
+def f(xs: List[int]):
+    s = {x % 3 for x in xs if x > 0}
+""")
+        assert build(conv) == [
+            "void f(const std::vector<int>& xs) {\n"
+            "    std::unordered_set<int> s = [&]() {\n"
+            "        std::unordered_set<int> result;\n"
+            "        for (auto x : xs) {\n"
+            "            if (x > 0) {\n"
+            "                result.insert(py2cpp::mod(x, 3));\n"
+            "            }\n"
+            "        }\n"
+            "        return result;\n"
+            "    }();\n"
+            "}"]
+
+    def test_DictComp(self):
+        conv = convert("""
+def f(xs: List[str], result: int):
+    d = {x: len(x) + result for x in xs}
+""")
+        assert build(conv) == [
+            "void f(const std::vector<std::string>& xs, int result) {\n"
+            "    std::unordered_map<std::string, int> d = [&]() {\n"
+            "        std::unordered_map<std::string, int> result_;\n"
+            "        result_.reserve(xs.size());\n"
+            "        for (auto x : xs) {\n"
+            "            result_[x] = py2cpp::len(x) + result;\n"
+            "        }\n"
+            "        return result_;\n"
+            "    }();\n"
+            "}"]
+
+    def test_sum(self):
+        conv = convert("""
+def f(xs: List[float]) -> float:
+    return sum(x * 2 for x in xs)
+""")
+        assert build(conv) == [
+            "double f(const std::vector<double>& xs) {\n"
+            "    return [&]() {\n"
+            "        double total = 0;\n"
+            "        for (auto x : xs) {\n"
+            "            total += x * 2;\n"
+            "        }\n"
+            "        return total;\n"
+            "    }();\n"
+            "}"]
+
+    def test_all(self):
+        conv = convert("""
+def f(xs: List[int]) -> bool:
+    return all(x < 10 for x in xs)
+""")
+        assert build(conv) == [
+            "bool f(const std::vector<int>& xs) {\n"
+            "    return [&]() {\n"
+            "        for (auto x : xs) {\n"
+            "            if (!(x < 10)) {\n"
+            "                return false;\n"
+            "            }\n"
+            "        }\n"
+            "        return true;\n"
+            "    }();\n"
+            "}"]
+
+    def test_max(self):
+        conv = convert("""
+def f(n: int) -> int:
+    return max(i % 7 for i in range(n))
+""")
+        assert build(conv) == [
+            "int f(int n) {\n"
+            "    return [&]() {\n"
+            "        bool first = true;\n"
+            "        int best;\n"
+            "        for (int i = 0; i < n; ++i) {\n"
+            "            int value = i % 7;\n"
+            "            if (first || best < value) {\n"
+            "                best = value;\n"
+            "                first = false;\n"
+            "            }\n"
+            "        }\n"
+            "        if (first) {\n"
+            '            throw std::invalid_argument("max() arg is an empty sequence");\n'
+            "        }\n"
+            "        return best;\n"
+            "    }();\n"
+            "}"]
+
+    def test_shadowed(self):
+        conv = convert("""
+def sum(x):
+    pass
+
+def f(xs: List[int]):
+    return sum(x for x in xs)
+""")
+        assert "py2cpp::sum" not in build(conv)[1]
+        assert "total" not in build(conv)[1]
+
+    def test_unsupported_target(self):
+        conv = convert("[k for k, v in x]")
+        assert build(conv) == ["// UNSUPPORTED AST NODE: ListComp;"]
+
+
+class TestPop:
+    def test_pop(self):
+        conv = convert("""
+def f(xs: List[int]) -> int:
+    return xs.pop() + xs.pop(0)
+""")
+        assert build(conv) == [
+            "int f(std::vector<int>& xs) {\n"
+            "    return py2cpp::pop(xs) + xs.pop(0);\n"
+            "}"]
+
+
+class TestReserve:
+    def test_nested(self):
+        conv = convert("""
+def f(n: int, m: int):
+    rows = list()
+    for i in range(n):
+        row = list()
+        for j in range(m):
+            row.append(j)
+        rows.append(row)
+""")
+        assert build(conv) == [
+            "void f(int n, int m) {\n"
+            "    std::vector<std::vector<int>> rows;\n"
+            "    rows.reserve(py2cpp::range(n).size());\n"
+            "    for (int i = 0; i < n; ++i) {\n"
+            "        std::vector<int> row;\n"
+            "        row.reserve(py2cpp::range(m).size());\n"
+            "        for (int j = 0; j < m; ++j) {\n"
+            "            row.push_back(j);\n"
+            "        }\n"
+            "        rows.push_back(std::move(row));\n"
+            "    }\n"
+            "}"]
+
+    def test_product(self):
+        conv = convert("""
+def f(xs: List[int], m: int):
+    flat = []
+    for x in xs:
+        flat.append(x)
+        for j in range(m):
+            flat.append(j)
+            flat.append(x)
+""")
+        assert "    flat.reserve(xs.size() + 2 * xs.size() * py2cpp::range(m).size());\n" in build(conv)[0]
+
+    def test_unknown(self):
+        conv = convert("""
+def f(n: int, xs: List[int]):
+    a = []
+    for i in range(n):
+        if i % 2:
+            a.append(i)
+    b = []
+    for i in range(n):
+        for j in range(i):
+            b.append(j)
+    c = []
+    for i in range(n):
+        c.append(i)
+        if i > 5:
+            break
+    d = []
+    d.append(0)
+    for i in range(n):
+        d.append(i)
+    e = []
+    for i in range(g(n)):
+        e.append(i)
+""")
+        assert "reserve" not in build(conv)[0]
+
+
 class TestLambda:
     def test_Lambda(self):
         conv = convert("lambda x: x + 1")
@@ -333,8 +773,8 @@ class TestLambda:
 
 class TestIfExp:
     def test_IfExp(self):
-        conv = convert("a if True else b")
-        assert build(conv) == ["((true) ? (a) : (b));"]
+        conv = convert("a if c else b")
+        assert build(conv) == ["((c) ? (a) : (b));"]
 
 
 class TestStr:
@@ -345,3 +785,194 @@ class TestStr:
     def test_quote(self):
         conv = convert('"te\\"st"')
         assert build(conv) == ['"te\\"st";']
+
+    def test_escapes(self):
+        conv = convert(r'"a\\b\n\t\r\x01\x7f"')
+        assert build(conv) == [r'"a\\b\n\t\r\001\177";']
+
+    def test_methods(self):
+        conv = convert("""
+def f(s: str, words: List[str]) -> str:
+    parts = "a b".split()
+    fields = s.strip().split(",")
+    if s.startswith("#"):
+        return s.upper().replace("#", "")
+    return " ".join(words) + s.lower()
+""")
+        assert build(conv) == [
+            "std::string f(const std::string& s, const std::vector<std::string>& words) {\n"
+            "    std::vector<std::string> parts = py2cpp::split(\"a b\");\n"
+            "    std::vector<std::string> fields = py2cpp::split(py2cpp::strip(s), \",\");\n"
+            "    if (py2cpp::startswith(s, \"#\")) {\n"
+            "        return py2cpp::replace(py2cpp::upper(s), \"#\", \"\");\n"
+            "    }\n"
+            "    return py2cpp::join(\" \", words) + py2cpp::lower(s);\n"
+            "}"]
+
+    def test_other_receivers(self):
+        conv = convert("""
+def f(x, s: str):
+    x.split()
+    s.strip("x")
+    s.split(None)
+""")
+        assert build(conv) == [
+            "void f(int x, const std::string& s) {\n"
+            "    x.split();\n"
+            "    s.strip(\"x\");\n"
+            "    s.split(nullptr);\n"
+            "}"]
+
+
+class TestPrint:
+    def test_print(self):
+        conv = convert("print(x, 1)")
+        assert build(conv) == ["py2cpp::print(x, 1);"]
+
+    def test_keywords(self):
+        conv = convert("print(x, sep=', ', end='', file=sys.stderr, flush=True)")
+        assert build(conv) == [
+            'py2cpp::print(py2cpp::print_options().sep(", ").end("").file(py2cpp::err()).flush(true), x);']
+
+    def test_escaped_keywords(self):
+        conv = convert("print(x, sep='\\t', end='!\\n')")
+        assert build(conv) == ['py2cpp::print(py2cpp::print_options().sep("\\t").end("!\\n"), x);']
+
+    def test_none(self):
+        conv = convert("print(True, None)")
+        assert build(conv) == ["py2cpp::print(true, nullptr);"]
+
+    def test_default_keywords(self):
+        conv = convert("print(x, sep=None, end=None)")
+        assert build(conv) == ["py2cpp::print(x);"]
+
+    def test_stream(self):
+        conv = convert("sys.stdout.flush()")
+        assert build(conv) == ["py2cpp::out().flush();"]
+
+
+class TestHook:
+    def test_hook_table(self):
+        conv = Converter()
+        conv.visit(ast.parse("f(x)"))
+        assert [x.__class__ for x in conv.hook_table[ast.Call]] == [
+            hook.MathPowHook,
+            hook.TupleHook,
+            hook.RangeHook,
+            hook.ReductionHook,
+            hook.BuiltinHook,
+            hook.AppendHook,
+            hook.StrMethodHook,
+            hook.PopHook,
+            hook.LvalueHook,
+        ]
+        assert conv.hook_table[ast.Name] == []
+
+    def test_custom_hook(self):
+        class FooHook(hook.CallHook):
+
+            node_types = (ast.Call,)
+
+            def match(self, node):
+                return node.func.__class__ == ast.Name and node.func.id == "foo"
+
+            def apply(self, node, ret):
+                ret.func = cpp.Name(id="bar")
+                return ret
+
+        conv = Converter(hooks=hook.Hooks + [FooHook])
+        ret = conv.visit(ast.parse("foo(1)"))
+        assert build(ret) == ["bar(1);"]
+
+    def test_untyped_hook(self):
+        class AnyHook(hook.Hook):
+            def match(self, node):
+                return node.__class__ == ast.Name and node.id == "a"
+
+            def apply(self, node, ret):
+                return cpp.Name(id="b")
+
+        conv = Converter(hooks=[AnyHook])
+        ret = conv.visit(ast.parse("a + c"))
+        assert build(ret) == ["b + c;"]
+
+
+class TestModule:
+    def test_emit(self):
+        conv = convert("""
+def a():
+    pass
+
+def b():
+    return 1
+""".strip())
+        stream = io.StringIO()
+        conv.emit(BuildContext.create(), CodeWriter(stream))
+        assert stream.getvalue() == "void a() {\n\n}\n\nint b() {\n    return 1;\n}\n"
+        assert conv.build(BuildContext.create()) == stream.getvalue()[:-1]
+
+
+class TestIncremental:
+    SOURCE = """
+def f(x: int) -> int:
+    return x + 1
+
+def g(y: int) -> int:
+    return f(y) * 2
+
+def h():
+    pass
+""".strip()
+
+    def convert(self, src, store=None):
+        conv = Converter(incremental=True, store=store)
+        ret = conv.visit(ast.parse(src))
+        return conv, ret
+
+    def test_changed(self):
+        conv, _ = self.convert(self.SOURCE)
+        previous = conv.fingerprints()
+        assert list(previous) == ["f", "g", "h"]
+        conv, _ = self.convert(self.SOURCE.replace("def h():\n    pass", "def h():\n    return"))
+        assert conv.changed(previous) == ["h"]
+
+    def test_changed_signature(self):
+        conv, _ = self.convert(self.SOURCE)
+        previous = conv.fingerprints()
+        conv, _ = self.convert(self.SOURCE.replace("def f(x: int) -> int", "def f(x: float) -> float"))
+        assert conv.changed(previous) == ["f", "g"]
+
+    def test_removed(self):
+        conv, _ = self.convert(self.SOURCE)
+        previous = conv.fingerprints()
+        conv, _ = self.convert(self.SOURCE.replace("def h():\n    pass", ""))
+        assert conv.changed(previous) == ["h"]
+
+    def test_reuse(self):
+        class Store(dict):
+            def put(self, key, code):
+                self[key] = code
+
+        conv, ret = self.convert(self.SOURCE)
+        expected = build(ret)
+        store = Store((x.fingerprint, code) for x, code in zip(conv.definitions.values(), expected))
+        del store[conv.definitions["g"].fingerprint]
+        conv, ret = self.convert(self.SOURCE, store=store)
+        assert [x.reused for x in conv.definitions.values()] == [True, False, True]
+        assert ret.body[0].__class__ == cpp.Verbatim
+        assert build(ret) == expected
+
+    def test_modes_invalidate(self, tmpdir):
+        source = "def f(a: List[int]):\n    a.append(1)\n\ndef g(b: List[int]):\n    f(b)\n"
+        stream = io.StringIO()
+        store = Cache(str(tmpdir))
+        driver.transpile(source, "a.py", stream, cache=store)
+        assert "void f(std::vector<int>& a)" in stream.getvalue()
+        # f used as a value takes its parameter by value
+        source += "\ndef h():\n    return f\n"
+        cached = io.StringIO()
+        driver.transpile(source, "a.py", cached, cache=store)
+        fresh = io.StringIO()
+        driver.transpile(source, "a.py", fresh)
+        assert cached.getvalue() == fresh.getvalue()
+        assert "void f(std::vector<int> a)" in fresh.getvalue()
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+from .. import cpp
+from ..cpp import BuildContext
+
+
+def make_function():
+    args = cpp.arguments(args=[cpp.arg("self")], vararg=None, kwarg=None, defaults=[])
+    return cpp.FunctionDef(name="f", args=args, body=[], docstring=None)
+
+
+class TestBuildContext:
+    def test_create(self):
+        ctx = BuildContext.create()
+        assert ctx.indent_level == 0
+        assert ctx.stack == []
+        assert not ctx.in_class()
+        assert not ctx.is_class_method()
+        assert not ctx.in_loop()
+
+    def test_class_method(self):
+        cls = cpp.ClassDef(name="A", bases=[], body=[], docstring=None)
+        func = make_function()
+        ctx = BuildContext(BuildContext(BuildContext.create(), cls), func)
+        assert ctx.indent_level == 2
+        assert ctx.stack == [cls, func]
+        assert ctx.class_def is cls
+        assert ctx.function_def is func
+        assert ctx.is_class_method()
+
+    def test_nested_function(self):
+        cls = cpp.ClassDef(name="A", bases=[], body=[], docstring=None)
+        ctx = BuildContext(BuildContext.create(), cls)
+        ctx = BuildContext(BuildContext(ctx, make_function()), make_function())
+        assert ctx.in_class()
+        assert not ctx.is_class_method()
+
+    def test_loop_depth(self):
+        loop = cpp.While(test=cpp.Name("x"), body=[], orelse=[])
+        ctx = BuildContext.create()
+        for i in range(3):
+            ctx = BuildContext(ctx, loop)
+        ctx = BuildContext(ctx, make_function())
+        assert ctx.loop_depth == 3
+        assert ctx.in_loop()
+
+
+def subclasses(cls):
+    for sub in cls.__subclasses__():
+        yield sub
+        for x in subclasses(sub):
+            yield x
+
+
+class TestSlots:
+    def test_no_instance_dict(self):
+        for cls in subclasses(cpp.Base):
+            assert cls.__dictoffset__ == 0, cls.__name__
+
+    def test_dump(self):
+        node = cpp.Module(body=[cpp.Expr(cpp.BinOp(left=cpp.Name("a"), op="+", right=cpp.Num(1)))])
+        assert cpp.dump(node) == "Module(body=[Expr(value=BinOp(left=Name(id='a'), op='+', right=Num(n=1)))])"
+
+    def test_stmt(self):
+        func = make_function()
+        assert func.stmt is func.body
+        assert func.type == cpp.Type.Stmt
+
+
+class TestIncludes:
+    def test_module(self):
+        from ..driver import convert
+        code = convert("""
+def f(a: List[str]) -> int:
+    print(len(a))
+    return 0
+""")
+        assert code.startswith(
+            '#include <string>\n#include <vector>\n\n'
+            '#include "py2cpp/containers.hpp"\n#include "py2cpp/print.hpp"\n\nint f(')
+
+    def test_none(self):
+        from ..driver import convert
+        assert convert("def f(x):\n    return x + 1").startswith("int f(int x)")
+
+    def test_scope(self):
+        scope = cpp.CppScope(value=cpp.Name("py2cpp"), attr="range")
+        assert cpp.includes(cpp.Expr(cpp.Call(scope, []))) == set(['"py2cpp/range.hpp"'])
+        scope = cpp.CppScope(value=cpp.Name("py2cpp"), attr="unknown")
+        assert cpp.includes(scope) == set([cpp.RUNTIME])
+
+    def test_verbatim(self):
+        verbatim = cpp.Verbatim("int f() {\n}", ["<vector>", '"py2cpp/range.hpp"'])
+        text = verbatim.dump()
+        assert text == '#include <vector>\n\n#include "py2cpp/range.hpp"\nint f() {\n}'
+        loaded = cpp.Verbatim.load(text)
+        assert loaded.code == verbatim.code
+        assert loaded.requires() == verbatim.requires()
+        assert cpp.Verbatim.load("int f() {\n}").requires() == frozenset()
@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+
+import ast
+
+from ..converter import Converter
+from ..cpp import BuildContext
+from ..infer import ModuleTypes
+from ..infer import infer_function
+from ..infer import join
+from ..types import UNKNOWN
+from ..types import make_type
+from ..types import parse
+
+
+def infer(src):
+    node = ast.parse(src)
+    return infer_function(node.body[-1], ModuleTypes(node))
+
+
+def convert(src):
+    ctx = BuildContext.create()
+    return Converter().visit(ast.parse(src)).build(ctx)
+
+
+class TestJoin:
+    def test_numbers(self):
+        assert join(parse("int"), parse("float")) is parse("float")
+        assert join(parse("bool"), parse("int")) is parse("int")
+
+    def test_containers(self):
+        assert join(make_type("List", [UNKNOWN]), parse("List[int]")) is parse("List[int]")
+        assert join(parse("Dict[str, int]"), parse("Dict[str, float]")) is parse("Dict[str, float]")
+
+    def test_unrelated(self):
+        assert join(parse("str"), parse("int")) is parse("str")
+
+
+class TestInfer:
+    def test_literals(self):
+        result = infer("""
+def f():
+    a = 1
+    b = 2.0
+    c = "c"
+    d = a < b
+""")
+        assert result.locals == {
+            "a": parse("int"),
+            "b": parse("float"),
+            "c": parse("str"),
+            "d": parse("bool"),
+        }
+
+    def test_join_assignments(self):
+        result = infer("""
+def f(n: int):
+    x = 0
+    for i in range(n):
+        x += i / 2
+""")
+        assert result.locals == {"x": parse("float")}
+
+    def test_containers(self):
+        result = infer("""
+def f():
+    rows = list()
+    row = []
+    row.append(1)
+    rows.append(row)
+    d = {}
+    d["a"] = rows
+""")
+        assert result.locals["rows"] is parse("List[List[int]]")
+        assert result.locals["d"] is parse("Dict[str, List[List[int]]]")
+
+    def test_signatures(self):
+        result = infer("""
+class Foo:
+    pass
+
+def g() -> List[str]:
+    pass
+
+def h():
+    pass
+
+def f():
+    a = g()
+    b = a[0]
+    c = h()
+    d = Foo()
+    e = math.sqrt(2)
+""")
+        assert result.locals == {
+            "a": parse("List[str]"),
+            "b": parse("str"),
+            "c": UNKNOWN,
+            "d": parse("Foo"),
+            "e": parse("float"),
+        }
+
+    def test_params(self):
+        result = infer("""
+def f(a: List[int], b=1.5, c: str = "c", d=1):
+    '''
+    :param float d:
+    '''
+    x = a[0]
+    y = b
+    z = d
+""")
+        assert result.locals == {"x": parse("int"), "y": parse("float"), "z": parse("float")}
+        assert result.params == {"b": parse("float")}
+
+    def test_comprehensions(self):
+        result = infer("""
+def f(xs: List[float]):
+    a = [x * 2 for x in xs]
+    b = {i for i in range(3)}
+    c = {str(x): x for x in xs}
+    d = sum(x > 0 for x in xs)
+    e = max(x for x in xs)
+    g = any(x for x in xs)
+""")
+        assert result.locals == {
+            "a": parse("List[float]"),
+            "b": parse("Set[int]"),
+            "c": parse("Dict[str, float]"),
+            "d": parse("int"),
+            "e": parse("float"),
+            "g": parse("bool"),
+        }
+
+    def test_nonnegative(self):
+        result = infer("""
+def f(n: int, xs: List[int]):
+    a = len(xs)
+    b = 0
+    c = 0
+    while b < a:
+        b += 1
+        c -= 1
+    for i in range(n):
+        d = i * 2 % 5
+    for j in range(n, -1, -1):
+        e = xs[j]
+    for k in range(n, -2, -1):
+        pass
+""")
+        assert result.nonnegative == {"a", "b", "d", "i", "j"}
+
+    def test_other_stores(self):
+        result = infer("""
+def f(n: int):
+    a = 0
+    if (a := n - 5) > 0:
+        pass
+    b = a
+    c = 0
+    c = n
+""")
+        assert result.nonnegative == set()
+        assert "return py2cpp::floordiv(a, 2) + py2cpp::mod(b, 2);" in convert("""
+def f(n: int) -> int:
+    a = 0
+    b = 1
+    a, b = b - 2, a
+    return a // 2 + b % 2
+""")
+
+    def test_invalid_annotations(self):
+        result = infer("""
+def f(g: Callable[[int], int], h: "a b!"):
+    x = g
+    y = h
+""")
+        assert result.locals == {"x": UNKNOWN, "y": parse("int")}
+
+    def test_returns(self):
+        assert infer("def f(x: float):\n    return x * 2").returns is parse("float")
+        assert infer("def f():\n    return g()").returns is UNKNOWN
+        assert infer("def f():\n    pass").returns is None
+        assert infer("def f() -> float:\n    return 1").returns is None
+
+    def test_global(self):
+        result = infer("""
+def f():
+    global x
+    x = 1
+""")
+        assert result.locals == {}
+
+
+class TestDeclarations:
+    def test_first_assignment(self):
+        assert convert("""
+def f() -> int:
+    x = 0
+    x = x + 1
+    return x
+""") == "int f() {\n    int x = 0;\n    x = x + 1;\n    return x;\n}"
+
+    def test_auto(self):
+        assert convert("""
+def f():
+    x = g()
+""") == "void f() {\n    auto x = g();\n}"
+
+    def test_hoisted(self):
+        assert convert("""
+def f(a: bool) -> float:
+    if a:
+        x = 1
+    else:
+        x = 2.5
+    return x
+""") == ("double f(bool a) {\n    double x;\n    if (a) {\n        x = 1;\n    } else {\n"
+         "        x = 2.5;\n    }\n    return x;\n}")
+
+    def test_loop_local(self):
+        assert convert("""
+def f(n: int):
+    for i in range(n):
+        y = i * 2
+        print(y)
+""") == ("void f(int n) {\n    for (int i = 0; i < n; ++i) {\n        int y = i * 2;\n"
+         "        py2cpp::print(y);\n    }\n}")
+
+    def test_empty_container(self):
+        assert convert("""
+def f():
+    x = list()
+    x.append(1.0)
+    x = []
+""") == "void f() {\n    std::vector<double> x;\n    x.push_back(1.0);\n    x = std::vector<double>();\n}"
+
+    def test_AnnAssign(self):
+        assert convert("""
+def f():
+    x: float = 1
+    y: List[int]
+""") == "void f() {\n    double x = 1;\n    std::vector<int> y;\n}"
+
+    def test_default_param(self):
+        assert convert("def f(x=1.5):\n    pass") == "void f(double x=1.5) {\n\n}"
+
+    def test_hoisted_unknown(self):
+        assert convert("""
+def f(a: bool, n: int):
+    if a:
+        x = g(n)
+    else:
+        x = g(0)
+    return x
+""") == ("auto f(bool a, int n) {\n    std::decay_t<decltype(g(n))> x;\n    if (a) {\n"
+         "        x = g(n);\n    } else {\n        x = g(0);\n    }\n    return x;\n}")
+
+    def test_hoisted_not_deducible(self):
+        code = convert("""
+def f(a: bool, n: int):
+    y = n
+    if a:
+        x = g(y)
+    else:
+        x = g(0)
+    return x
+""")
+        assert code.splitlines()[1:3] == [
+            "    // UNSUPPORTED: the type of x is not known where it is declared",
+            "    auto x;"]
+
+    def test_conflict(self):
+        code = convert("""
+def f():
+    x = 1
+    x = "s"
+    y = [1]
+    y = ["s"]
+""")
+        assert code.splitlines()[1:3] == [
+            "    // UNSUPPORTED: x is assigned both int and str",
+            "    // UNSUPPORTED: y is assigned both List[int] and List[str]"]
+
+    def test_compatible(self):
+        assert "UNSUPPORTED:" not in convert("""
+def f(a: bool):
+    x = 1
+    x = 2.5
+    y = None
+    y = [1]
+    y = []
+    z = a
+    z = 1
+""")
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+import ast
+
+from ..converter import Converter
+from ..cpp import BuildContext
+from ..infer import ModuleTypes
+from ..passing import pass_parameters
+
+
+def modes(src):
+    node = ast.parse(src)
+    module = ModuleTypes(node)
+    pass_parameters(node, module)
+    return dict((x.name, module.passing[x]) for x in module.passing)
+
+
+def convert(src):
+    ctx = BuildContext.create()
+    return Converter().visit(ast.parse(src)).build(ctx)
+
+
+class TestModes:
+    def test_modes(self):
+        assert modes("""
+def f(a: List[int], b: str, c: int, d: List[int], e: List[int], g: Dict[str, int], h: Foo):
+    d.append(len(a) + len(b) + c)
+    e = []
+    return g["x"] + h.x
+""") == {"f": {"a": "const", "b": "const", "d": "ref", "g": "ref", "h": "const"}}
+
+    def test_escape(self):
+        assert modes("""
+def f(xs: List[int]) -> List[int]:
+    xs.append(1)
+    return xs
+""") == {"f": {}}
+
+    def test_method_call(self):
+        assert modes("""
+class Foo:
+    def m(self, xs: List[int], ys: List[int]):
+        xs[0] = 1
+        return len(ys)
+
+def f(foo: Foo):
+    foo.m([], [])
+""") == {"m": {"ys": "const"}, "f": {"foo": "ref"}}
+
+    def test_calls(self):
+        assert modes("""
+def fill(xs: List[int]):
+    xs.append(1)
+
+def relay(ys: List[int], zs: List[int]):
+    fill(ys)
+    fill(zs[0])
+""") == {"fill": {"xs": "ref"}, "relay": {"ys": "ref", "zs": "ref"}}
+
+    def test_value(self):
+        # the signature of a function used as a value is not known at the calls
+        assert modes("""
+def fill(xs: List[int]):
+    xs.append(1)
+
+g = fill
+""") == {"fill": {}}
+
+    def test_default(self):
+        assert modes("def f(xs: List[int] = None):\n    return len(xs)") == {"f": {}}
+
+
+class TestLvalue:
+    def test_temporary(self):
+        assert convert("""
+def fill(xs: List[int]):
+    xs.append(1)
+
+def f(xs: List[int]):
+    fill(xs)
+    fill(g(xs))
+""").split("\n\n")[1] == ("void f(std::vector<int>& xs) {\n    fill(xs);\n"
+                           "    fill(py2cpp::lvalue(g(xs)));\n}")
+
+
+class TestMoves:
+    def test_loop(self):
+        assert convert("""
+def f(n: int) -> List[List[int]]:
+    rows = []
+    for i in range(n):
+        row = []
+        row.append(i)
+        rows.append(row)
+    return rows
+""") == (
+            "std::vector<std::vector<int>> f(int n) {\n"
+            "    std::vector<std::vector<int>> rows;\n"
+            "    rows.reserve(py2cpp::range(n).size());\n"
+            "    for (int i = 0; i < n; ++i) {\n"
+            "        std::vector<int> row;\n"
+            "        row.push_back(i);\n"
+            "        rows.push_back(std::move(row));\n"
+            "    }\n"
+            "    return rows;\n"
+            "}")
+
+    def test_not_last(self):
+        assert "std::move" not in convert("""
+def f(n: int, xs: List[int]):
+    rows = []
+    row = []
+    for i in range(n):
+        row.append(i)
+        rows.append(row)
+    a = xs
+    b = xs
+    c = []
+    c.append(1)
+    d = c
+    print(len(c))
+""")
+
+    def test_assign(self):
+        assert convert("""
+def f(c: bool) -> Tuple[List[int], List[int]]:
+    a = []
+    b = a
+    return b if c else a
+""").splitlines()[2:4] == [
+            "    std::vector<int> b = a;",
+            "    return ((c) ? (std::move(b)) : (std::move(a)));"]
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+import io
+
+from .. import cpp
+from .. import driver
+from ..profiler import Profiler
+from ..profiler import instrument_ir
+
+
+SOURCE = """
+def f(x):
+    for i in range(x):
+        print(i ** 2)
+    x **= 2
+""".strip()
+
+
+class FakeTimer(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        self.now += 1.0
+        return self.now
+
+
+class TestProfiler:
+    def test_nested(self):
+        profiler = Profiler(timer=FakeTimer())
+        with profiler.measure("a"):
+            with profiler.measure("b"):
+                with profiler.measure("a"):
+                    pass
+        report = profiler.report()["phases"]
+        assert report["a"] == {"count": 2, "time": 5.0, "self_time": 3.0}
+        assert report["b"] == {"count": 1, "time": 3.0, "self_time": 2.0}
+        stream = io.StringIO()
+        profiler.write_folded(stream)
+        assert stream.getvalue() == "a 2000000\na;b 2000000\na;b;a 1000000\n"
+
+    def test_transpile(self):
+        profiler = Profiler()
+        code = driver.convert(SOURCE, profiler=profiler)
+        assert code == driver.convert(SOURCE)
+        phases = profiler.report()["phases"]
+        for name in ["parse",
+                     "transform:PowTransformer.visit_AugAssign",
+                     "convert:visit_For",
+                     "hook:RangeHook.match",
+                     "hook:RangeHook.apply",
+                     "build:Name",
+                     "emit:RangeFor"]:
+            assert name in phases, name
+        assert phases["convert:visit_Module"]["count"] == 1
+
+    def test_instrument_restores(self):
+        build = cpp.Name.__dict__["build"]
+        with instrument_ir():
+            assert cpp.Name.__dict__["build"] is not build
+        assert cpp.Name.__dict__["build"] is build
+
+    def test_instrument_overlapping(self):
+        build = cpp.Name.__dict__["build"]
+        first = instrument_ir()
+        second = instrument_ir()
+        first.__enter__()
+        second.__enter__()
+        wrapped = cpp.Name.__dict__["build"]
+        first.__exit__(None, None, None)
+        # still profiling the second run, and not wrapped twice
+        assert cpp.Name.__dict__["build"] is wrapped
+        second.__exit__(None, None, None)
+        assert cpp.Name.__dict__["build"] is build
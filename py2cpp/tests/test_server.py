@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+import io
+import json
+import os
+import tempfile
+import threading
+
+from ..cache import Cache
+from ..client import Client
+from ..server import Server
+from ..server import UnixServer
+from ..server import serve_stdio
+
+
+SOURCE = "def f(x):\n    return x\n"
+
+
+class TestServer:
+    def test_transpile(self):
+        server = Server()
+        response = server.handle({"id": 1, "source": SOURCE, "name": "f.py"})
+        assert response["id"] == 1
+        assert response["code"].endswith("int f(int x) {\n    return x;\n}\n")
+        assert "// original source code: f.py" in response["code"]
+
+    def test_error(self):
+        server = Server()
+        response = server.handle({"id": 2, "source": "def f(:"})
+        assert response["error"].startswith("SyntaxError")
+        assert server.handle({"command": "stats"})["stats"] == {"requests": 1, "errors": 1}
+
+    def test_state_reset(self):
+        server = Server()
+        for i in range(10):
+            server.handle({"source": SOURCE})
+        assert len(server.converter().arguments) == 1
+
+    def test_stdio(self):
+        lines = [json.dumps({"id": i, "source": SOURCE}) for i in range(8)]
+        output = io.StringIO()
+        serve_stdio(Server(), io.StringIO("\n".join(lines) + "\n"), output, threads=3)
+        responses = [json.loads(x) for x in output.getvalue().splitlines()]
+        assert sorted(x["id"] for x in responses) == list(range(8))
+        assert len(set(x["code"] for x in responses)) == 1
+
+    def test_unix(self):
+        path = os.path.join(tempfile.mkdtemp(), "py2cpp.sock")
+        unix_server = UnixServer(path, Server())
+        thread = threading.Thread(target=unix_server.serve_forever)
+        thread.start()
+        try:
+            with Client(path) as client:
+                assert client.request(command="ping")["result"] == "pong"
+                response = client.request(source=SOURCE)
+                assert "int f(int x)" in response["code"]
+                client.request(command="shutdown")
+            thread.join(5)
+            assert not thread.is_alive()
+        finally:
+            unix_server.server_close()
+            os.remove(path)
+
+    def test_stdio_shutdown(self):
+        lines = [
+            json.dumps({"id": 1, "source": SOURCE}),
+            json.dumps({"id": 2, "command": "shutdown"}),
+            json.dumps({"id": 3, "command": "ping"}),
+        ]
+        output = io.StringIO()
+        serve_stdio(Server(), io.StringIO("\n".join(lines) + "\n"), output, threads=2)
+        responses = dict((x["id"], x) for x in map(json.loads, output.getvalue().splitlines()))
+        assert sorted(responses) == [1, 2]
+        assert responses[2]["result"] == "bye"
+
+    def test_evict(self, tmpdir):
+        cache = Cache(str(tmpdir), max_bytes=0)
+        server = Server(cache, evict_every=2)
+        server.handle({"source": SOURCE})
+        assert cache.stats()["entries"] == 2
+        server.handle({"source": SOURCE + "\n"})
+        assert cache.stats()["entries"] == 0
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+
+import ast
+import io
+
+from .. import driver
+from .. import tables
+from ..cache import Cache
+from ..converter import Converter
+from ..cpp import BuildContext
+
+
+def convert(src, **kwargs):
+    ctx = BuildContext.create()
+    return Converter(**kwargs).visit(ast.parse(src)).build(ctx)
+
+
+def evaluate(src):
+    node = ast.parse(src)
+    namespace = tables.sandbox()
+    for stmt in node.body:
+        tables.execute(stmt, namespace)
+    return dict((k, v) for k, v in namespace.items() if k not in tables.sandbox())
+
+
+class TestSandbox:
+    def test_functions(self):
+        namespace = evaluate("""
+import math
+
+def square(x: int) -> int:
+    return x * x
+
+A = [square(i) for i in range(4)]
+B = round(math.sqrt(16))
+""")
+        assert namespace["A"] == [0, 1, 4, 9]
+        assert namespace["B"] == 4
+
+    def test_rejected(self):
+        namespace = evaluate("""
+import os
+A = os.getcwd()
+B = open("x").read()
+C = ().__class__
+D = list(range(10 ** 9))
+E = [0] * (1 << 40)
+F = 2 ** 100000
+""")
+        assert sorted(namespace) == []
+
+    def test_produced(self):
+        namespace = evaluate("""
+def grow(s: str) -> str:
+    for _ in range(40):
+        s = s.replace("a", "aa")
+    return s
+
+def double(items: list) -> list:
+    for _ in range(40):
+        items.extend(items)
+    return items
+
+A = [[0] * 60000 for i in range(60000)]
+B = len(grow("a"))
+C = len(double([0]))
+D = len("".join(str(i) for i in range(1000)))
+""")
+        assert sorted(namespace) == ["D"]
+
+    def test_steps(self):
+        namespace = evaluate("""
+def spin() -> int:
+    while True:
+        pass
+
+A = spin()
+B = 1
+""")
+        assert sorted(namespace) == ["B"]
+
+
+class TestTables:
+    def test_array(self):
+        assert convert("""
+SQUARES = [i * i for i in range(4)]
+
+def f(i: int) -> int:
+    return SQUARES[i]
+""", tables=True) == ("static constexpr std::array<int, 4> SQUARES = {{0, 1, 4, 9}};\n\n"
+                      "int f(int i) {\n    return SQUARES[i];\n}")
+
+    def test_nested(self):
+        code = convert("""
+GRID = [[x * y for x in range(3)] for y in range(2)]
+WIDE = (1 << 40, 1)
+HALVES = [i / 2 for i in range(2)]
+
+def f() -> float:
+    return GRID[1][2] + WIDE[0] + HALVES[1]
+""", tables=True)
+        assert code.splitlines()[:8] == [
+            "static constexpr std::array<std::array<int, 3>, 2> GRID = {{",
+            "    {{0, 0, 0}},",
+            "    {{0, 1, 2}},",
+            "}};",
+            "",
+            "static constexpr std::array<long, 2> WIDE = {{1099511627776, 1}};",
+            "",
+            "static constexpr std::array<double, 2> HALVES = {{0.0, 0.5}};",
+        ]
+
+    def test_map(self):
+        assert convert("""
+DIGITS = {c: i for i, c in enumerate("ba\\n")}
+
+def f(c: str) -> int:
+    return DIGITS[c] + DIGITS.get("z", -1)
+""", tables=True).splitlines()[0] == (
+            'static constexpr py2cpp::static_map<const char*, int, 3> DIGITS = '
+            '{{{{"\\012", 2}, {"a", 1}, {"b", 0}}}};')
+
+    def test_hoisted(self):
+        code = convert("""
+def square(x: int) -> int:
+    return x * x
+
+A = [square(x) for x in range(3)]
+""", tables=True)
+        assert code.startswith("static constexpr std::array<int, 3> A = {{0, 1, 4}};\n\nint square(")
+
+    def test_not_read_only(self):
+        src = """
+A = [1, 2]
+B = [1, 2]
+C = [1, 2]
+D = [1, 2]
+C = [3]
+
+def f():
+    A.append(3)
+    B[0] = 2
+    print(D)
+"""
+        assert "static constexpr" not in convert(src, tables=True)
+
+    def test_nested_store(self):
+        src = """
+T = [[0] * 3 for _ in range(3)]
+U = [[0] * 3 for _ in range(3)]
+V = [[0] * 3 for _ in range(3)]
+W = [[0] * 3 for _ in range(3)]
+
+def f(i: int, j: int):
+    T[i][j] = 5
+    row = U[0]
+    row.append(1)
+    for r in V:
+        r[0] = 1
+    del W[i][j]
+"""
+        assert "static constexpr" not in convert(src, tables=True)
+
+    def test_nested_reads(self):
+        code = convert("""
+T = [[i * j for i in range(3)] for j in range(3)]
+D = {1: 2}
+
+def f(i: int) -> int:
+    x = T[i][i] + len(T[i]) + D.get(i, 0) + D[i]
+    for y in T[i]:
+        x += y
+    return x
+""", tables=True)
+        assert code.count("static constexpr") == 2
+
+    def test_iterated_map(self):
+        src = """
+DIGITS = {c: i for i, c in enumerate("ba")}
+
+def f():
+    for k in DIGITS:
+        print(k)
+"""
+        assert "static constexpr" not in convert(src, tables=True)
+
+    def test_mixed(self):
+        src = """
+A = [1, 2.5]
+B = [[1], [1, 2]]
+C = []
+D = {1: "a"}
+
+def f() -> int:
+    return A[0] + B[0][0] + len(C) + len(D)
+"""
+        assert "static constexpr" not in convert(src, tables=True)
+
+    def test_default(self):
+        assert "static constexpr" not in convert("A = [1, 2]\n\ndef f() -> int:\n    return A[0]")
+
+
+class TestOptions:
+    def test_cache_key(self, tmpdir):
+        source = "A = [1, 2]\n\ndef f() -> int:\n    return A[0]\n"
+        cache = Cache(str(tmpdir), options={"tables": True})
+        assert cache.key(source) != Cache(str(tmpdir)).key(source)
+        stream = io.StringIO()
+        driver.transpile(source, "a.py", stream, cache=cache,
+                         converter=Converter(store=cache, tables=True))
+        assert "static constexpr" in stream.getvalue()
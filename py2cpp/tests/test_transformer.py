@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+
+import ast
+
+from ..transformer import CompositeTransformer
+from ..transformer import Transformers
+
+
+def transform(src, transformers):
+    node = ast.parse(src)
+    return CompositeTransformer([x() for x in transformers]).visit(node)
+
+
+class TestCompositeTransformer:
+    def test_nested(self):
+        node = transform("((a, b), c)", Transformers)
+        outer = node.body[0].value
+        assert outer.__class__ == ast.Call
+        assert outer.args[0].__class__ == ast.Call
+
+    def test_order(self):
+        calls = []
+
+        class First(ast.NodeTransformer):
+            def visit_Name(self, node):
+                calls.append(("first", node.id))
+                return ast.List(elts=[], ctx=ast.Load())
+
+        class Second(ast.NodeTransformer):
+            def visit_Name(self, node):
+                calls.append(("second", node.id))
+                return node
+
+            def visit_List(self, node):
+                calls.append(("second", "[]"))
+                return node
+
+        transform("a", [First, Second])
+        assert calls == [("first", "a"), ("second", "[]")]
+
+    def test_children_first(self):
+        node = transform("x **= (a, b)", Transformers)
+        assign = node.body[0]
+        assert assign.__class__ == ast.Assign
+        assert assign.value.__class__ == ast.BinOp
+        assert assign.value.right.__class__ == ast.Call
+        assert assign.value.right.func.id == "tuple"
+
+
+def folded(src):
+    return ast.dump(transform(src, Transformers))
+
+
+def parsed(src):
+    return ast.dump(ast.parse(src))
+
+
+class TestConstantFolder:
+    def test_arithmetic(self):
+        call = transform("print(2 ** 10, 7 // -2, -7 % 3, 7 / 2, 1 << 4, ~5, -(3 - 5))", Transformers).body[0].value
+        assert [ast.literal_eval(x) for x in call.args] == [1024, -4, 2, 3.5, 16, -6, 2]
+        assert isinstance(ast.literal_eval(call.args[3]), float)
+
+    def test_semantics(self):
+        # python's bool arithmetic, and what raises or is too large stays
+        assert folded("print(True + True, 1.5 * 2, 1 / 0, 2 ** 100, 1 << 100, 10.0 ** 400)") == \
+            parsed("print(2, 3.0, 1 / 0, 2 ** 100, 1 << 100, 10.0 ** 400)")
+
+    def test_strings(self):
+        assert folded('print("a" + "b", "%d" % 5, "a" * 3)') == parsed('print("ab", "5", "a" * 3)')
+
+    def test_compare(self):
+        assert folded("print(1 < 2 < 3, 1 == 2, 1 < x)") == parsed("print(True, False, 1 < x)")
+
+    def test_BoolOp(self):
+        assert folded("print(0 or x, 1 and x and y, 0 and x, 1 or x, x or 0)") == \
+            parsed("print(x, x and y, 0, 1, x or 0)")
+
+    def test_IfExp(self):
+        assert folded("print(a if 2 > 1 else b)") == parsed("print(a)")
+
+    def test_If(self):
+        assert folded("""
+if 1 > 2:
+    f()
+elif 0:
+    g()
+else:
+    h()
+while False:
+    f()
+""") == parsed("h()")
+
+    def test_function_wide(self):
+        # the global statement applies to the whole function
+        src = """
+def f():
+    if False:
+        global x
+    x = 1
+"""
+        assert folded(src) == parsed(src)
+
+
+class TestConstantPropagator:
+    def test_module(self):
+        assert folded("""
+SIZE = 4
+LIMIT: int = SIZE * 2
+
+def f(n: int) -> int:
+    return n + SIZE + LIMIT
+""") == parsed("""
+LIMIT: int = 8
+
+def f(n: int) -> int:
+    return n + 4 + 8
+""")
+
+    def test_locals(self):
+        assert folded("""
+def f(n: int):
+    step = 2
+    scale: float = 1
+    debug = False
+    if debug:
+        print(n)
+    print(n * step, scale)
+""") == parsed("""
+def f(n: int):
+    step = 2
+    scale: float = 1
+    debug = False
+    print(n * 2, 1.0)
+""")
+
+    def test_rebound(self):
+        src = """
+A = 1
+B = 2
+C = 3
+D = 4
+
+def f(B):
+    global D
+    a = 1
+    a += 1
+    D = 5
+    return A + B + C + D + a
+
+def g():
+    C = 4
+    for A in range(3):
+        pass
+"""
+        assert folded(src) == parsed(src)
+
+    def test_shadowed(self):
+        assert folded("""
+def f():
+    max = 10
+    return max
+
+def g(a, b):
+    return max(a, b)
+
+class C:
+    n = 1
+
+def h():
+    return n + sum(x for x in range(3))
+""") == parsed("""
+def f():
+    max = 10
+    return 10
+
+def g(a, b):
+    return max(a, b)
+
+class C:
+    n = 1
+
+def h():
+    return n + sum(x for x in range(3))
+""")
+
+    def test_nested(self):
+        assert folded("""
+def f():
+    k = 3
+
+    def g(x):
+        return x * k
+    return g
+""") == parsed("""
+def f():
+    k = 3
+
+    def g(x):
+        return x * 3
+    return g
+""")
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+
+import ast
+import pickle
+
+import pytest
+
+from ..cpp import CppTypeRegistry
+from ..cpp import type_registry
+from ..types import NameProvider
+from ..types import PyType
+from ..types import UNKNOWN
+from ..types import from_ast
+from ..types import load_names
+from ..types import parse
+
+
+class CountingProvider(object):
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, name):
+        self.calls.append(name)
+        if name.startswith("Foo"):
+            return name + " *"
+        return None
+
+
+class TestTypeRegistry:
+    def test_provider(self):
+        registry = CppTypeRegistry()
+        registry.register("int", "int")
+        provider = CountingProvider()
+        registry.add_provider(provider)
+        assert registry.convert("int") == "int"
+        assert provider.calls == []
+        assert registry.convert("FooBar") == "FooBar *"
+        assert registry.convert("FooBar") == "FooBar *"
+        assert "Baz" not in registry
+        assert "Baz" not in registry
+        assert provider.calls == ["FooBar", "Baz"]
+
+    def test_register_after_miss(self):
+        registry = CppTypeRegistry()
+        assert "Baz" not in registry
+        registry.register("Baz", "baz_t")
+        assert registry.convert("Baz") == "baz_t"
+
+
+class TestNameProvider:
+    def test_lazy(self):
+        loads = []
+
+        def names():
+            loads.append(1)
+            return ["QWidget", "QString"]
+
+        registry = CppTypeRegistry()
+        registry.add_provider(NameProvider(names, "{} *", prefix="Q"))
+        assert "Widget" not in registry
+        assert loads == []
+        assert registry.convert("QWidget") == "QWidget *"
+        assert "QFoo" not in registry
+        assert registry.convert("QString") == "QString *"
+        assert loads == [1]
+
+    def test_load_names(self, tmpdir):
+        path = tmpdir.join("names.txt")
+        path.write("# generated\nQWidget\n\nQString\n")
+        provider = NameProvider(load_names(str(path)), "{} *")
+        assert provider("QString") == "QString *"
+        assert provider("QFoo") is None
+
+
+class TestPyType:
+    def test_interned(self):
+        assert PyType("List", [PyType("int")]) is PyType("List", (PyType("int"),))
+        assert PyType("List", [PyType("int")]) is not PyType("List", [PyType("float")])
+
+    def test_pickle(self):
+        t = parse("Dict[str, List[int]]")
+        assert pickle.loads(pickle.dumps(t)) is t
+
+    def test_str(self):
+        assert str(parse("Dict[str,List[int]]")) == "Dict[str, List[int]]"
+
+
+class TestParse:
+    def test_annotation(self):
+        t = parse("Dict[str, List[int]]")
+        assert t.name == "Dict"
+        assert t.args == (PyType("str"), PyType("List", [PyType("int")]))
+
+    def test_aliases(self):
+        assert parse("list[int]") is parse("List[int]")
+        assert parse("typing.List[int]") is parse("List[int]")
+
+    def test_docstring(self):
+        assert parse("list of str") is parse("List[str]")
+        assert parse("map of (str, int)") is parse("Dict[str, int]")
+        assert parse("list of map of (str, str)") is parse("List[Dict[str, str]]")
+        assert parse("(int, float)") is parse("Tuple[int, float]")
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            parse("int or None")
+        with pytest.raises(ValueError):
+            parse("List[int")
+
+    def test_from_ast(self):
+        node = ast.parse("x: Dict[str, 'List[int]']").body[0].annotation
+        assert from_ast(node) is parse("Dict[str, List[int]]")
+        node = ast.parse("x: Callable[[int], int]").body[0].annotation
+        assert from_ast(node) is UNKNOWN
+        node = ast.parse("x: List[Callable[[int], int]]").body[0].annotation
+        assert from_ast(node) is UNKNOWN
+        node = ast.parse("x: 'a b!'").body[0].annotation
+        assert from_ast(node) is None
+
+
+class TestCppTypes:
+    @pytest.mark.parametrize("pytype, cpptype", [
+        ("float", "double"),
+        ("List[float]", "std::vector<double>"),
+        ("Dict[str, List[int]]", "std::unordered_map<std::string, std::vector<int>>"),
+        ("Tuple[int, float]", "std::tuple<int, double>"),
+        ("Tuple[int, ...]", "std::vector<int>"),
+        ("Set[str]", "std::unordered_set<std::string>"),
+        ("list", "std::vector<int>"),
+        ("Foo", "Foo"),
+        ("foo.Bar[int]", "foo::Bar<int>"),
+    ])
+    def test_convert(self, pytype, cpptype):
+        assert type_registry.convert(pytype) == cpptype
+
+    def test_memoized(self):
+        registry = CppTypeRegistry()
+        registry.register_generic("List", "std::vector<{}>")
+        provider = CountingProvider()
+        registry.add_provider(provider)
+        assert registry.convert("List[FooBar]") == "std::vector<FooBar *>"
+        assert registry.convert("List[FooBar]") == "std::vector<FooBar *>"
+        assert provider.calls == ["FooBar"]
+        registry.register("FooBar", "foo_bar")
+        assert registry.convert("List[FooBar]") == "std::vector<foo_bar>"
+
+    def test_requires(self):
+        assert type_registry.requires("Dict[str, List[int]]") == set(["<unordered_map>", "<string>", "<vector>"])
+        assert type_registry.requires("Tuple[float, ...]") == set(["<vector>"])
+        assert type_registry.requires("int") == set()
+        assert type_registry.requires("int or None") == set()
+        assert type_registry.requires(None) == set()
+        registry = CppTypeRegistry()
+        registry.register("Foo", "foo::Foo", '"foo.hpp"')
+        assert registry.requires("Foo") == set(['"foo.hpp"'])
+        registry.register("Foo", "Foo")
+        assert registry.requires("Foo") == set()
+
+    def test_detect(self):
+        assert CppTypeRegistry.detect(None) == "int"
+        assert CppTypeRegistry.detect(None, rettype=True) == "void"
+        assert CppTypeRegistry.detect("int or None") == "int"
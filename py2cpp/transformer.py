@@ -1,6 +1,15 @@
 # -*- coding: utf-8 -*-
 
+from __future__ import absolute_import
+
 import ast
+import copy
+import math
+import operator
+
+import six
+
+from . import infer
 
 
 class PrintTransformer(ast.NodeTransformer):
@@ -26,38 +35,398 @@ class TupleTransformer(ast.NodeTransformer):
 
 
 class PowTransformer(ast.NodeTransformer):
+    """``a **= b`` as ``a = a ** b``, whose BinOp the converter lowers by the
+    types of the operands"""
     def visit_AugAssign(self, node):
         if node.op.__class__ != ast.Pow:
             return node
-        dummy_math = ast.Name(id="math", ctx=ast.Load())
-        dummy_func = ast.Attribute(value=dummy_math, attr="pow", ctx=ast.Load())
-        dummy_call = ast.Call(func=dummy_func, args=[node.target, node.value], keywords=[], starargs=None, kwargs=None)
-        return ast.Assign(targets=[node.target], value=dummy_call)
-
-    def visit_BinOp(self, node):
-        if node.op.__class__ != ast.Pow:
-            return node
-        # math.pow
-        dummy_math = ast.Name(id="math", ctx=ast.Load())
-        dummy_func = ast.Attribute(value=dummy_math, attr="pow", ctx=ast.Load())
-        return ast.Call(func=dummy_func, args=[node.left, node.right], keywords=[], starargs=None, kwargs=None)
+        load = copy.copy(node.target)
+        load.ctx = ast.Load()
+        dummy_op = ast.BinOp(left=load, op=node.op, right=node.value)
+        return ast.Assign(targets=[node.target], value=dummy_op)
 
 
 class FloorDivTransformer(ast.NodeTransformer):
+    """``a //= b`` and ``a %= b`` as ``a = a // b`` and ``a = a % b``, whose
+    BinOp the converter lowers by the types of the operands"""
     def visit_AugAssign(self, node):
-        if node.op.__class__ != ast.FloorDiv:
+        if node.op.__class__ not in (ast.FloorDiv, ast.Mod):
             return node
-        dummy_op = ast.BinOp(left=node.target, op=ast.Div(), right=node.value)
-        dummy_int = ast.Name(id="int", ctx=ast.Load())
-        dummy_call = ast.Call(func=dummy_int, args=[dummy_op], keywords=[], starargs=None, kwargs=None)
-        return ast.Assign(targets=[node.target], value=dummy_call)
+        load = copy.copy(node.target)
+        load.ctx = ast.Load()
+        dummy_op = ast.BinOp(left=load, op=node.op, right=node.value)
+        return ast.Assign(targets=[node.target], value=dummy_op)
+
+
+BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: getattr(operator, "truediv" if six.PY3 else "div"),
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+    ast.LShift: operator.lshift,
+    ast.RShift: operator.rshift,
+    ast.BitOr: operator.or_,
+    ast.BitXor: operator.xor,
+    ast.BitAnd: operator.and_,
+}
+
+UNARY_OPERATORS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+    ast.Invert: operator.invert,
+    ast.Not: operator.not_,
+}
+
+COMPARISONS = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+}
+
+# the largest folded integers are those of a C++ long long
+INTEGER_BITS = 63
+
+# the longest folded string
+STRING_LENGTH = 256
+
+# statements that change their whole function even in a branch never taken
+FUNCTION_WIDE = ("Global", "Nonlocal", "Yield", "YieldFrom", "Await")
+
+# the nodes whose names are bound in a scope of their own
+NESTED_SCOPES = ("FunctionDef", "AsyncFunctionDef", "Lambda", "ClassDef",
+                 "ListComp", "SetComp", "DictComp", "GeneratorExp")
+
+
+def literal(node):
+    """
+    :return: (True, value) if *node* is a number, bool or string literal,
+             else (False, None)
+    """
+    found, value = infer.constant(node)
+    if found and isinstance(value, six.integer_types + (float,) + six.string_types):
+        return True, value
+    return False, None
+
+
+def make_literal(value, node):
+    """
+    :param node: the node that *value* replaces
+    :return: a literal of *value*, or None if C++ cannot represent it
+    """
+    if isinstance(value, bool):
+        if six.PY2:
+            ret = ast.Name(id=str(value), ctx=ast.Load())
+        else:
+            ret = ast.NameConstant(value=value)
+    elif isinstance(value, six.integer_types):
+        if not -2 ** INTEGER_BITS <= value < 2 ** INTEGER_BITS:
+            return None
+        ret = ast.Num(n=value)
+    elif isinstance(value, float):
+        if math.isinf(value) or math.isnan(value):
+            return None
+        ret = ast.Num(n=value)
+    elif isinstance(value, six.string_types):
+        if len(value) > STRING_LENGTH:
+            return None
+        ret = ast.Str(s=value)
+    else:
+        return None
+    return ast.copy_location(ret, node)
+
+
+def evaluate(op, left, right):
+    """
+    :return: (True, left op right) as python computes it, or (False, None)
+             if it raises or is too expensive to compute here
+    """
+    if isinstance(left, six.string_types) or isinstance(right, six.string_types):
+        # concatenation and formatting; repetition may be large
+        if not (op is ast.Add and type(left) is type(right)) and not (op is ast.Mod and isinstance(left, six.string_types)):
+            return False, None
+    elif op in (ast.Pow, ast.LShift) and isinstance(right, six.integer_types) and right > 2 * INTEGER_BITS:
+        if op is ast.LShift or isinstance(left, six.integer_types) and abs(left) > 1:
+            return False, None
+    try:
+        return True, BINARY_OPERATORS[op](left, right)
+    except Exception:
+        # e.g. ZeroDivisionError or OverflowError, which stay for runtime
+        return False, None
+
+
+def function_wide(nodes):
+    return any(x.__class__.__name__ in FUNCTION_WIDE for node in nodes for x in ast.walk(node))
+
+
+def bound_names(node):
+    """the names that *node* binds"""
+    if isinstance(node, ast.Name):
+        return [] if isinstance(node.ctx, ast.Load) else [node.id]
+    if isinstance(node, (ast.FunctionDef, ast.ClassDef)) or node.__class__.__name__ == "AsyncFunctionDef":
+        return [node.name]
+    if isinstance(node, ast.alias):
+        return [(node.asname or node.name).split(".")[0]]
+    if node.__class__.__name__ == "arg":
+        return [node.arg]
+    if isinstance(node, ast.arguments):
+        # python 2 names the parameters in Names; *args and **kwargs
+        return [x for x in (node.vararg, node.kwarg) if isinstance(x, six.string_types)]
+    names = [getattr(node, x, None) for x in ("name", "rest")]
+    return [x for x in names if isinstance(x, six.string_types)]
+
+
+def scope_nodes(scope):
+    """the nodes of *scope* outside the scopes nested in it"""
+    todo = [scope]
+    while todo:
+        node = todo.pop()
+        yield node
+        if node is scope or node.__class__.__name__ not in NESTED_SCOPES:
+            todo.extend(ast.iter_child_nodes(node))
+
+
+class ConstantFolder(ast.NodeTransformer):
+    """Compute the operators of literals, comparisons and boolean operators
+    of literals, and the conditional expressions, ``if`` and ``while``
+    statements whose condition is a literal, as python does."""
 
     def visit_BinOp(self, node):
-        if node.op.__class__ != ast.FloorDiv:
+        found_left, left = literal(node.left)
+        found_right, right = literal(node.right)
+        if not (found_left and found_right) or node.op.__class__ not in BINARY_OPERATORS:
+            return node
+        found, value = evaluate(node.op.__class__, left, right)
+        ret = make_literal(value, node) if found else None
+        return node if ret is None else ret
+
+    def visit_UnaryOp(self, node):
+        found, operand = literal(node.operand)
+        if not found or isinstance(operand, six.string_types) and not isinstance(node.op, ast.Not):
+            return node
+        try:
+            value = UNARY_OPERATORS[node.op.__class__](operand)
+        except TypeError:
+            # e.g. ~1.5
             return node
-        dummy_op = ast.BinOp(left=node.left, op=ast.Div(), right=node.right)
-        dummy_int = ast.Name(id="int", ctx=ast.Load())
-        return ast.Call(func=dummy_int, args=[dummy_op], keywords=[], starargs=None, kwargs=None)
+        ret = make_literal(value, node)
+        return node if ret is None else ret
+
+    def visit_Compare(self, node):
+        operands = [literal(x) for x in [node.left] + node.comparators]
+        if not all(found for found, _ in operands) or any(x.__class__ not in COMPARISONS for x in node.ops):
+            return node
+        values = [value for _, value in operands]
+        try:
+            value = all(COMPARISONS[op.__class__](values[i], values[i + 1]) for i, op in enumerate(node.ops))
+        except TypeError:
+            # e.g. 1 < "a" in python 3
+            return node
+        return make_literal(value, node)
+
+    def visit_BoolOp(self, node):
+        # the leading literals that python skips, or whose value it returns
+        values = list(node.values)
+        stop = isinstance(node.op, ast.Or)
+        while len(values) > 1:
+            found, value = literal(values[0])
+            if not found:
+                break
+            if bool(value) == stop:
+                return values[0]
+            values.pop(0)
+        if len(values) == 1:
+            return values[0]
+        node.values = values
+        return node
+
+    def visit_IfExp(self, node):
+        found, value = literal(node.test)
+        if not found:
+            return node
+        return node.body if value else node.orelse
+
+    def visit_If(self, node):
+        return self.branch(node)
+
+    def visit_While(self, node):
+        found, value = literal(node.test)
+        if not found or value:
+            return node
+        return self.branch(node)
+
+    @staticmethod
+    def branch(node):
+        """the statements of *node* that run, if its condition is a literal"""
+        found, value = literal(node.test)
+        if not found:
+            return node
+        taken, dropped = (node.body, node.orelse) if value else (node.orelse, node.body)
+        if function_wide(dropped) or function_wide([node.test]):
+            return node
+        return taken
+
+
+class Substitution(ast.NodeTransformer):
+    """Replace names by literals."""
+
+    def __init__(self, constants):
+        """
+        :param constants: literal values by name
+        :type constants: dict
+        """
+        self.constants = constants
+        self.count = 0
+
+    def visit_Name(self, node):
+        if not isinstance(node.ctx, ast.Load) or node.id not in self.constants:
+            return node
+        self.count += 1
+        return make_literal(self.constants[node.id], node)
+
+
+class ConstantPropagator(ast.NodeTransformer):
+    """Replace the names that are assigned a number or a bool literal once,
+    and never rebound, by the literal, and fold what that makes constant.
+
+    Module level names are replaced everywhere; the plain assignments of
+    those that no longer occur are dropped. The locals of a function are
+    replaced in the function and the functions nested in it.
+    """
+
+    SCOPES = (ast.FunctionDef, getattr(ast, "AsyncFunctionDef", ast.FunctionDef))
+
+    # annotations that keep a literal of the type of their value
+    ANNOTATIONS = {
+        "bool": (bool,),
+        "int": six.integer_types,
+        "float": six.integer_types + (float,),
+    }
+
+    def visit_Module(self, node):
+        propagated = set()
+        while True:
+            count = 0
+            for scope in [node] + [x for x in ast.walk(node) if isinstance(x, self.SCOPES)]:
+                constants = self.constants(scope, node)
+                if not constants:
+                    continue
+                substitution = Substitution(constants)
+                CompositeTransformer([substitution, ConstantFolder()]).visit(scope)
+                count += substitution.count
+                if scope is node:
+                    propagated.update(constants)
+            if not count:
+                break
+        loads = set(x.id for x in ast.walk(node) if isinstance(x, ast.Name) and isinstance(x.ctx, ast.Load))
+        node.body = [x for x in node.body if not (
+            isinstance(x, ast.Assign) and len(x.targets) == 1 and isinstance(x.targets[0], ast.Name)
+            and x.targets[0].id in propagated and x.targets[0].id not in loads)]
+        return node
+
+    def constants(self, scope, module):
+        """
+        :type scope: ast.Module or ast.FunctionDef
+        :return: the literals of the names of *scope* that are assigned once
+        :rtype: dict
+        """
+        stores = {}
+        values = {}
+        for x in ast.walk(scope):
+            for name in bound_names(x):
+                stores[name] = stores.get(name, 0) + 1
+        # the assignments of nested scopes bind their own locals
+        for x in scope_nodes(scope):
+            if isinstance(x, ast.Assign):
+                found, value = literal(x.value)
+                if found:
+                    for target in x.targets:
+                        if isinstance(target, ast.Name):
+                            values[target.id] = value
+            elif x.__class__.__name__ == "AnnAssign" and x.value is not None and isinstance(x.target, ast.Name):
+                found, value = literal(x.value)
+                kinds = self.ANNOTATIONS.get(getattr(x.annotation, "id", None), ())
+                if found and isinstance(value, kinds) and (isinstance(value, bool) or kinds[0] is not bool):
+                    values[x.target.id] = float(value) if x.annotation.id == "float" else value
+        # global and nonlocal names are bound in other scopes
+        for x in ast.walk(module):
+            if x.__class__.__name__ in ("Global", "Nonlocal"):
+                for name in x.names:
+                    stores[name] = 0
+        return dict((k, v) for k, v in values.items()
+                    if stores.get(k) == 1 and not isinstance(v, six.string_types))
+
+
+TYPE_FIELDS = ("annotation", "returns")
+
+
+class CompositeTransformer(ast.NodeTransformer):
+    """Apply several NodeTransformers in a single post-order traversal.
+
+    Children are rewritten before their parent.  Rewrites for the same
+    node class run in the order the transformers were given, and each one
+    receives the node returned by the previous rewrite; if a rewrite
+    replaces the node by another class, the remaining transformers are
+    dispatched on the new class.
+    """
+    def __init__(self, transformers, profiler=None):
+        """
+        :type transformers: list of NodeTransformer
+        :type profiler: py2cpp.profiler.Profiler
+        """
+        self.transformers = transformers
+        self.profiler = profiler
+        self.dispatch = {}
+
+    def methods_for(self, node_type):
+        """
+        :rtype: list of (int, function)
+        """
+        name = "visit_" + node_type.__name__
+        methods = []
+        for i, transformer in enumerate(self.transformers):
+            method = getattr(transformer, name, None)
+            if method is None:
+                continue
+            # e.g. NodeVisitor.visit_Constant, which only walks the subtree again
+            if getattr(transformer.__class__, name) is getattr(ast.NodeTransformer, name, None):
+                continue
+            if self.profiler is not None:
+                method = self.profiler.wrap("transform:{}.{}".format(transformer.__class__.__name__, name), method)
+            methods.append((i, method))
+        self.dispatch[node_type] = methods
+        return methods
+
+    def generic_visit(self, node):
+        # annotations are types, not expressions to rewrite
+        saved = [(x, getattr(node, x)) for x in TYPE_FIELDS if getattr(node, x, None) is not None]
+        for field, _ in saved:
+            setattr(node, field, None)
+        node = super(CompositeTransformer, self).generic_visit(node)
+        for field, value in saved:
+            setattr(node, field, value)
+        return node
+
+    def visit(self, node):
+        node = self.generic_visit(node)
+        start = 0
+        while isinstance(node, ast.AST):
+            methods = self.dispatch.get(node.__class__)
+            if methods is None:
+                methods = self.methods_for(node.__class__)
+            for i, method in methods:
+                if i >= start:
+                    break
+            else:
+                break
+            node = method(node)
+            start = i + 1
+        return node
 
 
 Transformers = [
@@ -65,4 +434,6 @@ Transformers = [
     TupleTransformer,
     PowTransformer,
     FloorDivTransformer,
+    ConstantFolder,
+    ConstantPropagator,
 ]
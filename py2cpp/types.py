@@ -1,15 +1,280 @@
 # -*- coding: utf-8 -*-
 
+import ast
+import io
+import re
+
+import six
+
+
+class PyType(object):
+    """Python type: a name and the types of its parameters.
+
+    Instances are interned, so equal types are the same object and can be
+    compared and hashed by identity.
+    """
+    __slots__ = ("name", "args", "__weakref__")
+
+    _interned = {}
+
+    def __new__(cls, name, args=()):
+        key = (name, tuple(args))
+        self = cls._interned.get(key)
+        if self is None:
+            self = object.__new__(cls)
+            self.name, self.args = key
+            self = cls._interned.setdefault(key, self)
+        return self
+
+    def __reduce__(self):
+        return (PyType, (self.name, self.args))
+
+    def __str__(self):
+        if not self.args:
+            return self.name
+        return "{}[{}]".format(self.name, ", ".join(str(x) for x in self.args))
+
+    def __repr__(self):
+        return "PyType({!r})".format(str(self))
+
+
+# builtin and docstring names of the typing generics
+ALIASES = {
+    "list": "List",
+    "dict": "Dict",
+    "map": "Dict",
+    "set": "Set",
+    "frozenset": "FrozenSet",
+    "tuple": "Tuple",
+}
+
+ELLIPSIS = PyType("...")
+NONE = PyType("None")
+# type that is not known until the compiler deduces it
+UNKNOWN = PyType("?")
+
+TOKEN_RE = re.compile(r"\s*(?:(?P<name>[A-Za-z_][\w.]*)|(?P<op>\.\.\.|[\[\](),]))")
+
+
+def make_type(name, args=()):
+    """
+    :rtype: PyType
+    """
+    if name.startswith("typing."):
+        name = name[len("typing."):]
+    return PyType(ALIASES.get(name, name), args)
+
+
+_parsed = {}
+
+
+def parse(s):
+    """
+    Parse a type written as an annotation (``Dict[str, List[int]]``) or in
+    a docstring (``list of str``, ``map of (str, int)``).
+
+    :type s: str
+    :rtype: PyType
+    """
+    result = _parsed.get(s)
+    if result is None:
+        tokens = _tokenize(s)
+        result = _parse_type(tokens)
+        if tokens:
+            raise ValueError("invalid type: {!r}".format(s))
+        _parsed[s] = result
+    return result
+
+
+def _tokenize(s):
+    tokens = []
+    pos = 0
+    s = s.rstrip()
+    while pos < len(s):
+        m = TOKEN_RE.match(s, pos)
+        if m is None:
+            raise ValueError("invalid type: {!r}".format(s))
+        tokens.append(m.group("name") or m.group("op"))
+        pos = m.end()
+    tokens.reverse()
+    return tokens
+
+
+def _parse_type(tokens):
+    if not tokens:
+        raise ValueError("unexpected end of type")
+    token = tokens.pop()
+    if token == "...":
+        return ELLIPSIS
+    if token == "(":
+        return make_type("Tuple", _parse_list(tokens, ")"))
+    if token in ("[", "]", ")", ","):
+        raise ValueError("unexpected {!r}".format(token))
+    args = ()
+    if tokens and tokens[-1] == "[":
+        tokens.pop()
+        args = _parse_list(tokens, "]")
+    elif len(tokens) > 1 and tokens[-1] == "of":
+        tokens.pop()
+        arg = _parse_type(tokens)
+        # "map of (str, int)" has two parameters, "list of (str, int)" one
+        if arg.name == "Tuple" and ALIASES.get(token, token) in ("Dict", "Tuple"):
+            args = arg.args
+        else:
+            args = (arg,)
+    return make_type(token, args)
+
+
+def _parse_list(tokens, end):
+    args = []
+    while tokens and tokens[-1] != end:
+        args.append(_parse_type(tokens))
+        if tokens and tokens[-1] == ",":
+            tokens.pop()
+    if not tokens:
+        raise ValueError("missing {!r}".format(end))
+    tokens.pop()
+    return args
+
+
+def from_ast(node):
+    """
+    Type of an annotation expression.
+
+    :type node: ast.AST
+    :return: None if *node* is not a type, so that the caller uses its
+             default, or UNKNOWN for a generic it cannot represent, e.g.
+             ``Callable[[int], int]``
+    :rtype: PyType or None
+    """
+    if isinstance(node, ast.Name):
+        return make_type(node.id)
+    if isinstance(node, ast.Attribute):
+        value = from_ast(node.value)
+        if value is None:
+            return None
+        return make_type("{}.{}".format(value.name, node.attr))
+    if isinstance(node, ast.Subscript):
+        value = from_ast(node.value)
+        slice = node.slice
+        if slice.__class__.__name__ == "Index":
+            slice = slice.value
+        elts = slice.elts if isinstance(slice, ast.Tuple) else [slice]
+        args = [from_ast(x) for x in elts]
+        if value is None or None in args or UNKNOWN in args:
+            return UNKNOWN
+        return make_type(value.name, args)
+    if node.__class__.__name__ in ("Constant", "Str", "NameConstant", "Ellipsis"):
+        value = getattr(node, "value", getattr(node, "s", Ellipsis))
+        if isinstance(value, six.string_types):
+            # like a docstring type that does not parse
+            try:
+                return parse(value)
+            except ValueError:
+                return None
+        if value is None:
+            return NONE
+        if value is Ellipsis:
+            return ELLIPSIS
+    return None
+
 
 class TypeRegistry(object):
     def __init__(self):
         self.type_map = {}
+        # generic name -> (format of the parameter types, number of parameters)
+        self.generics = {}
+        self.providers = []
+        # memo of the types resolved by providers, and of the misses
+        self.resolved = {}
+        self.missing = set()
 
     def __contains__(self, v):
-        return v in self.type_map
+        return self.lookup(v) is not None
+
+    def lookup(self, pytype):
+        """
+        :return: the registered type, or None if neither the registry nor
+                 its providers know *pytype*
+        """
+        if pytype in self.type_map:
+            return self.type_map[pytype]
+        if pytype in self.resolved:
+            return self.resolved[pytype]
+        if pytype in self.missing:
+            return None
+        for provider in self.providers:
+            cpptype = provider(pytype)
+            if cpptype is not None:
+                self.resolved[pytype] = cpptype
+                return cpptype
+        self.missing.add(pytype)
+        return None
 
     def convert(self, type_str):
         raise NotImplementedError
 
     def register(self, pytype, cpptype):
         self.type_map[pytype] = cpptype
+        self.missing.discard(pytype)
+
+    def register_generic(self, name, format, arity=1):
+        """
+        :param format: type for the parameter types, e.g. "std::vector<{}>"
+        :param arity: number of parameters, or None for any number; they
+                      are formatted as one comma separated argument
+        """
+        self.generics[name] = (format, arity)
+
+    def add_provider(self, provider):
+        """
+        Add a callable that is consulted when an unregistered type is
+        looked up. It returns the type for the given name, or None.
+        """
+        self.providers.append(provider)
+        self.missing.clear()
+
+
+class NameProvider(object):
+    """Provide types for a set of names that is only loaded when needed.
+
+    *names* is an iterable of names, or a callable returning one; a
+    callable is called on the first lookup of a name that starts with
+    *prefix*, so that e.g. a binding is not imported unless the input uses
+    one of its types.
+    """
+    def __init__(self, names, format="{}", prefix="", source=None):
+        """
+        :param format: type for a name, formatted with the name
+        :param source: description of the names, used by the transpile
+                       cache instead of the names themselves
+        """
+        self.names = names
+        self.format = format
+        self.prefix = prefix
+        self.source = source
+        self.loaded = None
+
+    def __repr__(self):
+        return "NameProvider(format={!r}, prefix={!r}, source={!r})".format(
+            self.format, self.prefix, self.source)
+
+    def __call__(self, name):
+        if not isinstance(name, six.string_types) or not name.startswith(self.prefix):
+            return None
+        if self.loaded is None:
+            names = self.names() if callable(self.names) else self.names
+            self.loaded = frozenset(names)
+        if name not in self.loaded:
+            return None
+        return self.format.format(name)
+
+
+def load_names(path):
+    """
+    Read a pre-generated name list, one name per line.
+
+    :rtype: list of str
+    """
+    with io.open(path, encoding="utf-8") as fp:
+        return [x.strip() for x in fp if x.strip() and not x.startswith("#")]
@@ -1,12 +1,12 @@
 // generate by py2cpp
 // original source code: samples/add.py
-#include "py2cpp/py2cpp.hpp"
+#include "py2cpp/print.hpp"
 
 double add(double x, double y) {
     return x + y;
 }
 
 int main() {
-    std::cout << "2.0 + 3.0 =" << add(2.0, 3.0) << std::endl;
+    py2cpp::print("2.0 + 3.0 =", add(2.0, 3.0));
     return 0;
 }
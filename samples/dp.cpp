@@ -1,29 +1,35 @@
 // generate by py2cpp
 // original source code: samples/dp.py
-#include "py2cpp/py2cpp.hpp"
+#include <utility>
+#include <vector>
 
-int dp(std::vector<int> a, std::vector<int> b, int cost=1) {
-    min_str = ((len(a) < len(b)) ? (a) : (b));
-    max_str = ((len(a) > len(b)) ? (a) : (b));
-    min_size = len(min_str);
-    max_size = len(max_str);
-    states = list();
-    temp = list();
-    for (auto x : py2cpp::range(min_size + 1)) {
-        temp.append(x);
+#include "py2cpp/containers.hpp"
+#include "py2cpp/range.hpp"
+
+int dp(const std::vector<int>& a, const std::vector<int>& b, int cost=1) {
+    std::vector<int> min_str = ((py2cpp::len(a) < py2cpp::len(b)) ? (a) : (b));
+    std::vector<int> max_str = ((py2cpp::len(a) > py2cpp::len(b)) ? (a) : (b));
+    int min_size = py2cpp::len(min_str);
+    int max_size = py2cpp::len(max_str);
+    std::vector<std::vector<int>> states;
+    std::vector<int> temp;
+    temp.reserve(py2cpp::range(min_size + 1).size());
+    for (int x = 0; x < min_size + 1; ++x) {
+        temp.push_back(x);
     }
-    states.append(temp);
-    temp = list();
-    for (auto x : py2cpp::range(min_size + 1)) {
-        temp.append(0);
+    states.push_back(temp);
+    temp = std::vector<int>();
+    temp.reserve(py2cpp::range(min_size + 1).size());
+    for (int x = 0; x < min_size + 1; ++x) {
+        temp.push_back(0);
     }
-    states.append(temp);
-    for (auto i : py2cpp::range(1, min_size + 1)) {
-        prev = ((i % 2 == 0) ? (1) : (0));
-        curr = i % 2;
+    states.push_back(std::move(temp));
+    for (int i = 1; i < min_size + 1; ++i) {
+        int prev = ((i % 2 == 0) ? (1) : (0));
+        int curr = i % 2;
         states[i % 2][0] = i;
-        for (auto j : py2cpp::range(1, max_size + 1)) {
-            states[i % 2][j] = min(min(states[prev][j], states[curr][j - 1]) + 1, states[prev][j - 1] + ((max_str[i - 1] == min_str[j - 1]) ? (0) : (cost)));
+        for (int j = 1; j < max_size + 1; ++j) {
+            states[i % 2][j] = py2cpp::min(py2cpp::min(states[prev][j], states[curr][j - 1]) + 1, states[prev][j - 1] + ((max_str[i - 1] == min_str[j - 1]) ? (0) : (cost)));
         }
     }
     return states[min_size % 2][min_size];
@@ -0,0 +1,39 @@
+// generate by py2cpp
+// original source code: samples/dp_comp.py
+#include <vector>
+
+#include "py2cpp/containers.hpp"
+#include "py2cpp/range.hpp"
+
+int dp_comp(const std::vector<int>& a, const std::vector<int>& b, int cost=1) {
+    std::vector<int> min_str = ((py2cpp::len(a) < py2cpp::len(b)) ? (a) : (b));
+    std::vector<int> max_str = ((py2cpp::len(a) > py2cpp::len(b)) ? (a) : (b));
+    int min_size = py2cpp::len(min_str);
+    int max_size = py2cpp::len(max_str);
+    std::vector<std::vector<int>> states;
+    states.push_back([&]() {
+        std::vector<int> result;
+        result.reserve(py2cpp::range(min_size + 1).size());
+        for (int x = 0; x < min_size + 1; ++x) {
+            result.push_back(x);
+        }
+        return result;
+    }());
+    states.push_back([&]() {
+        std::vector<int> result;
+        result.reserve(py2cpp::range(min_size + 1).size());
+        for (int x = 0; x < min_size + 1; ++x) {
+            result.push_back(0);
+        }
+        return result;
+    }());
+    for (int i = 1; i < min_size + 1; ++i) {
+        int prev = ((i % 2 == 0) ? (1) : (0));
+        int curr = i % 2;
+        states[i % 2][0] = i;
+        for (int j = 1; j < max_size + 1; ++j) {
+            states[i % 2][j] = py2cpp::min(py2cpp::min(states[prev][j], states[curr][j - 1]) + 1, states[prev][j - 1] + ((max_str[i - 1] == min_str[j - 1]) ? (0) : (cost)));
+        }
+    }
+    return states[min_size % 2][min_size];
+}
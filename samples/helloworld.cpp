@@ -1,8 +1,8 @@
 // generate by py2cpp
 // original source code: samples/helloworld.py
-#include "py2cpp/py2cpp.hpp"
+#include "py2cpp/print.hpp"
 
 int main() {
-    std::cout << "Hello World!" << std::endl;
+    py2cpp::print("Hello World!");
     return 0;
 }
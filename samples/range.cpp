@@ -1,12 +1,12 @@
 // generate by py2cpp
 // original source code: samples/range.py
-#include "py2cpp/py2cpp.hpp"
+#include "py2cpp/print.hpp"
 
 int main() {
-    x = 0;
-    for (auto i : py2cpp::range(100)) {
+    int x = 0;
+    for (int i = 0; i < 100; ++i) {
         x += i;
     }
-    std::cout << x << std::endl;
+    py2cpp::print(x);
     return 0;
 }